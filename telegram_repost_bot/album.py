@@ -0,0 +1,41 @@
+from typing import Awaitable, Callable, Dict, List
+
+from telethon.tl.patched import Message
+
+from telegram_repost_bot.debounce import Debouncer
+from telegram_repost_bot.logging_config import setup_logger
+
+logger = setup_logger(__name__)
+
+
+class AlbumCollector:
+    """
+    Collect the messages of a Telegram album into one batch.
+
+    Telegram delivers an album as separate messages sharing a ``grouped_id``.
+    A group is handed to ``on_album`` once no new message for it has arrived
+    for ``window`` seconds.
+    """
+
+    def __init__(
+        self,
+        window: float,
+        on_album: Callable[[List[Message]], Awaitable[None]],
+    ) -> None:
+        self._window = window
+        self._on_album = on_album
+        self._albums: Dict[int, List[Message]] = {}
+        self._debouncer: Debouncer[int] = Debouncer(self._flush)
+
+    def add(self, message: Message) -> None:
+        grouped_id = message.grouped_id
+        self._albums.setdefault(grouped_id, []).append(message)
+        self._debouncer.schedule(grouped_id, self._window)
+
+    async def _flush(self, grouped_id: int) -> None:
+        messages = self._albums.pop(grouped_id, None)
+        if messages is None:
+            return  # A late part was flushed with the rest already.
+        messages.sort(key=lambda m: m.id)
+        logger.info(f"Album {grouped_id} complete with {len(messages)} messages")
+        await self._on_album(messages)
@@ -0,0 +1,203 @@
+import asyncio
+from typing import TYPE_CHECKING, AsyncIterator, Awaitable, Callable, List, Set, Tuple
+
+from telegram_repost_bot.channel_state import ChannelState
+from telegram_repost_bot.logging_config import setup_logger
+from telegram_repost_bot.routing import Route, Router
+
+if TYPE_CHECKING:
+    from telethon import TelegramClient
+    from telethon.tl.patched import Message
+
+logger = setup_logger(__name__)
+
+
+def group_albums(messages: List["Message"]) -> List[List["Message"]]:
+    """Split messages in ID order into single messages and whole albums."""
+    groups: List[List["Message"]] = []
+    for message in messages:
+        if (
+            message.grouped_id
+            and groups
+            and groups[-1][0].grouped_id == message.grouped_id
+        ):
+            groups[-1].append(message)
+        else:
+            groups.append([message])
+    return groups
+
+
+class Backfill:
+    """
+    Catch up on channel posts that were missed while the bot was not listening.
+
+    Each channel's history after its last processed message is read oldest
+    first in batches of ``batch_size`` and handed to ``handle``, at most
+    ``concurrency`` posts at a time, exactly as if the messages had just
+    arrived. A sweep runs on startup, whenever the client reconnects and
+    every ``interval`` seconds, which also covers updates Telegram silently
+    drops. It reads at most ``limit`` messages per channel and continues from
+    there on the next sweep.
+
+    Only this class advances ``ChannelState``, and never past a message
+    whose handling failed, so the saved position never skips a message: the
+    next sweep tries it again. Messages after it that were handled are
+    recorded as such, so they are not handled twice. Posts that are already
+    published or queued are dropped by the post index and the outbox.
+    Messages the live handler has taken are skipped: those it is still
+    working on by ``seen`` until ``forget``, and those it has finished with
+    by ``handled``, which is saved so that it also holds across restarts.
+    """
+
+    def __init__(
+        self,
+        client: "TelegramClient",
+        router: Router,
+        state: ChannelState,
+        handle: Callable[[Route, List["Message"]], Awaitable[None]],
+        batch_size: int = 100,
+        concurrency: int = 4,
+        limit: int = 1000,
+        interval: float = 300.0,
+        check_interval: float = 5.0,
+    ) -> None:
+        self._client = client
+        self._router = router
+        self._state = state
+        self._handle = handle
+        self._batch_size = batch_size
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._limit = limit
+        self._interval = interval
+        self._check_interval = check_interval
+        self._seen: Set[Tuple[int, int]] = set()
+        self._lock = asyncio.Lock()
+
+    def seen(self, chat_id: int, message_id: int) -> None:
+        """Note a message the live handler has started on."""
+        self._seen.add((chat_id, message_id))
+
+    def forget(self, chat_id: int, message_ids: List[int]) -> None:
+        """Note that the live handler is done with messages, however it went."""
+        self._seen.difference_update(
+            (chat_id, message_id) for message_id in message_ids
+        )
+
+    async def handled(self, chat_id: int, message_ids: List[int]) -> None:
+        """Note messages the live handler has finished with, for good."""
+        await self._state.mark_handled(chat_id, message_ids)
+
+    async def _batches(
+        self, chat_id: int, after: int
+    ) -> AsyncIterator[List["Message"]]:
+        batch: List["Message"] = []
+        async for message in self._client.iter_messages(
+            chat_id, min_id=after, reverse=True, limit=self._limit
+        ):
+            # Never split an album between batches.
+            if len(batch) >= self._batch_size and (
+                not message.grouped_id or message.grouped_id != batch[-1].grouped_id
+            ):
+                yield batch
+                batch = []
+            batch.append(message)
+        if batch:
+            yield batch
+
+    async def _process(self, route: Route, messages: List["Message"]) -> bool:
+        """Handle one post; return whether that succeeded."""
+        async with self._semaphore:
+            try:
+                await self._handle(route, messages)
+            except Exception as e:
+                logger.error(
+                    f"Backfilling message {messages[0].id} from {route.name}"
+                    f" failed, will retry: {e!r}"
+                )
+                return False
+        return True
+
+    async def _advance(self, chat_id: int, position: int) -> None:
+        await self._state.advance(chat_id, position)
+        self._seen = {
+            (chat, message_id)
+            for chat, message_id in self._seen
+            if chat != chat_id or message_id > position
+        }
+
+    async def _catch_up_route(self, route: Route) -> int:
+        chat_id = route.chat_id
+        after = self._state.get(chat_id)
+        if after is None:
+            # First run: start from the newest message instead of republishing
+            # the whole history.
+            async for message in self._client.iter_messages(chat_id, limit=1):
+                await self._state.advance(chat_id, message.id)
+                logger.info(f"Tracking {route.name} from message {message.id}")
+            return 0
+
+        handled = self._state.handled(chat_id)
+        failed = False
+        count = 0
+        async for batch in self._batches(chat_id, after):
+            groups = [
+                group
+                for group in group_albums(batch)
+                if not all(
+                    m.id in handled or (chat_id, m.id) in self._seen for m in group
+                )
+            ]
+            results = await asyncio.gather(
+                *(self._process(route, group) for group in groups)
+            )
+            count += len(batch)
+            if not failed and all(results):
+                await self._advance(chat_id, batch[-1].id)
+                continue
+            if not failed:
+                # Stop the position before the first failure, so the next
+                # sweep retries it, and carry on with the rest.
+                failed = True
+                first = groups[results.index(False)][0].id
+                before = [m.id for m in batch if m.id < first]
+                if before:
+                    await self._advance(chat_id, before[-1])
+            # Past the position, record what succeeded so the retry skips it.
+            await self._state.mark_handled(
+                chat_id,
+                [m.id for group, ok in zip(groups, results) if ok for m in group],
+            )
+        if count:
+            logger.info(f"Backfilled {count} messages from {route.name}")
+        return count
+
+    async def catch_up(self) -> None:
+        """Process every channel's messages since its last processed one."""
+        async with self._lock:
+            for route in self._router.routes:
+                if route.chat_id is None:
+                    continue
+                try:
+                    await self._catch_up_route(route)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.error(f"Backfilling {route.name} failed: {e!r}")
+
+    async def run(self) -> None:
+        """Sweep now, then after every reconnect and every ``interval``."""
+        loop = asyncio.get_running_loop()
+        await self.catch_up()
+        last_sweep = loop.time()
+        connected = True
+        while True:
+            await asyncio.sleep(self._check_interval)
+            was_connected, connected = connected, self._client.is_connected()
+            if not connected:
+                continue
+            if not was_connected:
+                logger.info("Client reconnected, catching up on missed posts")
+            elif loop.time() - last_sweep < self._interval:
+                continue
+            await self.catch_up()
+            last_sweep = loop.time()
@@ -0,0 +1,94 @@
+import asyncio
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Optional, Set
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS channel_state (
+    chat_id INTEGER PRIMARY KEY,
+    last_message_id INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS handled_messages (
+    chat_id INTEGER NOT NULL,
+    message_id INTEGER NOT NULL,
+    PRIMARY KEY (chat_id, message_id)
+) WITHOUT ROWID;
+"""
+
+
+class ChannelState:
+    """
+    The ID of the last message processed from each channel.
+
+    Every message up to and including ``last_message_id`` has been handled,
+    so after downtime the history only has to be read from there on.
+    Messages after it that were already handled as they arrived are kept
+    too, until the position moves past them, so that reading the history does
+    not handle them again. Lookups are synchronous; writes go through a
+    background thread like the outbox's.
+    """
+
+    def __init__(self, connection: sqlite3.Connection) -> None:
+        self._connection = connection
+        self._connection.executescript(SCHEMA)
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="channel-state"
+        )
+
+    def get(self, chat_id: int) -> Optional[int]:
+        row = self._connection.execute(
+            "SELECT last_message_id FROM channel_state WHERE chat_id = ?",
+            (chat_id,),
+        ).fetchone()
+        return row[0] if row else None
+
+    def _advance(self, chat_id: int, message_id: int) -> None:
+        with self._connection:
+            self._connection.execute(
+                "INSERT INTO channel_state (chat_id, last_message_id) VALUES (?, ?)"
+                " ON CONFLICT (chat_id) DO UPDATE SET last_message_id ="
+                " MAX(last_message_id, excluded.last_message_id)",
+                (chat_id, message_id),
+            )
+            self._connection.execute(
+                "DELETE FROM handled_messages WHERE chat_id = ? AND message_id <= ?",
+                (chat_id, message_id),
+            )
+
+    async def advance(self, chat_id: int, message_id: int) -> None:
+        """Move a channel's last processed message forward, never back."""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._executor, self._advance, chat_id, message_id)
+
+    def handled(self, chat_id: int) -> Set[int]:
+        """Return the messages after the channel's position already handled."""
+        return {
+            message_id
+            for (message_id,) in self._connection.execute(
+                "SELECT message_id FROM handled_messages WHERE chat_id = ?",
+                (chat_id,),
+            )
+        }
+
+    def _mark_handled(self, chat_id: int, message_ids: Iterable[int]) -> None:
+        with self._connection:
+            self._connection.executemany(
+                "INSERT OR IGNORE INTO handled_messages (chat_id, message_id)"
+                " SELECT ?, ? WHERE ? > COALESCE((SELECT last_message_id FROM"
+                " channel_state WHERE chat_id = ?), 0)",
+                [
+                    (chat_id, message_id, message_id, chat_id)
+                    for message_id in message_ids
+                ],
+            )
+
+    async def mark_handled(self, chat_id: int, message_ids: Iterable[int]) -> None:
+        """Record messages handled as they arrived, ahead of the position."""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(
+            self._executor, self._mark_handled, chat_id, list(message_ids)
+        )
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True)
+        self._connection.close()
@@ -0,0 +1,90 @@
+import time
+from typing import Callable, Optional
+
+from telegram_repost_bot.logging_config import setup_logger
+from telegram_repost_bot.rate_limit import RateLimited
+
+logger = setup_logger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpen(RateLimited):
+    """A request was not sent because its site's circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Stop calling a site that keeps failing, and find out when it is back.
+
+    After ``failure_threshold`` consecutive failures the circuit opens and
+    ``allow`` refuses every request for ``reset_timeout`` seconds. Then it is
+    half-open: a single request goes through as a probe, and its outcome
+    either closes the circuit or opens it for another ``reset_timeout``.
+    ``on_change`` is called with the new state on every transition.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        reset_timeout: float = 60.0,
+        on_change: Optional[Callable[[str], None]] = None,
+    ) -> None:
+        self._failure_threshold = failure_threshold
+        self._reset_timeout = reset_timeout
+        self._on_change = on_change
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        return self._state
+
+    @property
+    def remaining(self) -> float:
+        """Seconds until an open circuit lets a probe through."""
+        if self._state != OPEN:
+            return 0.0
+        return max(self._opened_at + self._reset_timeout - time.monotonic(), 0.0)
+
+    def _set_state(self, state: str) -> None:
+        if state == self._state:
+            return
+        self._state = state
+        if state == OPEN:
+            self._opened_at = time.monotonic()
+        if self._on_change is not None:
+            self._on_change(state)
+
+    def allow(self) -> bool:
+        """Return whether a request may be sent now; if so, report its outcome."""
+        if self._state == OPEN and not self.remaining:
+            self._set_state(HALF_OPEN)
+        if self._state == HALF_OPEN:
+            if self._probing:
+                return False
+            self._probing = True
+            return True
+        return self._state == CLOSED
+
+    def record(self, success: Optional[bool]) -> None:
+        """
+        Report the outcome of an allowed request.
+
+        :param success: None if the request ended without telling whether the
+            site is up, e.g. it was cancelled; that only frees the probe slot.
+        """
+        probing, self._probing = self._probing, False
+        if success is None:
+            return
+        if success:
+            self._failures = 0
+            self._set_state(CLOSED)
+            return
+        self._failures += 1
+        if probing or self._failures >= self._failure_threshold:
+            self._set_state(OPEN)
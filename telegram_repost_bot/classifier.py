@@ -0,0 +1,135 @@
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
+
+
+@dataclass(frozen=True)
+class Rule:
+    """What a message containing any of ``terms`` is."""
+
+    terms: Tuple[str, ...]  # Hashtags or keywords, matched as whole words
+    post: bool = False  # The message is a post
+    skip: bool = False  # The message is never a post, whatever else matches
+    categories: Dict[str, Tuple[int, ...]] = field(default_factory=dict)  # By site
+    tags: Dict[str, Tuple[int, ...]] = field(default_factory=dict)  # By site
+
+
+@dataclass(frozen=True)
+class Classification:
+    """The combined verdict of every rule matching a message."""
+
+    post: bool = False
+    skip: bool = False
+    categories: Dict[str, Tuple[int, ...]] = field(default_factory=dict)
+    tags: Dict[str, Tuple[int, ...]] = field(default_factory=dict)
+    matched: Tuple[str, ...] = ()
+
+    @property
+    def is_post(self) -> bool:
+        return self.post and not self.skip
+
+    def categories_for(self, site: str) -> Optional[List[int]]:
+        """The categories rules gave ``site``, or None if none did."""
+        categories = self.categories.get(site)
+        return None if categories is None else list(categories)
+
+    def tags_for(self, site: str) -> Optional[List[int]]:
+        """The tags rules gave ``site``, or None if none did."""
+        tags = self.tags.get(site)
+        return None if tags is None else list(tags)
+
+
+def _trie_pattern(node: dict) -> str:
+    """Render a character trie as a regex that tries longer terms first."""
+    branches = [
+        re.escape(char) + _trie_pattern(child)
+        for char, child in sorted(node.items())
+        if char
+    ]
+    if not branches:
+        return ""
+    pattern = branches[0] if len(branches) == 1 else f"(?:{'|'.join(branches)})"
+    if "" in node:
+        pattern = f"(?:{pattern})?"
+    return pattern
+
+
+def compile_terms(terms: Sequence[str]) -> Optional["re.Pattern[str]"]:
+    """
+    Compile terms into one case-insensitive regex matching any of them.
+
+    The terms are factored into a trie by common prefixes, so at each position
+    of the text the regex follows one branch per character instead of trying
+    every term in turn, and its cost does not grow with the number of terms.
+    Terms only match as whole words: "#новости" does not match "#новостиКР".
+
+    :param terms: Hashtags or keywords.
+    """
+    trie: dict = {}
+    for term in terms:
+        node = trie
+        for char in term.lower():
+            node = node.setdefault(char, {})
+        node[""] = {}
+    if not trie:
+        return None
+    return re.compile(rf"(?<!\w){_trie_pattern(trie)}(?!\w)", re.IGNORECASE)
+
+
+class Classifier:
+    """
+    Decide whether a message is a post, and where it is filed, in one pass.
+
+    All rule terms are compiled into a single regex, so classifying a message
+    is one scan of its text however many rules there are. Every matching rule
+    contributes: the message is a post if any matching rule says so and none
+    says to skip it, and the categories and tags of matching rules are merged
+    per site in rule order. Where terms overlap, the longest one at a position
+    wins.
+    """
+
+    def __init__(self, rules: Sequence[Rule]) -> None:
+        self.rules = list(rules)
+        # Positions in ``rules`` of the rules of each term.
+        self._rules_by_term: Dict[str, List[int]] = {}
+        for index, rule in enumerate(self.rules):
+            for term in rule.terms:
+                self._rules_by_term.setdefault(term.lower(), []).append(index)
+        self._pattern = compile_terms(list(self._rules_by_term))
+
+    def classify(self, text: str) -> Classification:
+        """
+        Classify a message by the rules whose terms it contains.
+
+        :param text: The text of the message.
+        """
+        if self._pattern is None:
+            return Classification()
+        matched: Dict[str, None] = {}
+        for match in self._pattern.finditer(text):
+            matched[match.group().lower()] = None
+        if not matched:
+            return Classification()
+
+        # Apply the matching rules in the order they were configured.
+        matching = {
+            index for term in matched for index in self._rules_by_term.get(term, ())
+        }
+        post = skip = False
+        categories: Dict[str, Dict[int, None]] = {}
+        tags: Dict[str, Dict[int, None]] = {}
+        for index in sorted(matching):
+            rule = self.rules[index]
+            post = post or rule.post
+            skip = skip or rule.skip
+            for site, ids in rule.categories.items():
+                categories.setdefault(site, {}).update(dict.fromkeys(ids))
+            for site, ids in rule.tags.items():
+                tags.setdefault(site, {}).update(dict.fromkeys(ids))
+        return Classification(
+            post,
+            skip,
+            {site: tuple(ids) for site, ids in categories.items()},
+            {site: tuple(ids) for site, ids in tags.items()},
+            tuple(matched),
+        )
@@ -1,26 +1,94 @@
-from typing import List
+from functools import lru_cache
+from typing import Dict, List, Optional, Union
 
-from pydantic import BaseSettings
+from pydantic import BaseModel, BaseSettings, root_validator
+
+
+class RateLimit(BaseModel):
+    post_rate: float = 0.2  # Post creates/updates per second, 0 for no limit
+    post_burst: int = 3
+    media_rate: float = 1.0  # Media uploads per second, 0 for no limit
+    media_burst: int = 5
+
+
+class WordpressSite(BaseModel):
+    url: str  # Base URL of the REST API, ending in /wp-json
+    username: str
+    password: str
+    author_id: str
+    categories: List[int] = []
+    hidden_url: Optional[str] = None  # Visited for cookies before API calls
+    cookie_ttl: float = 600.0
+    cookie_refresh_margin: float = 60.0
+    rate_limit: Optional[RateLimit] = None  # Defaults to wordpress_rate_limit
+
+
+class RouteTarget(BaseModel):
+    site: str  # "ru", "kg" or a key of wordpress_sites
+    author_id: Optional[str] = None  # Defaults to the site's author
+    categories: Optional[List[int]] = None  # Defaults to the site's categories
+
+
+class ClassifierRule(BaseModel):
+    match: List[str]  # Hashtags or keywords, case-insensitive, as whole words
+    post: bool = False  # A message containing any of them is a post
+    skip: bool = False  # ...or is never a post, overriding every other rule
+    categories: Dict[str, List[int]] = {}  # By site, instead of its categories
+    tags: Dict[str, List[int]] = {}  # Tag IDs by site
+
+
+class Route(BaseModel):
+    channel: Union[int, str]  # Channel ID (-100...), or its username
+    hashtags: List[str]  # A message is a post if it contains any of them
+    alert_chat_id: int  # Group where errors for this channel are sent
+    targets: List[RouteTarget]
+
+
+# Settings of the original sites that are set together or not at all.
+LEGACY_SITE_SETTINGS = {
+    "ru": (
+        "wordpress_ru_hidden_url",
+        "wordpress_ru_username",
+        "wordpress_ru_password",
+        "wordpress_ru_author_id",
+    ),
+    "kg": ("wordpress_kg_username", "wordpress_kg_password", "wordpress_kg_author_id"),
+}
 
 
 class Settings(BaseSettings):
     api_id: int
     api_hash: str
     admin_username: str
-    wordpress_ru_hidden_url: str
+    # The original "ru" and "kg" sites are only set up if their credentials
+    # are set, and their channels only routed if their groups are.
+    wordpress_ru_hidden_url: Optional[str] = None
     wordpress_ru_url: str = "https://kloop.kg/wp-json"
-    wordpress_ru_username: str
-    wordpress_ru_password: str
-    wordpress_ru_author_id: str
+    wordpress_ru_username: Optional[str] = None
+    wordpress_ru_password: Optional[str] = None
+    wordpress_ru_author_id: Optional[str] = None
+    wordpress_ru_cookie_ttl: float = 600.0  # Seconds hidden URL cookies are reused
+    wordpress_ru_cookie_refresh_margin: float = 60.0  # Refresh this early in background
     wordpress_ru_categories: List[int] = [
         43,  # ID of category "Новости"
         24127046,  # ID of category "Лента"
         24127043,  # ID of category "Заметки"
     ]
+    wordpress_request_timeout: float = 30.0  # Seconds per WordPress HTTP request
+    wordpress_pool_size: int = 10  # Max open connections per WordPress site
+    wordpress_keepalive_timeout: float = 60.0  # Seconds an idle connection is kept
+    # Per-site request budgets, as JSON, e.g. {"post_rate": 0.1, "post_burst": 2}
+    wordpress_rate_limit: RateLimit = RateLimit()
+    wordpress_ru_rate_limit: Optional[RateLimit] = None
+    wordpress_kg_rate_limit: Optional[RateLimit] = None
+    wordpress_max_retries: int = 3  # Retries of a throttled (429/503) request
+    wordpress_retry_max_delay: float = 60.0  # Longer waits are left to the outbox
+    wordpress_failure_threshold: int = 5  # Failures in a row that open a circuit
+    wordpress_circuit_reset_timeout: float = 60.0  # Seconds before probing again
     wordpress_kg_url: str = "https://ky.kloop.asia/wp-json"
-    wordpress_kg_username: str
-    wordpress_kg_password: str
-    wordpress_kg_author_id: str
+    wordpress_kg_username: Optional[str] = None
+    wordpress_kg_password: Optional[str] = None
+    wordpress_kg_author_id: Optional[str] = None
     wordpress_kg_categories: List[int] = [
         2,  # ID of category "Кабарлар"
         86,  # ID of category "Кыска жаңылыктар"
@@ -28,23 +96,88 @@ class Settings(BaseSettings):
     channel_ru_username: str = (
         "kloopnews"  # Russian-language channel that will be monitored by a bot
     )
-    group_ru_id: int  # Russian-language group where error messages will be sent
+    group_ru_id: Optional[int] = None  # Russian-language group for error messages
     channel_kg_username: str = (
         "kloopkyrgyz"  # Kyrgyz-language channel that will be monitored by a bot
     )
-    group_kg_id: int  # Kyrgyz-language group where error messages will be sent
+    group_kg_id: Optional[int] = None  # Kyrgyz-language group for error messages
     hashtag_ru: str = "#новости"
     hashtag_kg: str = "#кабарлар"
+    # Extra WordPress sites and the channel routing table, as JSON. Without
+    # ROUTES the two channels above go to the "ru" and "kg" sites.
+    wordpress_sites: Dict[str, WordpressSite] = {}
+    routes: List[Route] = []
+    # Hashtag and keyword rules applied to every channel, as JSON. A route's
+    # hashtags are rules that mark a post.
+    classifier_rules: List[ClassifierRule] = []
+
+    media_streaming: bool = True  # Keep photos in memory instead of downloads/
+    album_window: float = 1.5  # Seconds to wait for the rest of an album
+    media_concurrency: int = 4  # Parallel photo downloads/uploads per album
+    media_cache_max_bytes: int = 512 * 1024 * 1024  # Disk budget for downloads/
+    media_cache_max_entries: int = 2000
+    database_path: str = "data/repost_bot.sqlite3"  # Relative to the working dir
+    outbox_workers: int = 4  # Async workers publishing queued posts
+    wordpress_site_concurrency: int = 2  # Max posts published at once per site
+    outbox_retry_base_delay: float = 5.0  # First retry delay, doubled per attempt
+    outbox_retry_max_delay: float = 600.0
+    outbox_max_attempts: int = 8  # Attempts before a post is reported as failed
+
+    edit_sync_window: float = 10.0  # Seconds to wait for more edits of a post
+    backfill_batch_size: int = 100  # Messages read from history per request
+    backfill_concurrency: int = 4  # Backfilled posts processed at once
+    backfill_limit: int = 1000  # Messages per channel per sweep
+    backfill_interval: float = 300.0  # Seconds between sweeps for missed posts
+
+    log_level: str = "INFO"  # DEBUG also logs every incoming message
+    log_dir: str = "logs"
+    log_max_bytes: int = 10 * 1024 * 1024  # Rotate the log file at this size
+    log_backup_count: int = 5  # Rotated log files to keep
+    log_rotate_when: Optional[str] = None  # e.g. "midnight" to rotate daily instead
+    trace_enabled: bool = True  # Per-message spans in <log_dir>/traces.jsonl
+
+    status_host: str = "0.0.0.0"  # /health and /metrics server
+    status_port: int = 5001
+    admin_token: Optional[str] = None  # Enables /admin/profile with this token
+    health_update_max_age: float = 6 * 3600.0  # Degraded if a channel is this quiet
+    health_publish_degraded_age: float = 900.0  # Posts waiting, none published
+    health_publish_unhealthy_age: float = 3600.0
+    health_pending_degraded: int = 20  # Degraded with more posts waiting
+    health_probe_interval: float = 60.0  # Seconds between wp-json probes
 
     notification_service_base_url: str = "http://localhost:8000"
+    notification_timeout: float = 10.0  # Seconds per notification request
+    notification_coalesce_window: float = 60.0  # Identical alerts merge within it
+    notification_rate_limit: int = 10  # Max alerts per recipient per period
+    notification_rate_period: float = 3600.0
     admin_tg_id: int
     admin_email: str
     project_name = "Telegram Repost Bot"
 
+    @root_validator(skip_on_failure=True)
+    def _check_legacy_sites(cls, values: dict) -> dict:
+        for site, required in LEGACY_SITE_SETTINGS.items():
+            missing = [name for name in required if values.get(name) is None]
+            if 0 < len(missing) < len(required):
+                raise ValueError(
+                    f"{', '.join(missing)} must be set to use the {site!r} site"
+                )
+        return values
+
     class Config:
         env_file = ".env"
         env_file_encoding = "utf-8"
         env_nested_delimiter = "__"
 
 
-config = Settings()
+@lru_cache(maxsize=None)
+def get_config() -> Settings:
+    """Read and validate the settings on first use."""
+    return Settings()
+
+
+def __getattr__(name: str):
+    # Keeps ``config_reader.config`` working without reading .env on import.
+    if name == "config":
+        return get_config()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
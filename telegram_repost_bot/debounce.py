@@ -0,0 +1,54 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, Generic, Hashable, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+
+
+class Debouncer(Generic[K]):
+    """
+    Run ``callback(key)`` in a task once a key's timer runs out.
+
+    Scheduling a key that is already scheduled restarts its timer, so a burst
+    of calls ends in one callback ``delay`` seconds after the last of them.
+    Running tasks are kept here until they finish, so that none is
+    garbage-collected mid-flight.
+    """
+
+    def __init__(self, callback: Callable[[K], Awaitable[None]]) -> None:
+        self._callback = callback
+        self._timers: Dict[K, asyncio.TimerHandle] = {}
+        self._tasks: set[asyncio.Task] = set()
+
+    def __contains__(self, key: K) -> bool:
+        """Whether ``key`` is waiting for its timer."""
+        return key in self._timers
+
+    def schedule(self, key: K, delay: float) -> None:
+        """Run the callback for ``key`` in ``delay`` seconds, unless rescheduled."""
+        self.cancel(key)
+        self._timers[key] = asyncio.get_running_loop().call_later(delay, self.fire, key)
+
+    def cancel(self, key: K) -> bool:
+        """Drop the timer of ``key``; return whether it had one."""
+        timer = self._timers.pop(key, None)
+        if timer is None:
+            return False
+        timer.cancel()
+        return True
+
+    def fire(self, key: K) -> None:
+        """Run the callback for ``key`` now."""
+        self.cancel(key)
+        task = asyncio.create_task(self._callback(key))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def close(self) -> None:
+        """Drop every timer and wait for the callbacks already running."""
+        for key in list(self._timers):
+            self.cancel(key)
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        # The callbacks may have scheduled their keys again.
+        for key in list(self._timers):
+            self.cancel(key)
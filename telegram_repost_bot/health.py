@@ -0,0 +1,207 @@
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Awaitable, Callable, Dict, Iterable, Optional, Tuple
+
+from telegram_repost_bot.circuit_breaker import CLOSED
+from telegram_repost_bot.logging_config import setup_logger
+
+if TYPE_CHECKING:
+    from telegram_repost_bot.wp_api import BaseApi
+
+logger = setup_logger(__name__)
+
+OK = "ok"
+DEGRADED = "degraded"
+UNHEALTHY = "unhealthy"
+
+_SEVERITY = {OK: 0, DEGRADED: 1, UNHEALTHY: 2}
+
+
+@dataclass
+class HealthThresholds:
+    update_max_age: float = 6 * 3600.0  # No update from a channel for this long
+    publish_degraded_age: float = 900.0  # Posts waiting, nothing published since
+    publish_unhealthy_age: float = 3600.0
+    pending_degraded: int = 20  # Posts waiting in the outbox
+
+
+@dataclass
+class _Probe:
+    checked_at: float
+    error: Optional[str]
+
+
+class HealthState:
+    """
+    What ``/health`` reports, kept up to date by the bot as it works.
+
+    Writers are the message handlers, the outbox workers and
+    ``HealthMonitor``; ``report`` only reads these cached values, so it is
+    cheap and never waits on Telegram, WordPress or the database.
+    """
+
+    def __init__(
+        self,
+        channels: Iterable[str],
+        sites: Iterable[str],
+        is_connected: Callable[[], bool],
+        thresholds: Optional[HealthThresholds] = None,
+    ) -> None:
+        self._started_at = time.time()
+        self._is_connected = is_connected
+        self._thresholds = thresholds or HealthThresholds()
+        self._last_update: Dict[str, Optional[float]] = dict.fromkeys(channels)
+        self._last_publish: Dict[str, Optional[float]] = dict.fromkeys(sites)
+        self._probes: Dict[str, _Probe] = {}
+        self._circuits: Dict[str, str] = {}
+        self._pending: Dict[str, int] = {}
+
+    def record_update(self, channel: str) -> None:
+        self._last_update[channel] = time.time()
+
+    def record_publish(self, site: str) -> None:
+        self._last_publish[site] = time.time()
+
+    def record_probe(self, site: str, error: Optional[str]) -> None:
+        self._probes[site] = _Probe(time.time(), error)
+
+    def record_circuit(self, site: str, state: str) -> None:
+        self._circuits[site] = state
+
+    def set_pending(self, pending: Dict[str, int]) -> None:
+        """
+        Set the outbox depth.
+
+        :param pending: Posts waiting, by site.
+        """
+        self._pending = pending
+
+    @staticmethod
+    def _age(now: float, timestamp: Optional[float]) -> Optional[float]:
+        return None if timestamp is None else round(now - timestamp, 1)
+
+    def report(self) -> Tuple[str, dict]:
+        """Return the overall status and a JSON-serializable breakdown."""
+        now = time.time()
+        thresholds = self._thresholds
+        problems = []
+        status = OK
+
+        def problem(severity: str, text: str) -> None:
+            nonlocal status
+            problems.append(text)
+            if _SEVERITY[severity] > _SEVERITY[status]:
+                status = severity
+
+        last_update = self._last_update
+        last_publish = self._last_publish
+        probes = self._probes
+        circuits = self._circuits
+        pending_by_site = self._pending
+        pending = sum(pending_by_site.values())
+
+        connected = self._is_connected()
+        if not connected:
+            problem(UNHEALTHY, "Telegram client is disconnected")
+        for channel, timestamp in last_update.items():
+            since = timestamp or self._started_at
+            if now - since > thresholds.update_max_age:
+                problem(DEGRADED, f"No updates from {channel} for {now - since:.0f}s")
+
+        if pending > thresholds.pending_degraded:
+            problem(DEGRADED, f"{pending} posts are waiting to be published")
+        wordpress = {}
+        for site, timestamp in last_publish.items():
+            probe = probes.get(site)
+            circuit = circuits.get(site, CLOSED)
+            if circuit != CLOSED:
+                problem(DEGRADED, f"WordPress {site} circuit is {circuit}")
+            elif probe is not None and probe.error is not None:
+                problem(DEGRADED, f"WordPress {site} is unreachable: {probe.error}")
+            # Nothing to publish is fine; posts waiting with no progress is not.
+            # Only the site's own posts count: another site's backlog says
+            # nothing about a site that simply had nothing to publish.
+            site_pending = pending_by_site.get(site, 0)
+            stalled = now - (timestamp or self._started_at)
+            if site_pending and stalled > thresholds.publish_unhealthy_age:
+                problem(UNHEALTHY, f"Nothing published to {site} for {stalled:.0f}s")
+            elif site_pending and stalled > thresholds.publish_degraded_age:
+                problem(DEGRADED, f"Nothing published to {site} for {stalled:.0f}s")
+            wordpress[site] = {
+                "last_publish_age": self._age(now, timestamp),
+                "pending": site_pending,
+                "reachable": None if probe is None else probe.error is None,
+                "probe_age": (
+                    None if probe is None else self._age(now, probe.checked_at)
+                ),
+                "probe_error": None if probe is None else probe.error,
+                "circuit": circuit,
+            }
+
+        return status, {
+            "status": status,
+            "message": "; ".join(problems) or "Bot is running",
+            "telegram": {
+                "connected": connected,
+                "last_update_age": {
+                    channel: self._age(now, timestamp)
+                    for channel, timestamp in last_update.items()
+                },
+            },
+            "wordpress": wordpress,
+            "outbox": {"pending": pending},
+        }
+
+
+class HealthMonitor:
+    """
+    Refresh the parts of ``HealthState`` that have to be fetched.
+
+    The outbox depth is re-read every ``refresh_interval`` seconds, and each
+    site's ``wp-json`` index is probed every ``probe_interval`` seconds, so
+    polling ``/health`` never multiplies load on WordPress.
+    """
+
+    def __init__(
+        self,
+        state: HealthState,
+        sites: Dict[str, "BaseApi"],
+        pending: Callable[[], Awaitable[Dict[str, int]]],
+        refresh_interval: float = 5.0,
+        probe_interval: float = 60.0,
+    ) -> None:
+        self._state = state
+        self._sites = sites
+        self._pending = pending
+        self._refresh_interval = refresh_interval
+        self._probe_interval = probe_interval
+
+    async def run(self) -> None:
+        await asyncio.gather(self._refresh_pending(), self._probe_sites())
+
+    async def _refresh_pending(self) -> None:
+        while True:
+            try:
+                self._state.set_pending(await self._pending())
+            except Exception as e:
+                logger.error(f"Reading the outbox depth failed: {e!r}")
+            await asyncio.sleep(self._refresh_interval)
+
+    async def _probe(self, site: str, api: "BaseApi") -> None:
+        try:
+            await api.ping()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"WordPress {site} probe failed: {e!r}")
+            self._state.record_probe(site, repr(e))
+        else:
+            self._state.record_probe(site, None)
+
+    async def _probe_sites(self) -> None:
+        while True:
+            await asyncio.gather(
+                *(self._probe(site, api) for site, api in self._sites.items())
+            )
+            await asyncio.sleep(self._probe_interval)
@@ -1,22 +1,145 @@
+import atexit
+import json
 import logging
+import queue
 import sys
+from datetime import datetime, timezone
+from logging.handlers import (
+    QueueHandler,
+    QueueListener,
+    RotatingFileHandler,
+    TimedRotatingFileHandler,
+)
 from pathlib import Path
+from typing import Callable, Optional
 
+PACKAGE_LOGGER = "telegram_repost_bot"
+# main.py also runs as a script, where its logger is called "__main__".
+BOT_LOGGERS = (PACKAGE_LOGGER, "__main__")
+TEXT_FORMAT = "%(name)s %(asctime)s %(levelname)s %(message)s"
 
-def setup_logger(name, level=logging.DEBUG):
-    logger = logging.getLogger(name)
-    logger.setLevel(level)
+_listener: Optional[QueueListener] = None
+
+
+class Lazy:
+    """
+    Defer building an expensive log argument until the record is formatted.
+
+    ``logger.debug("Message: %s", Lazy(dump, message))`` costs nothing when
+    DEBUG is off, and otherwise runs ``dump`` on the log writer thread.
+    """
+
+    __slots__ = ("_func", "_args", "_value")
+
+    def __init__(self, func: Callable, *args) -> None:
+        self._func = func
+        self._args = args
+        self._value: Optional[str] = None
+
+    def __str__(self) -> str:
+        # Every handler formats the record, so only build the value once.
+        if self._value is None:
+            self._value = str(self._func(*self._args))
+        return self._value
+
+
+class JsonFormatter(logging.Formatter):
+    """Format records as compact, single-line JSON objects."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(
+                timespec="milliseconds"
+            ),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, separators=(",", ":"), default=str)
+
+
+class DeferredQueueHandler(QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The stock handler formats the message here, on the caller's thread;
+        # leave it to the listener so the event loop only pays for a put().
+        return record
 
-    Path.mkdir(Path("logs"), exist_ok=True)
 
-    file_handler = logging.FileHandler(f"logs/{name}.log")
-    formatter = logging.Formatter("%(name)s %(asctime)s %(levelname)s %(message)s")
-    file_handler.setFormatter(formatter)
+def setup_logging(
+    level: str | int = logging.INFO,
+    directory: str | Path = "logs",
+    max_bytes: int = 10 * 1024 * 1024,
+    backup_count: int = 5,
+    rotate_when: Optional[str] = None,
+) -> None:
+    """
+    Route the bot's logs through a queue to a background writer thread.
+
+    The writer emits JSON lines to ``<directory>/telegram_repost_bot.log`` and
+    readable text to stdout. The file is rotated at ``max_bytes``, or on the
+    ``rotate_when`` schedule (e.g. "midnight") if one is given. Libraries such
+    as Telethon and aiohttp only get through at WARNING and above. Calling this
+    again replaces the previous setup.
+
+    :param level: Level for the bot's own loggers.
+    :param directory: Directory for the log file.
+    :param max_bytes: Size at which the log file is rotated.
+    :param backup_count: Number of rotated files to keep.
+    :param rotate_when: Time-based rotation interval, see TimedRotatingFileHandler.
+    """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+
+    Path(directory).mkdir(parents=True, exist_ok=True)
+    log_file = Path(directory) / f"{PACKAGE_LOGGER}.log"
+    if rotate_when:
+        file_handler = TimedRotatingFileHandler(
+            log_file, when=rotate_when, backupCount=backup_count, encoding="utf-8"
+        )
+    else:
+        file_handler = RotatingFileHandler(
+            log_file, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8"
+        )
+    file_handler.setFormatter(JsonFormatter())
 
     console_handler = logging.StreamHandler(sys.stdout)
-    console_handler.setFormatter(formatter)
+    console_handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    _listener = QueueListener(log_queue, file_handler, console_handler)
+    _listener.start()
+
+    root = logging.getLogger()
+    for handler in [h for h in root.handlers if isinstance(h, QueueHandler)]:
+        root.removeHandler(handler)
+    root.addHandler(DeferredQueueHandler(log_queue))
+    root.setLevel(logging.WARNING)
+    for name in BOT_LOGGERS:
+        logging.getLogger(name).setLevel(level)
+
 
-    logger.addHandler(file_handler)
-    logger.addHandler(console_handler)
+def shutdown_logging() -> None:
+    """Flush queued records and stop the writer thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
 
+
+atexit.register(shutdown_logging)
+
+
+def setup_logger(name, level=None):
+    """
+    Return a module logger.
+
+    Handlers are installed once by ``setup_logging``; module loggers only
+    inherit the bot's level unless ``level`` is given.
+    """
+    logger = logging.getLogger(name)
+    if level is not None:
+        logger.setLevel(level)
     return logger
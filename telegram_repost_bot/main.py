@@ -1,24 +1,46 @@
-import json
+import asyncio
+from functools import partial
 from pathlib import Path
-from threading import Thread
-from typing import Optional
+from typing import List, Optional
 
-from flask import Flask, jsonify
-from requests.exceptions import RequestException
 from telethon import TelegramClient, events
 from telethon.tl.patched import Message
 from telethon.tl.types import MessageMediaPhoto
 
-from telegram_repost_bot.config_reader import config
-from telegram_repost_bot.logging_config import setup_logger
+from telegram_repost_bot.album import AlbumCollector
+from telegram_repost_bot.backfill import Backfill
+from telegram_repost_bot.channel_state import ChannelState
+from telegram_repost_bot.circuit_breaker import CLOSED, OPEN
+from telegram_repost_bot.classifier import Classification
+from telegram_repost_bot.config_reader import Settings, get_config
+from telegram_repost_bot.health import (
+    HealthMonitor,
+    HealthState,
+    HealthThresholds,
+)
+from telegram_repost_bot.logging_config import Lazy, setup_logger, setup_logging
+from telegram_repost_bot.media import Photo, download_photo
+from telegram_repost_bot.media_cache import MediaCache
+from telegram_repost_bot.metrics import track
+from telegram_repost_bot.outbox import (
+    Outbox,
+    OutboxItem,
+    OutboxPhoto,
+    OutboxWorkerPool,
+)
+from telegram_repost_bot.post_index import PostIndex
+from telegram_repost_bot.routing import Route, Router, Target, routes_from_config
+from telegram_repost_bot.server import StatusServer
+from telegram_repost_bot.storage import open_database
+from telegram_repost_bot.sync import EditSync
+from telegram_repost_bot.tracing import record, setup_tracing, span, trace
+from telegram_repost_bot.utils.message_service import get_notifier
 from telegram_repost_bot.utils.utils import (
     parse_post,
-    is_post,
     send_notifications,
-    clean_message,
-    custom_json_serializer,
+    message_to_json,
 )
-from telegram_repost_bot.wp_api import wordpress_ru_api, wordpress_kg_api
+from telegram_repost_bot.wp_api import create_sites
 
 logger = setup_logger(__name__)
 
@@ -38,135 +60,486 @@ def ensure_directory_exists(directory_path: Path) -> None:
         )
 
 
-def log_new_message(chat_username: str, message: str) -> None:
+def log_new_message(chat_username: str, message) -> None:
     """
     Log a new message from a chat.
 
     :param chat_username: The username of the chat.
-    :param message: The message content.
+    :param message: The message content, formatted only if DEBUG is enabled.
     """
-    logger.debug(f"New message in chat {chat_username}. Message: {message}")
+    logger.debug("New message in chat %s. Message: %s", chat_username, message)
 
 
-async def process_post(
-    chat_username: str, message: Message, text_post: str, app: TelegramClient
-) -> None:
+class RepostBot:
     """
-    Process a text or media post.
+    The Telegram client, the queues behind it and the handlers wiring them.
 
-    :param chat_username: The username of the chat.
-    :param message: Message object.
-    :param text_post: The text of the post.
-    :param app: TelegramClient instance.
+    Built by ``create_app``; nothing connects or starts until ``run``.
     """
-    if not is_post(text_post, config.hashtag_ru, config.hashtag_kg):
-        text_without_new_lines = text_post.replace("\n", "\\n")
-        logger.debug(
-            f"Processed message from {chat_username}. It's not a post. Message: {text_without_new_lines}"
-        )
-        return
 
-    try:
-        result: Optional[tuple[str, str]] = parse_post(message)
-        if result is None:
-            return
+    def __init__(self, config: Settings) -> None:
+        self.config = config
 
-        title, content = result
-        image_path = None
-        if message.media and isinstance(message.media, MessageMediaPhoto):
-            downloads_dir = Path(__file__).resolve().parent / "downloads"
-            ensure_directory_exists(downloads_dir)
-            image_path = await app.download_media(message, file=str(downloads_dir))
-
-        if chat_username == config.channel_kg_username:
-            wordpress_kg_api.publish_post_to_wordpress(title, content, image_path)
-        elif chat_username == config.channel_ru_username:
-            wordpress_ru_api.publish_post_to_wordpress(title, content, image_path)
-    except Exception as e:
-        logger.error(f"Exception while processing message from {chat_username}: {e}")
-        raise e
-    else:
-        text_without_new_lines = text_post.replace("\n", "\\n")
-        logger.info(
-            f"Processed message from {chat_username}. Message: {text_without_new_lines}"
+        session_dir = Path.cwd() / "telegram_sessions"
+        ensure_directory_exists(session_dir)
+        self.app = TelegramClient(
+            str(session_dir / "net3487"),
+            config.api_id,
+            config.api_hash,
+            system_version="4.16.30-vxCUSTOM",
+        )
+        self.router = Router(routes_from_config(config))
+        self.app.add_event_handler(
+            self.new_message_handler, events.NewMessage(chats=self.router.channels)
+        )
+        self.app.add_event_handler(
+            self.edited_message_handler,
+            events.MessageEdited(chats=self.router.channels),
+        )
+        self.app.add_event_handler(
+            self.deleted_message_handler,
+            events.MessageDeleted(chats=self.router.channels),
         )
 
+        database_path = Path.cwd() / config.database_path
+        self.album_collector = AlbumCollector(config.album_window, self.album_handler)
+        self.media_semaphore = asyncio.Semaphore(config.media_concurrency)
+
+        self.outbox = Outbox(open_database(database_path))
+        self.post_index = PostIndex(open_database(database_path))
+        self.channel_state = ChannelState(open_database(database_path))
+        self.media_cache = MediaCache(
+            open_database(database_path),
+            Path(__file__).resolve().parent / "downloads",
+            max_bytes=config.media_cache_max_bytes,
+            max_entries=config.media_cache_max_entries,
+        )
+        self.sites = create_sites(config, self.circuit_changed)
+        # A post for a missing site could never be published; fail at startup.
+        self.router.check_sites(self.sites)
+        self.health = HealthState(
+            [route.name for route in self.router.routes],
+            self.sites,
+            self.app.is_connected,
+            HealthThresholds(
+                update_max_age=config.health_update_max_age,
+                publish_degraded_age=config.health_publish_degraded_age,
+                publish_unhealthy_age=config.health_publish_unhealthy_age,
+                pending_degraded=config.health_pending_degraded,
+            ),
+        )
+        self.health_monitor = HealthMonitor(
+            self.health,
+            self.sites,
+            self.outbox.pending_by_site,
+            probe_interval=config.health_probe_interval,
+        )
+        self.outbox_workers = OutboxWorkerPool(
+            self.outbox,
+            self.post_index,
+            self.sites,
+            self.publish_failed_handler,
+            workers=config.outbox_workers,
+            site_concurrency=config.wordpress_site_concurrency,
+            base_delay=config.outbox_retry_base_delay,
+            max_delay=config.outbox_retry_max_delay,
+            max_attempts=config.outbox_max_attempts,
+            media_cache=self.media_cache,
+            upload_concurrency=config.media_concurrency,
+            on_published=lambda item: self.health.record_publish(item.site),
+            on_cancelled=self.publish_cancelled_handler,
+            download=self.download_queued_photo,
+        )
+        self.edit_sync = EditSync(
+            self.outbox,
+            self.post_index,
+            self.media_cache,
+            self.sites,
+            self.prepare_photo,
+            window=config.edit_sync_window,
+            max_attempts=config.outbox_max_attempts,
+            max_delay=config.outbox_retry_max_delay,
+        )
+        self.backfill = Backfill(
+            self.app,
+            self.router,
+            self.channel_state,
+            self.handle_post,
+            batch_size=config.backfill_batch_size,
+            concurrency=config.backfill_concurrency,
+            limit=config.backfill_limit,
+            interval=config.backfill_interval,
+        )
+        self.status_server = StatusServer(
+            self.health,
+            config.status_host,
+            config.status_port,
+            admin_token=config.admin_token,
+        )
 
-async def proceed_message(message: Message, app: TelegramClient) -> None:
-    """
-    Handle new messages from the chat.
-
-    :param message: Message object.
-    :param app: TelegramClient instance.
-    """
-    chat_username = message.chat.username
-    c_msg = clean_message(message)
-    message_json = json.dumps(
-        c_msg, default=custom_json_serializer, ensure_ascii=False, indent=4
-    )
-    log_new_message(chat_username, message_json)
-
-    text_post = message.message
-    if text_post:
-        await process_post(chat_username, message, text_post, app)
-
-
-async def new_message_handler(event: events.NewMessage.Event) -> None:
-    """
-    Handler for new messages in specified chats.
+    async def prepare_photo(
+        self, message: Message, sites: List[str], channel: str = ""
+    ) -> OutboxPhoto:
+        """
+        Fetch a message's photo once, in the form the outbox stores it.
+
+        :param message: Message object with a photo.
+        :param sites: The sites the photo will be uploaded to.
+        :param channel: The channel's label in metrics.
+        """
+        photo_id = message.photo.id
+        if all(self.media_cache.get_upload(photo_id, site) for site in sites):
+            logger.info(f"Photo {photo_id} is already uploaded to {sites}")
+            return OutboxPhoto(photo_id, message_id=message.id)
+        async with self.media_semaphore:
+            with track("download_media", channel=channel):
+                if self.config.media_streaming:
+                    photo = await download_photo(message)
+                    return OutboxPhoto(
+                        photo_id,
+                        media=photo.data,
+                        media_name=photo.filename,
+                        message_id=message.id,
+                    )
+                image_path = await self.media_cache.get_or_download(
+                    photo_id, partial(self.app.download_media, message)
+                )
+                return OutboxPhoto(
+                    photo_id, media_path=image_path, message_id=message.id
+                )
+
+    async def download_queued_photo(
+        self, chat_id: int, message_id: int
+    ) -> Optional[Photo]:
+        """
+        Download the photo of a queued post again, e.g. after a restart.
+
+        :param chat_id: The chat of the message with the photo.
+        :param message_id: The message with the photo.
+        """
+        message = await self.app.get_messages(chat_id, ids=message_id)
+        if message is None:
+            logger.warning(f"Photo message {message_id} in {chat_id} is gone")
+            return None
+        async with self.media_semaphore:
+            return await download_photo(message)
+
+    @staticmethod
+    def _categories(
+        classification: Classification, target: Target
+    ) -> Optional[List[int]]:
+        """Categories of a post: by the classifier, the route, or the site."""
+        categories = classification.categories_for(target.site)
+        if categories is None and target.categories is not None:
+            categories = list(target.categories)
+        return categories
+
+    async def process_post(
+        self,
+        route: Route,
+        message: Message,
+        text_post: str,
+        album: Optional[List[Message]] = None,
+    ) -> None:
+        """
+        Process a text or media post.
+
+        :param route: The route of the message's channel.
+        :param message: Message object.
+        :param text_post: The text of the post.
+        :param album: All messages of the album ``message`` belongs to, if any.
+        """
+        channel = route.name
+        with track("is_post", channel=channel):
+            classification = route.classifier.classify(text_post)
+        if not classification.is_post:
+            logger.debug(
+                "Processed message from %s. It's not a post (matched %s). Message: %r",
+                channel,
+                classification.matched,
+                text_post,
+            )
+            return
 
-    :param event: Event object.
-    """
-    log_new_message(event.chat.title, event.message.message.replace("\n", "\\n"))
-    if event.chat.title == config.channel_kg_username:
-        chat_id = config.group_kg_id
-    else:
-        chat_id = config.group_ru_id
+        targets = [
+            target
+            for target in route.targets
+            if not self.post_index.is_published(
+                message.chat_id, message.id, target.site
+            )
+        ]
+        if not targets:
+            logger.info(
+                f"Message {message.id} from {channel} is already published, skipping"
+            )
+            return
 
-    if event.message.message:
         try:
-            await proceed_message(event.message, app)
-        except (RequestException, TypeError, ValueError) as e:
-            await send_notifications([chat_id], str(e))
-            await app.forward_messages(chat_id, event.message)
-
-
-session_dir = Path.cwd() / "telegram_sessions"
-ensure_directory_exists(session_dir)
-session_file = session_dir / "net3487"
-
-app = TelegramClient(
-    str(session_file),
-    config.api_id,
-    config.api_hash,
-    system_version="4.16.30-vxCUSTOM",
-)
-
-app.add_event_handler(
-    new_message_handler,
-    events.NewMessage(chats=[config.channel_ru_username, config.channel_kg_username]),
-)
+            with track("parse_post", channel=channel):
+                result: Optional[tuple[str, str]] = parse_post(message)
+            if result is None:
+                return
+
+            title, content = result
+            # One download per photo, shared by every target site.
+            sites = [target.site for target in targets]
+            photos = await asyncio.gather(
+                *(
+                    self.prepare_photo(photo_message, sites, channel)
+                    for photo_message in album or [message]
+                    if isinstance(photo_message.media, MessageMediaPhoto)
+                    and photo_message.photo
+                )
+            )
+
+            # Each site gets its own outbox item, so the workers publish them
+            # concurrently and a failing site retries without holding up the rest.
+            with span("enqueue"):
+                item_ids = await self.outbox.enqueue_many(
+                    [
+                        OutboxItem(
+                            site=target.site,
+                            chat_id=message.chat_id,
+                            message_id=message.id,
+                            alert_chat_id=route.alert_chat_id,
+                            title=title,
+                            content=content,
+                            photos=list(photos),
+                            created_at=message.date.timestamp(),
+                            author_id=target.author_id,
+                            categories=self._categories(classification, target),
+                            tags=classification.tags_for(target.site),
+                        )
+                        for target in targets
+                    ]
+                )
+            self.outbox_workers.notify()
+            for target, item_id in zip(targets, item_ids):
+                if item_id is None:
+                    logger.info(
+                        f"Message {message.id} from {channel} is already queued"
+                        f" for {target.site}"
+                    )
+                else:
+                    logger.info(
+                        f"Queued message {message.id} from {channel}"
+                        f" for {target.site} as {item_id}"
+                    )
+        except Exception as e:
+            logger.error(f"Exception while processing message from {channel}: {e}")
+            raise e
+        else:
+            text_without_new_lines = text_post.replace("\n", "\\n")
+            logger.info(
+                f"Processed message from {channel}. Message: {text_without_new_lines}"
+            )
+
+    async def proceed_message(
+        self, route: Route, message: Message, album: Optional[List[Message]] = None
+    ) -> None:
+        """
+        Handle new messages from the chat.
+
+        :param route: The route of the message's channel.
+        :param message: Message object.
+        :param album: All messages of the album ``message`` belongs to, if any.
+        """
+        log_new_message(route.name, Lazy(message_to_json, message))
+
+        text_post = message.message
+        if text_post:
+            await self.process_post(route, message, text_post, album)
+
+    async def new_message_handler(self, event: events.NewMessage.Event) -> None:
+        """
+        Handler for new messages in specified chats.
+
+        :param event: Event object.
+        """
+        route = self.router.get(event.chat_id)
+        if route is None:
+            return
+        log_new_message(route.name, Lazy(repr, event.message.message))
+        self.health.record_update(route.name)
+        with trace(event.chat_id, event.message.id, "new_message", channel=route.name):
+            record("telegram_delivery", event.message.date.timestamp())
+        self.backfill.seen(event.chat_id, event.message.id)
+
+        if event.message.grouped_id:
+            self.album_collector.add(event.message)
+            return
 
-flask_app = Flask(__name__)
+        await self.handle_live_post(route, [event.message])
+
+    async def edited_message_handler(self, event: events.MessageEdited.Event) -> None:
+        """
+        Handler for edited messages in specified chats.
+
+        :param event: Event object.
+        """
+        route = self.router.get(event.chat_id)
+        if route is not None:
+            self.edit_sync.edited(route, event.message)
+
+    async def deleted_message_handler(self, event: events.MessageDeleted.Event) -> None:
+        """
+        Handler for messages deleted from specified chats.
+
+        :param event: Event object.
+        """
+        route = self.router.get(event.chat_id)
+        if route is not None:
+            await self.edit_sync.deleted(route, event.deleted_ids)
+
+    async def album_handler(self, messages: List[Message]) -> None:
+        """
+        Handler for a complete album.
+
+        :param messages: The album's messages, in order.
+        """
+        route = self.router.get(messages[0].chat_id)
+        if route is not None:
+            await self.handle_live_post(route, messages)
+
+    async def handle_live_post(self, route: Route, messages: List[Message]) -> None:
+        """
+        Process a post as it arrives, and tell the backfill how it went.
+
+        If processing fails, the messages are left for the next sweep to retry.
+
+        :param route: The route of the messages' channel.
+        :param messages: One message, or an album's messages in order.
+        """
+        chat_id = messages[0].chat_id
+        message_ids = [message.id for message in messages]
+        try:
+            await self.handle_post(route, messages)
+            await self.backfill.handled(chat_id, message_ids)
+        finally:
+            self.backfill.forget(chat_id, message_ids)
+
+    async def handle_post(self, route: Route, messages: List[Message]) -> None:
+        """
+        Process a single message or a whole album, live or backfilled.
+
+        Posts that cannot be parsed are forwarded to the route's alert group.
+
+        :param route: The route of the messages' channel.
+        :param messages: One message, or an album's messages in order; the
+            post text is the caption of one of them.
+        """
+        caption = next((message for message in messages if message.message), None)
+        if caption is None:
+            return
 
+        album = messages if caption.grouped_id else None
+        try:
+            with trace(caption.chat_id, caption.id, "message", channel=route.name):
+                await self.proceed_message(route, caption, album)
+        except (TypeError, ValueError) as e:
+            await send_notifications([route.alert_chat_id], str(e))
+            await self.app.forward_messages(route.alert_chat_id, messages)
+
+    def circuit_changed(self, site: str, state: str) -> None:
+        """
+        Report a WordPress site's circuit breaker changing state.
+
+        :param site: The site.
+        :param state: "open", "half_open" or "closed".
+        """
+        self.health.record_circuit(site, state)
+        if state == OPEN:
+            logger.warning(f"WordPress {site} keeps failing, pausing requests to it")
+            message = f"WordPress {site} is failing; its posts wait in the outbox"
+        elif state == CLOSED:
+            logger.info(f"WordPress {site} is back, resuming requests to it")
+            message = f"WordPress {site} is back; publishing queued posts"
+        else:
+            return
+        asyncio.create_task(send_notifications([], message))
+
+    async def publish_failed_handler(self, item: OutboxItem, error: Exception) -> None:
+        """
+        Report a post that could not be published after all retries.
+
+        :param item: The outbox item that was given up on.
+        :param error: The last error raised while publishing it.
+        """
+        await send_notifications([item.alert_chat_id], str(error))
+        await self.app.forward_messages(
+            item.alert_chat_id, item.message_id, item.chat_id
+        )
 
-@flask_app.route("/health", methods=["GET"])
-def health_check():
-    if app.is_connected():
-        return jsonify({"status": "ok", "message": "Bot is running"}), 200
-    return jsonify({"status": "error", "message": "Bot is not running"}), 500
+    async def publish_cancelled_handler(self, item: OutboxItem) -> None:
+        """
+        Take down a post whose message was deleted while it was being published.
+
+        :param item: The outbox item that was published.
+        """
+        route = self.router.get(item.chat_id)
+        if route is not None:
+            await self.edit_sync.deleted(route, [item.message_id])
+
+    def run(self) -> None:
+        """Connect, serve until Telegram disconnects, then shut down cleanly."""
+        app = self.app
+        with app:
+            logger.info("Client started...")
+            app.loop.run_until_complete(self.router.resolve(app))
+            app.loop.run_until_complete(self.status_server.start())
+            outbox_task = app.loop.create_task(self.outbox_workers.run())
+            health_task = app.loop.create_task(self.health_monitor.run())
+            backfill_task = app.loop.create_task(self.backfill.run())
+            app.run_until_disconnected()
+            outbox_task.cancel()
+            health_task.cancel()
+            backfill_task.cancel()
+            app.loop.run_until_complete(
+                asyncio.gather(
+                    self.status_server.stop(),
+                    outbox_task,
+                    health_task,
+                    backfill_task,
+                    *(site.close() for site in self.sites.values()),
+                    get_notifier().close(),
+                    return_exceptions=True,
+                )
+            )
+            self.outbox.close()
+            self.post_index.close()
+            self.channel_state.close()
+            self.media_cache.close()
+
+
+def create_app(config: Optional[Settings] = None) -> RepostBot:
+    """
+    Configure logging and build the bot without connecting to anything.
 
+    :param config: Settings to use; read from the environment and .env if None.
+    """
+    config = config or get_config()
+    setup_logging(
+        config.log_level,
+        config.log_dir,
+        config.log_max_bytes,
+        config.log_backup_count,
+        config.log_rotate_when,
+    )
+    if config.trace_enabled:
+        setup_tracing(
+            Path(config.log_dir) / "traces.jsonl",
+            config.log_max_bytes,
+            config.log_backup_count,
+        )
+    return RepostBot(config)
 
-def run_flask():
-    flask_app.run(host="0.0.0.0", port=5001)
 
+def main() -> None:
+    try:
+        create_app().run()
+    except Exception as e:
+        logger.error(f"Client encountered an error: {e}")
 
-flask_thread = Thread(target=run_flask)
-flask_thread.start()
 
-try:
-    with app:
-        logger.info("Client started...")
-        app.run_until_disconnected()
-except Exception as e:
-    logger.error(f"Client encountered an error: {e}")
+if __name__ == "__main__":
+    main()
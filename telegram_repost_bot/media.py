@@ -0,0 +1,51 @@
+import mimetypes
+from typing import TYPE_CHECKING, NamedTuple, Optional
+
+if TYPE_CHECKING:
+    from telethon.tl.patched import Message
+
+
+class Photo(NamedTuple):
+    """A photo held in memory, ready to be sent as a multipart upload."""
+
+    data: bytes
+    filename: str
+
+    @property
+    def content_type(self) -> str:
+        return mimetypes.guess_type(self.filename)[0] or "application/octet-stream"
+
+
+class UploadedMedia(NamedTuple):
+    """A photo that is already in a site's media library."""
+
+    id: int
+    source_url: str
+
+
+def photo_filename(message: "Message") -> Optional[str]:
+    """
+    Return the file name a message's photo should be uploaded under.
+
+    Telegram re-encodes every photo as JPEG, so the name is derived from the
+    photo ID rather than from a file the photo was never stored in.
+    """
+    # Imported here so that importing this module does not load Telethon.
+    from telethon.tl.types import MessageMediaPhoto
+
+    if not isinstance(message.media, MessageMediaPhoto) or message.photo is None:
+        return None
+    return f"{message.photo.id}.jpg"
+
+
+async def download_photo(message: "Message") -> Optional[Photo]:
+    """
+    Download a message's photo into memory.
+
+    :param message: Message object.
+    """
+    filename = photo_filename(message)
+    if filename is None:
+        return None
+    data = await message.client.download_media(message, file=bytes)
+    return Photo(data, filename)
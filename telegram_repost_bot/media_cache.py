@@ -0,0 +1,158 @@
+import asyncio
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Awaitable, Callable, Optional
+
+from telegram_repost_bot.logging_config import setup_logger
+from telegram_repost_bot.media import UploadedMedia
+
+logger = setup_logger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS media_files (
+    photo_id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS media_files_last_used ON media_files (last_used);
+CREATE TABLE IF NOT EXISTS media_uploads (
+    photo_id INTEGER NOT NULL,
+    site TEXT NOT NULL,
+    media_id INTEGER NOT NULL,
+    source_url TEXT NOT NULL,
+    PRIMARY KEY (photo_id, site)
+) WITHOUT ROWID;
+"""
+
+
+class MediaCache:
+    """
+    Downloaded Telegram photos and their WordPress uploads, keyed by photo ID.
+
+    Files live in ``directory`` and are evicted least-recently-used first once
+    ``max_bytes`` or ``max_entries`` is exceeded; photos still referenced by a
+    queued outbox post are never evicted. Uploads are remembered per site so a
+    photo that comes back in a corrected or re-posted message is neither
+    downloaded nor uploaded again.
+    """
+
+    def __init__(
+        self,
+        connection: sqlite3.Connection,
+        directory: Path,
+        max_bytes: int,
+        max_entries: int,
+    ) -> None:
+        self._connection = connection
+        self._connection.executescript(SCHEMA)
+        self._directory = directory
+        self._max_bytes = max_bytes
+        self._max_entries = max_entries
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="media-cache"
+        )
+
+    async def _run(self, func: Callable, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    def get_upload(self, photo_id: int, site: str) -> Optional[UploadedMedia]:
+        row = self._connection.execute(
+            "SELECT media_id, source_url FROM media_uploads"
+            " WHERE photo_id = ? AND site = ?",
+            (photo_id, site),
+        ).fetchone()
+        return UploadedMedia(*row) if row else None
+
+    def _record_upload(
+        self, photo_id: int, site: str, media_id: int, source_url: str
+    ) -> None:
+        with self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO media_uploads"
+                " (photo_id, site, media_id, source_url) VALUES (?, ?, ?, ?)",
+                (photo_id, site, media_id, source_url),
+            )
+
+    async def record_upload(
+        self, photo_id: int, site: str, uploaded: UploadedMedia
+    ) -> None:
+        await self._run(
+            self._record_upload, photo_id, site, uploaded.id, uploaded.source_url
+        )
+
+    def _touch(self, photo_id: int) -> Optional[str]:
+        row = self._connection.execute(
+            "SELECT path FROM media_files WHERE photo_id = ?", (photo_id,)
+        ).fetchone()
+        if row is None or not Path(row[0]).exists():
+            self._directory.mkdir(parents=True, exist_ok=True)
+            return None
+        with self._connection:
+            self._connection.execute(
+                "UPDATE media_files SET last_used = ? WHERE photo_id = ?",
+                (time.time(), photo_id),
+            )
+        return row[0]
+
+    def _store(self, photo_id: int, path: str) -> None:
+        size = Path(path).stat().st_size
+        with self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO media_files (photo_id, path, size, last_used)"
+                " VALUES (?, ?, ?, ?)",
+                (photo_id, path, size, time.time()),
+            )
+        self._evict()
+
+    def _evict(self) -> None:
+        count, total = self._connection.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM media_files"
+        ).fetchone()
+        if count <= self._max_entries and total <= self._max_bytes:
+            return
+        # Oldest first, skipping photos a queued post is still waiting to upload.
+        candidates = self._connection.execute(
+            "SELECT photo_id, path, size FROM media_files"
+            " WHERE photo_id NOT IN"
+            " (SELECT photo_id FROM outbox_photos WHERE photo_id IS NOT NULL)"
+            " ORDER BY last_used"
+        ).fetchall()
+        evicted = []
+        for photo_id, path, size in candidates:
+            if count <= self._max_entries and total <= self._max_bytes:
+                break
+            Path(path).unlink(missing_ok=True)
+            evicted.append((photo_id,))
+            count -= 1
+            total -= size
+        with self._connection:
+            self._connection.executemany(
+                "DELETE FROM media_files WHERE photo_id = ?", evicted
+            )
+        logger.info(f"Evicted {len(evicted)} photos from the media cache")
+
+    async def get_or_download(
+        self, photo_id: int, download: Callable[[str], Awaitable[str]]
+    ) -> str:
+        """
+        Return the path of a cached photo, downloading it on a miss.
+
+        :param photo_id: Telegram photo ID.
+        :param download: Coroutine function that saves the photo to the given
+            path and returns the path it actually wrote.
+        """
+        path = await self._run(self._touch, photo_id)
+        if path is not None:
+            logger.info(f"Media cache hit for photo {photo_id}")
+            return path
+        path = await download(str(self._directory / f"{photo_id}.jpg"))
+        await self._run(self._store, photo_id, path)
+        return path
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True)
+        self._connection.close()
@@ -0,0 +1,204 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Sequence, Tuple
+
+from telegram_repost_bot.tracing import span
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; covers both sub-millisecond parsing and multi-minute publish retries.
+DEFAULT_BUCKETS = (
+    0.001,
+    0.005,
+    0.01,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+    300.0,
+    900.0,
+    3600.0,
+)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str]) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+        with self._lock:
+            lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str]) -> None:
+        super().__init__(name, documentation, labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def _samples(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.label_names, key)} {value}"
+            for key, value in self._values.items()
+        ]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: Sequence[str],
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, documentation, labels)
+        self._buckets = tuple(sorted(buckets))
+        # Per label set: non-cumulative bucket counts (last one is +Inf) and sum.
+        self._values: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.setdefault(
+                key, ([0] * (len(self._buckets) + 1), [0.0])
+            )
+            counts[bisect_left(self._buckets, value)] += 1
+            total[0] += value
+
+    def count(self, **labels: str) -> int:
+        counts, _ = self._values.get(self._key(labels), ([], [0.0]))
+        return sum(counts)
+
+    def _samples(self) -> List[str]:
+        samples = []
+        names = (*self.label_names, "le")
+        for key, (counts, total) in self._values.items():
+            cumulative = 0
+            for bound, count in zip((*self._buckets, float("inf")), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                samples.append(
+                    f"{self.name}_bucket{_format_labels(names, (*key, le))} {cumulative}"
+                )
+            labels = _format_labels(self.label_names, key)
+            samples.append(f"{self.name}_sum{labels} {total[0]}")
+            samples.append(f"{self.name}_count{labels} {cumulative}")
+        return samples
+
+
+class Registry:
+    """A set of metrics rendered together in the Prometheus text format."""
+
+    def __init__(self) -> None:
+        self._metrics: List[_Metric] = []
+
+    def counter(self, name: str, documentation: str, labels: Sequence[str]) -> Counter:
+        metric = Counter(name, documentation, labels)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(
+        self, name: str, documentation: str, labels: Sequence[str], **kwargs
+    ) -> Histogram:
+        metric = Histogram(name, documentation, labels, **kwargs)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        return "\n".join(metric.render() for metric in self._metrics) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_LABELS = ("stage", "channel", "site")
+STAGE_SECONDS = REGISTRY.histogram(
+    "repost_stage_duration_seconds", "Time spent in a pipeline stage.", STAGE_LABELS
+)
+STAGE_TOTAL = REGISTRY.counter(
+    "repost_stage_total", "Pipeline stage runs, including failed ones.", STAGE_LABELS
+)
+STAGE_ERRORS = REGISTRY.counter(
+    "repost_stage_errors_total",
+    "Pipeline stage failures by exception type.",
+    (*STAGE_LABELS, "error"),
+)
+TIME_TO_PUBLISH = REGISTRY.histogram(
+    "repost_time_to_publish_seconds",
+    "Time from a message being posted in Telegram to its WordPress post existing.",
+    ("site",),
+)
+
+
+@contextmanager
+def track(stage: str, channel: str = "", site: str = "") -> Iterator[None]:
+    """
+    Count and time one run of a pipeline stage.
+
+    Works around awaits as well: ``with track("parse_post", channel=...)``.
+    Exceptions are counted by type and re-raised. Inside a message's trace
+    the stage is also recorded as a span.
+
+    :param stage: Stage name, e.g. "parse_post".
+    :param channel: Telegram channel username, if the stage knows it.
+    :param site: WordPress site key, if the stage knows it.
+    """
+    started = time.perf_counter()
+    try:
+        with span(stage, site=site):
+            yield
+    except Exception as e:
+        STAGE_ERRORS.inc(
+            stage=stage, channel=channel, site=site, error=type(e).__name__
+        )
+        raise
+    finally:
+        STAGE_SECONDS.observe(
+            time.perf_counter() - started, stage=stage, channel=channel, site=site
+        )
+        STAGE_TOTAL.inc(stage=stage, channel=channel, site=site)
@@ -0,0 +1,656 @@
+import asyncio
+import json
+import sqlite3
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import (
+    TYPE_CHECKING,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Union,
+)
+
+from telegram_repost_bot.logging_config import setup_logger
+from telegram_repost_bot.media import Photo, UploadedMedia
+from telegram_repost_bot.media_cache import MediaCache
+from telegram_repost_bot.metrics import TIME_TO_PUBLISH
+from telegram_repost_bot.post_index import PostIndex, Revision
+from telegram_repost_bot.rate_limit import RateLimited, backoff
+from telegram_repost_bot.tracing import trace
+from telegram_repost_bot.storage import add_missing_columns
+
+if TYPE_CHECKING:
+    from telegram_repost_bot.wp_api import BaseApi
+
+logger = setup_logger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY,
+    site TEXT NOT NULL,
+    chat_id INTEGER NOT NULL,
+    message_id INTEGER NOT NULL,
+    alert_chat_id INTEGER NOT NULL,
+    title TEXT NOT NULL,
+    content TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    last_error TEXT,
+    created_at REAL NOT NULL,
+    author_id TEXT,
+    categories TEXT,
+    tags TEXT,
+    submitted INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS outbox_next_attempt_at ON outbox (next_attempt_at);
+CREATE UNIQUE INDEX IF NOT EXISTS outbox_message
+    ON outbox (chat_id, message_id, site);
+CREATE TABLE IF NOT EXISTS outbox_photos (
+    outbox_id INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    photo_id INTEGER,
+    media_path TEXT,
+    media_name TEXT,
+    message_id INTEGER,
+    PRIMARY KEY (outbox_id, position)
+) WITHOUT ROWID;
+"""
+
+
+@dataclass
+class OutboxPhoto:
+    """
+    One photo of a queued post.
+
+    Depending on the media mode it is held in ``media``, saved at
+    ``media_path``, or neither if every target site already has it uploaded.
+    ``media`` is only kept in memory: after a restart the photo is downloaded
+    again from its message, ``message_id`` in the post's chat.
+    """
+
+    photo_id: Optional[int] = None
+    media_path: Optional[str] = None
+    media: Optional[bytes] = None
+    media_name: Optional[str] = None
+    message_id: Optional[int] = None
+
+    @property
+    def image(self) -> Union[Photo, str, None]:
+        """The photo in the form ``upload_image_to_wordpress`` takes."""
+        if self.media is not None:
+            return Photo(self.media, self.media_name)
+        return self.media_path
+
+
+@dataclass
+class OutboxItem:
+    site: str
+    chat_id: int
+    message_id: int
+    alert_chat_id: int
+    title: str
+    content: str
+    photos: List[OutboxPhoto] = field(default_factory=list)
+    id: Optional[int] = None
+    attempts: int = 0
+    last_error: Optional[str] = None
+    # When the message was posted in Telegram; defaults to the enqueue time.
+    created_at: Optional[float] = None
+    # Route overrides of the site's author and categories.
+    author_id: Optional[str] = None
+    categories: Optional[List[int]] = None
+    tags: Optional[List[int]] = None
+    # Set before the post is sent, so it is looked up before being sent again.
+    submitted: bool = False
+
+
+class Outbox:
+    """
+    Persistent queue of posts accepted from Telegram but not yet published.
+
+    Rows are deleted once they are published or given up on, so the table only
+    ever holds the backlog. All SQLite access runs on one background thread so
+    the event loop never waits on disk I/O. Photos held in memory stay with
+    the queued items in memory; only a reference to them is saved.
+    """
+
+    _fields = (
+        "id",
+        "site",
+        "chat_id",
+        "message_id",
+        "alert_chat_id",
+        "title",
+        "content",
+        "attempts",
+        "last_error",
+        "created_at",
+        "author_id",
+        "categories",
+        "tags",
+        "submitted",
+    )
+
+    def __init__(self, connection: sqlite3.Connection) -> None:
+        self._connection = connection
+        self._connection.executescript(SCHEMA)
+        add_missing_columns(
+            self._connection,
+            "outbox",
+            {
+                "author_id": "TEXT",
+                "categories": "TEXT",
+                "tags": "TEXT",
+                "submitted": "INTEGER NOT NULL DEFAULT 0",
+            },
+        )
+        add_missing_columns(
+            self._connection, "outbox_photos", {"message_id": "INTEGER"}
+        )
+        # The photos of queued items by outbox ID, with their bytes if any.
+        self._photos: Dict[int, List[OutboxPhoto]] = {}
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="outbox")
+
+    async def _run(self, func: Callable, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    def _enqueue(self, items: List[OutboxItem]) -> List[Optional[int]]:
+        now = time.time()
+        with self._connection:
+            return [self._insert(item, now) for item in items]
+
+    def _insert(self, item: OutboxItem, now: float) -> Optional[int]:
+        cursor = self._connection.execute(
+            "INSERT OR IGNORE INTO outbox (site, chat_id, message_id,"
+            " alert_chat_id, title, content, next_attempt_at, created_at,"
+            " author_id, categories, tags)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                item.site,
+                item.chat_id,
+                item.message_id,
+                item.alert_chat_id,
+                item.title,
+                item.content,
+                now,
+                item.created_at or now,
+                item.author_id,
+                None if item.categories is None else json.dumps(item.categories),
+                None if item.tags is None else json.dumps(item.tags),
+            ),
+        )
+        if not cursor.rowcount:
+            return None
+        item_id = cursor.lastrowid
+        self._connection.executemany(
+            "INSERT INTO outbox_photos (outbox_id, position, photo_id,"
+            " media_path, media_name, message_id) VALUES (?, ?, ?, ?, ?, ?)",
+            [
+                (
+                    item_id,
+                    position,
+                    photo.photo_id,
+                    photo.media_path,
+                    photo.media_name,
+                    photo.message_id,
+                )
+                for position, photo in enumerate(item.photos)
+            ],
+        )
+        return item_id
+
+    async def enqueue(self, item: OutboxItem) -> Optional[int]:
+        """
+        Persist a post and return its outbox ID.
+
+        Returns None if the same message is already queued for the same site.
+        """
+        (item_id,) = await self.enqueue_many([item])
+        return item_id
+
+    async def enqueue_many(self, items: List[OutboxItem]) -> List[Optional[int]]:
+        """
+        Persist the copies of a post for several sites in one transaction.
+
+        Returns their outbox IDs, with None for copies that were already queued.
+        """
+        item_ids = await self._run(self._enqueue, items)
+        for item, item_id in zip(items, item_ids):
+            item.id = item_id
+            if item_id is not None:
+                self._photos[item_id] = item.photos
+        return item_ids
+
+    def _next_due(
+        self, now: float, exclude: List[int], exclude_sites: List[str]
+    ) -> Optional[OutboxItem]:
+        placeholders = ",".join("?" * len(exclude))
+        site_placeholders = ",".join("?" * len(exclude_sites))
+        row = self._connection.execute(
+            f"SELECT {', '.join(self._fields)} FROM outbox"
+            f" WHERE next_attempt_at <= ? AND id NOT IN ({placeholders})"
+            f" AND site NOT IN ({site_placeholders})"
+            " ORDER BY next_attempt_at LIMIT 1",
+            (now, *exclude, *exclude_sites),
+        ).fetchone()
+        if row is None:
+            return None
+        item = OutboxItem(**dict(zip(self._fields, row)))
+        if item.categories is not None:
+            item.categories = json.loads(item.categories)
+        if item.tags is not None:
+            item.tags = json.loads(item.tags)
+        item.submitted = bool(item.submitted)
+        item.photos = [
+            OutboxPhoto(
+                photo_id, media_path, media_name=media_name, message_id=message_id
+            )
+            for photo_id, media_path, media_name, message_id in self._connection.execute(
+                "SELECT photo_id, media_path, media_name, message_id FROM outbox_photos"
+                " WHERE outbox_id = ? ORDER BY position",
+                (item.id,),
+            )
+        ]
+        return item
+
+    async def next_due(
+        self, exclude: Iterable[int], exclude_sites: Iterable[str] = ()
+    ) -> Optional[OutboxItem]:
+        """
+        Return the oldest post that is due for an attempt.
+
+        :param exclude: IDs already being worked on.
+        :param exclude_sites: Sites that cannot take another post right now.
+        """
+        item = await self._run(
+            self._next_due, time.time(), list(exclude), list(exclude_sites)
+        )
+        if item is not None:
+            # Photos downloaded again after a restart are kept for retries too.
+            item.photos = self._photos.setdefault(item.id, item.photos)
+        return item
+
+    def _next_attempt_at(
+        self, exclude: List[int], exclude_sites: List[str]
+    ) -> Optional[float]:
+        placeholders = ",".join("?" * len(exclude))
+        site_placeholders = ",".join("?" * len(exclude_sites))
+        row = self._connection.execute(
+            "SELECT MIN(next_attempt_at) FROM outbox"
+            f" WHERE id NOT IN ({placeholders})"
+            f" AND site NOT IN ({site_placeholders})",
+            (*exclude, *exclude_sites),
+        ).fetchone()
+        return row[0]
+
+    async def next_attempt_at(
+        self, exclude: Iterable[int], exclude_sites: Iterable[str] = ()
+    ) -> Optional[float]:
+        """
+        Return the earliest scheduled attempt, or None if nothing is waiting.
+
+        :param exclude: IDs already being worked on.
+        :param exclude_sites: Sites that cannot take another post right now.
+        """
+        return await self._run(
+            self._next_attempt_at, list(exclude), list(exclude_sites)
+        )
+
+    def _remove(self, item_id: int) -> bool:
+        with self._connection:
+            self._connection.execute(
+                "DELETE FROM outbox_photos WHERE outbox_id = ?", (item_id,)
+            )
+            return bool(
+                self._connection.execute(
+                    "DELETE FROM outbox WHERE id = ?", (item_id,)
+                ).rowcount
+            )
+
+    async def remove(self, item_id: int) -> bool:
+        """Drop a post; return False if it had been cancelled already."""
+        self._photos.pop(item_id, None)
+        return await self._run(self._remove, item_id)
+
+    def _cancel(self, chat_id: int, message_id: int) -> List[int]:
+        with self._connection:
+            item_ids = [
+                item_id
+                for (item_id,) in self._connection.execute(
+                    "SELECT id FROM outbox WHERE chat_id = ? AND message_id = ?",
+                    (chat_id, message_id),
+                )
+            ]
+            self._connection.executemany(
+                "DELETE FROM outbox_photos WHERE outbox_id = ?",
+                [(item_id,) for item_id in item_ids],
+            )
+            self._connection.executemany(
+                "DELETE FROM outbox WHERE id = ?", [(item_id,) for item_id in item_ids]
+            )
+            return item_ids
+
+    async def cancel(self, chat_id: int, message_id: int) -> int:
+        """Drop every queued copy of a message; return how many there were."""
+        item_ids = await self._run(self._cancel, chat_id, message_id)
+        for item_id in item_ids:
+            self._photos.pop(item_id, None)
+        return len(item_ids)
+
+    def _update_text(
+        self, chat_id: int, message_id: int, title: str, content: str
+    ) -> int:
+        with self._connection:
+            return self._connection.execute(
+                "UPDATE outbox SET title = ?, content = ?"
+                " WHERE chat_id = ? AND message_id = ?",
+                (title, content, chat_id, message_id),
+            ).rowcount
+
+    async def update_text(
+        self, chat_id: int, message_id: int, title: str, content: str
+    ) -> int:
+        """Edit every queued copy of a message; return how many there were."""
+        return await self._run(self._update_text, chat_id, message_id, title, content)
+
+    def _mark_submitted(self, item_id: int) -> None:
+        with self._connection:
+            self._connection.execute(
+                "UPDATE outbox SET submitted = 1 WHERE id = ?", (item_id,)
+            )
+
+    async def mark_submitted(self, item_id: int) -> None:
+        """Record that a post is about to be sent to its site."""
+        await self._run(self._mark_submitted, item_id)
+
+    def _reschedule(
+        self, item_id: int, next_attempt_at: float, error: str, attempted: bool
+    ) -> None:
+        with self._connection:
+            self._connection.execute(
+                "UPDATE outbox SET attempts = attempts + ?, next_attempt_at = ?,"
+                " last_error = ? WHERE id = ?",
+                (int(attempted), next_attempt_at, error, item_id),
+            )
+
+    async def reschedule(
+        self, item_id: int, delay: float, error: str, attempted: bool = True
+    ) -> None:
+        """
+        Schedule another attempt at a post in ``delay`` seconds.
+
+        :param attempted: Whether the failure counts towards giving up.
+        """
+        await self._run(
+            self._reschedule, item_id, time.time() + delay, error, attempted
+        )
+
+    def _pending(self) -> int:
+        return self._connection.execute("SELECT COUNT(*) FROM outbox").fetchone()[0]
+
+    async def pending(self) -> int:
+        return await self._run(self._pending)
+
+    def _pending_by_site(self) -> Dict[str, int]:
+        return dict(
+            self._connection.execute(
+                "SELECT site, COUNT(*) FROM outbox GROUP BY site"
+            ).fetchall()
+        )
+
+    async def pending_by_site(self) -> Dict[str, int]:
+        """Return how many posts are waiting for each site that has any."""
+        return await self._run(self._pending_by_site)
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True)
+        self._connection.close()
+
+
+class OutboxWorkerPool:
+    """
+    Drain the outbox into WordPress with a fixed number of async workers.
+
+    Failed posts are retried with exponential backoff; once ``max_attempts``
+    is reached ``on_failure`` is called and the post is dropped from the queue.
+    A site that is throttling us only delays its posts, for at least as long
+    as it asked, and never makes them fail.
+    ``on_published`` is called after each successful publish. A post whose
+    message was deleted while it was being published is recorded as published
+    all the same, then handed to ``on_cancelled`` to be taken down.
+
+    Each copy of a post is its own item, so every site succeeds, retries and
+    gives up independently. Workers only claim items for sites with fewer than
+    ``site_concurrency`` posts in flight, so a slow site never ties up the
+    workers that other sites' posts are waiting for.
+
+    Photos whose bytes were lost with a restart are fetched again with
+    ``download``, given the chat and message ID of the photo.
+    """
+
+    def __init__(
+        self,
+        outbox: Outbox,
+        post_index: PostIndex,
+        sites: Dict[str, "BaseApi"],
+        on_failure: Callable[[OutboxItem, Exception], Awaitable[None]],
+        workers: int = 4,
+        site_concurrency: int = 2,
+        base_delay: float = 5.0,
+        max_delay: float = 600.0,
+        max_attempts: int = 8,
+        poll_interval: float = 30.0,
+        media_cache: Optional[MediaCache] = None,
+        upload_concurrency: int = 4,
+        on_published: Optional[Callable[[OutboxItem], None]] = None,
+        on_cancelled: Optional[Callable[[OutboxItem], Awaitable[None]]] = None,
+        download: Optional[Callable[[int, int], Awaitable[Optional[Photo]]]] = None,
+    ) -> None:
+        self._outbox = outbox
+        self._media_cache = media_cache
+        self._post_index = post_index
+        self._sites = sites
+        self._on_failure = on_failure
+        self._on_published = on_published
+        self._on_cancelled = on_cancelled
+        self._download = download
+        self._workers = workers
+        self._site_concurrency = site_concurrency
+        self._base_delay = base_delay
+        self._max_delay = max_delay
+        self._max_attempts = max_attempts
+        self._poll_interval = poll_interval
+        self._upload_semaphore = asyncio.Semaphore(upload_concurrency)
+        self._in_flight: set[int] = set()
+        self._in_flight_sites: Counter = Counter()
+        self._claim_lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+
+    def notify(self) -> None:
+        """Wake idle workers, e.g. after a new post has been enqueued."""
+        self._wakeup.set()
+
+    async def run(self) -> None:
+        await asyncio.gather(*(self._worker(n) for n in range(self._workers)))
+
+    def _saturated_sites(self) -> List[str]:
+        return [
+            site
+            for site, count in self._in_flight_sites.items()
+            if count >= self._site_concurrency
+        ]
+
+    async def _claim(self) -> Optional[OutboxItem]:
+        async with self._claim_lock:
+            item = await self._outbox.next_due(self._in_flight, self._saturated_sites())
+            if item is not None:
+                self._in_flight.add(item.id)
+                self._in_flight_sites[item.site] += 1
+            return item
+
+    def _release(self, item: OutboxItem) -> None:
+        self._in_flight.discard(item.id)
+        self._in_flight_sites[item.site] -= 1
+        # A worker may be idle only because this item's site was saturated.
+        self._wakeup.set()
+
+    async def _wait_for_work(self) -> None:
+        # Clear before looking at the queue so that a post enqueued meanwhile
+        # either shows up in the query or sets the event again.
+        self._wakeup.clear()
+        next_attempt_at = await self._outbox.next_attempt_at(
+            self._in_flight, self._saturated_sites()
+        )
+        timeout = self._poll_interval
+        if next_attempt_at is not None:
+            timeout = min(timeout, max(next_attempt_at - time.time(), 0.05))
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _worker(self, number: int) -> None:
+        while True:
+            try:
+                item = await self._claim()
+                if item is None:
+                    await self._wait_for_work()
+                    continue
+                try:
+                    await self._publish(item)
+                finally:
+                    self._release(item)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Outbox worker {number} crashed: {e!r}", exc_info=True)
+                await asyncio.sleep(self._base_delay)
+
+    def _backoff(self, attempts: int) -> float:
+        return backoff(attempts, self._base_delay, self._max_delay)
+
+    async def _upload_photo(
+        self, site: "BaseApi", item: OutboxItem, photo: OutboxPhoto
+    ) -> Optional[UploadedMedia]:
+        """Upload one photo, reusing an earlier upload of the same photo."""
+        site_name = item.site
+        if photo.photo_id is not None and self._media_cache is not None:
+            uploaded = self._media_cache.get_upload(photo.photo_id, site_name)
+            if uploaded is not None:
+                return uploaded
+        if (
+            photo.image is None
+            and photo.message_id is not None
+            and self._download is not None
+        ):
+            downloaded = await self._download(item.chat_id, photo.message_id)
+            if downloaded is not None:
+                photo.media, photo.media_name = downloaded.data, downloaded.filename
+        if photo.image is None:
+            return None
+        async with self._upload_semaphore:
+            uploaded = await site.upload_image_to_wordpress(photo.image)
+        if photo.photo_id is not None and self._media_cache is not None:
+            await self._media_cache.record_upload(photo.photo_id, site_name, uploaded)
+        return uploaded
+
+    async def _upload_photos(
+        self, site: "BaseApi", item: OutboxItem
+    ) -> List[UploadedMedia]:
+        """Upload all of an item's photos concurrently, keeping their order."""
+        uploaded = await asyncio.gather(
+            *(self._upload_photo(site, item, photo) for photo in item.photos)
+        )
+        return [media for media in uploaded if media is not None]
+
+    async def _publish(self, item: OutboxItem) -> None:
+        with trace(
+            item.chat_id, item.message_id, "publish", site=item.site, outbox_id=item.id
+        ):
+            await self._publish_item(item)
+
+    async def _publish_item(self, item: OutboxItem) -> None:
+        if self._post_index.is_published(item.chat_id, item.message_id, item.site):
+            logger.info(f"Outbox item {item.id} is already on {item.site}, dropping")
+            await self._outbox.remove(item.id)
+            return
+
+        site = self._sites[item.site]
+        try:
+            post_id = media_id = revision = None
+            if item.submitted or item.attempts:
+                # An earlier attempt may have timed out, or the bot may have
+                # stopped, after WordPress had already created the post.
+                post_id = await site.find_published_post(
+                    item.title,
+                    datetime.fromtimestamp(item.created_at),
+                    item.author_id,
+                )
+            if post_id is None:
+                images = await self._upload_photos(site, item)
+                if not item.submitted:
+                    await self._outbox.mark_submitted(item.id)
+                post_id, media_id = await site.publish_post_to_wordpress(
+                    item.title,
+                    item.content,
+                    images[0] if images else None,
+                    gallery=images[1:],
+                    author_id=item.author_id,
+                    categories=item.categories,
+                    tags=item.tags,
+                )
+                revision = Revision.of(
+                    item.title,
+                    item.content,
+                    [photo.photo_id for photo in item.photos],
+                    [media.id for media in images[1:]],
+                )
+            else:
+                logger.info(f"Outbox item {item.id} was already published as {post_id}")
+        except Exception as e:
+            # Throttling says nothing about the post, so it is not counted as
+            # an attempt: it neither brings giving up closer nor grows the backoff.
+            throttled = isinstance(e, RateLimited)
+            attempts = item.attempts + (not throttled)
+            if attempts >= self._max_attempts and not throttled:
+                logger.error(
+                    f"Giving up on outbox item {item.id} for {item.site} "
+                    f"after {attempts} attempts: {e!r}"
+                )
+                await self._outbox.remove(item.id)
+                await self._on_failure(item, e)
+                return
+            delay = self._backoff(item.attempts)
+            if throttled and e.retry_after is not None:
+                delay = max(delay, e.retry_after)
+            logger.warning(
+                f"Outbox item {item.id} for {item.site} failed "
+                f"(attempt {attempts}), retrying in {delay:.1f}s: {e!r}"
+            )
+            await self._outbox.reschedule(
+                item.id, delay, repr(e), attempted=not throttled
+            )
+            return
+        await self._post_index.record(
+            item.chat_id, item.message_id, item.site, post_id, media_id, revision
+        )
+        if not await self._outbox.remove(item.id):
+            logger.info(
+                f"Message {item.message_id} of outbox item {item.id} was deleted"
+                f" while it was published to {item.site}"
+            )
+            if self._on_cancelled is not None:
+                await self._on_cancelled(item)
+            return
+        TIME_TO_PUBLISH.observe(time.time() - item.created_at, site=item.site)
+        if self._on_published is not None:
+            self._on_published(item)
+        logger.info(f"Outbox item {item.id} published to {item.site}")
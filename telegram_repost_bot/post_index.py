@@ -0,0 +1,208 @@
+import asyncio
+import hashlib
+import json
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, NamedTuple, Optional, Tuple
+
+from telegram_repost_bot.logging_config import setup_logger
+from telegram_repost_bot.storage import add_missing_columns
+
+logger = setup_logger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS published_posts (
+    chat_id INTEGER NOT NULL,
+    message_id INTEGER NOT NULL,
+    site TEXT NOT NULL,
+    post_id INTEGER NOT NULL,
+    media_id INTEGER,
+    title_digest TEXT,
+    content_digest TEXT,
+    photo_ids TEXT,
+    gallery_ids TEXT,
+    PRIMARY KEY (chat_id, message_id, site)
+) WITHOUT ROWID;
+"""
+
+
+class PublishedPost(NamedTuple):
+    post_id: int
+    media_id: Optional[int]
+
+
+def digest(text: str) -> str:
+    return hashlib.blake2b(text.encode(), digest_size=8).hexdigest()
+
+
+class Revision(NamedTuple):
+    """What a published post was last rendered from, to detect edits."""
+
+    title_digest: str
+    content_digest: str
+    photo_ids: Tuple[int, ...]  # Telegram photos, the featured one first
+    gallery_ids: Tuple[int, ...]  # WordPress media in the post's gallery
+
+    @classmethod
+    def of(
+        cls,
+        title: str,
+        content: str,
+        photo_ids: List[Optional[int]] = (),
+        gallery_ids: List[int] = (),
+    ) -> "Revision":
+        return cls(
+            digest(title),
+            digest(content),
+            tuple(photo_id for photo_id in photo_ids if photo_id is not None),
+            tuple(gallery_ids),
+        )
+
+
+class PostIndex:
+    """
+    Map Telegram messages to the WordPress posts created from them.
+
+    The table is clustered on its primary key (``WITHOUT ROWID``), so a lookup
+    is a single B-tree probe and each row costs a few dozen bytes. Lookups run
+    synchronously because they take microseconds; writes go through a
+    background thread like the outbox's.
+
+    Each row also keeps short digests of what the post was rendered from, so
+    an edit in Telegram can be compared with it without asking WordPress.
+    """
+
+    def __init__(self, connection: sqlite3.Connection) -> None:
+        self._connection = connection
+        self._connection.executescript(SCHEMA)
+        add_missing_columns(
+            self._connection,
+            "published_posts",
+            {
+                "title_digest": "TEXT",
+                "content_digest": "TEXT",
+                "photo_ids": "TEXT",
+                "gallery_ids": "TEXT",
+            },
+        )
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="post-index"
+        )
+
+    def get(self, chat_id: int, message_id: int, site: str) -> Optional[PublishedPost]:
+        row = self._connection.execute(
+            "SELECT post_id, media_id FROM published_posts"
+            " WHERE chat_id = ? AND message_id = ? AND site = ?",
+            (chat_id, message_id, site),
+        ).fetchone()
+        return PublishedPost(*row) if row else None
+
+    def is_published(self, chat_id: int, message_id: int, site: str) -> bool:
+        return self.get(chat_id, message_id, site) is not None
+
+    def get_revision(
+        self, chat_id: int, message_id: int, site: str
+    ) -> Optional[Revision]:
+        """Return what a post was last rendered from; None if not recorded."""
+        row = self._connection.execute(
+            "SELECT title_digest, content_digest, photo_ids, gallery_ids"
+            " FROM published_posts WHERE chat_id = ? AND message_id = ? AND site = ?",
+            (chat_id, message_id, site),
+        ).fetchone()
+        if row is None or row[0] is None:
+            return None
+        title_digest, content_digest, photo_ids, gallery_ids = row
+        return Revision(
+            title_digest,
+            content_digest,
+            tuple(json.loads(photo_ids)),
+            tuple(json.loads(gallery_ids)),
+        )
+
+    def sites_of(self, chat_id: int, message_id: int) -> List[str]:
+        """Return the sites a message was published to."""
+        return [
+            site
+            for (site,) in self._connection.execute(
+                "SELECT site FROM published_posts WHERE chat_id = ? AND message_id = ?",
+                (chat_id, message_id),
+            )
+        ]
+
+    def _record(
+        self,
+        chat_id: int,
+        message_id: int,
+        site: str,
+        post_id: int,
+        media_id: Optional[int],
+        revision: Optional[Revision],
+    ) -> None:
+        title_digest = content_digest = photo_ids = gallery_ids = None
+        if revision is not None:
+            title_digest, content_digest = (
+                revision.title_digest,
+                revision.content_digest,
+            )
+            photo_ids = json.dumps(revision.photo_ids)
+            gallery_ids = json.dumps(revision.gallery_ids)
+        with self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO published_posts"
+                " (chat_id, message_id, site, post_id, media_id, title_digest,"
+                " content_digest, photo_ids, gallery_ids)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    chat_id,
+                    message_id,
+                    site,
+                    post_id,
+                    media_id,
+                    title_digest,
+                    content_digest,
+                    photo_ids,
+                    gallery_ids,
+                ),
+            )
+
+    async def record(
+        self,
+        chat_id: int,
+        message_id: int,
+        site: str,
+        post_id: int,
+        media_id: Optional[int] = None,
+        revision: Optional[Revision] = None,
+    ) -> None:
+        """Remember that a message was published to ``site`` as ``post_id``."""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(
+            self._executor,
+            self._record,
+            chat_id,
+            message_id,
+            site,
+            post_id,
+            media_id,
+            revision,
+        )
+        logger.info(f"Message {message_id} from {chat_id} is post {post_id} on {site}")
+
+    def _forget(self, chat_id: int, message_id: int, site: str) -> None:
+        with self._connection:
+            self._connection.execute(
+                "DELETE FROM published_posts"
+                " WHERE chat_id = ? AND message_id = ? AND site = ?",
+                (chat_id, message_id, site),
+            )
+
+    async def forget(self, chat_id: int, message_id: int, site: str) -> None:
+        """Drop the mapping of a message whose post was taken down."""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(
+            self._executor, self._forget, chat_id, message_id, site
+        )
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True)
+        self._connection.close()
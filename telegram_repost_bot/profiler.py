@@ -0,0 +1,49 @@
+import os
+import sys
+import time
+from collections import Counter
+from types import FrameType
+
+
+def _collapse(frame: FrameType) -> str:
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        filename = os.path.basename(code.co_filename)
+        names.append(f"{code.co_name} ({filename}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+def sample_stacks(thread_id: int, seconds: float, interval: float = 0.005) -> Counter:
+    """
+    Sample the stack of a running thread and count how often each one is seen.
+
+    Meant to run on a thread of its own while the sampled thread, usually the
+    event loop, keeps working; it only reads frames, so the overhead on the
+    sampled thread is limited to the GIL switches.
+
+    :param thread_id: ``threading.get_ident()`` of the thread to sample.
+    :param seconds: How long to sample for.
+    :param interval: Seconds between samples.
+    """
+    stacks: Counter = Counter()
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        frame = sys._current_frames().get(thread_id)
+        if frame is None:
+            break
+        stacks[_collapse(frame)] += 1
+        del frame
+        time.sleep(interval)
+    return stacks
+
+
+def render_collapsed(stacks: Counter) -> str:
+    """
+    Format stack counts as collapsed stacks, most frequent first.
+
+    One ``outer;...;inner count`` line per stack, the input format of
+    flamegraph.pl, speedscope and similar tools.
+    """
+    return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
@@ -0,0 +1,87 @@
+import asyncio
+import random
+import time
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+from aiohttp import ClientError
+
+# Statuses that mean "not now" rather than "never" and that WordPress answers
+# without having acted on the request, so even a POST can be sent again. A 502
+# or 504 may come after the post was created; those are left to the outbox,
+# which looks for the post before retrying.
+RETRYABLE_STATUSES = frozenset({429, 503})
+
+
+class RateLimited(ClientError):
+    """WordPress kept throttling or failing a request that is safe to retry."""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None) -> None:
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """
+    Allow ``rate`` requests per second on average, in bursts of up to ``burst``.
+
+    Callers wait in ``acquire`` in arrival order until a token is available.
+    ``pause`` stops handing out tokens for a while, e.g. for a ``Retry-After``
+    the server sent, so every request to the site backs off, not just the one
+    that was throttled. A ``rate`` of 0 disables the limit but not pauses.
+    """
+
+    def __init__(self, rate: float, burst: int = 1) -> None:
+        self._rate = rate
+        self._capacity = max(burst, 1)
+        self._tokens = float(self._capacity)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def pause(self, seconds: float) -> None:
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                if self._rate <= 0:
+                    return
+                self._tokens = min(
+                    self._capacity, self._tokens + (now - self._updated) * self._rate
+                )
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self._rate)
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Return the seconds to wait from a ``Retry-After`` header, if it has any.
+
+    :param value: Either a number of seconds or an HTTP date.
+    """
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        retry_at: datetime = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(retry_at.timestamp() - time.time(), 0.0)
+
+
+def backoff(attempt: int, base: float, cap: float) -> float:
+    """Exponential backoff with jitter: up to ``base * 2**attempt``, capped."""
+    delay = min(cap, base * 2**attempt)
+    return delay * random.uniform(0.5, 1.0)
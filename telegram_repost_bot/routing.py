@@ -0,0 +1,157 @@
+from dataclasses import dataclass, field
+from typing import (
+    TYPE_CHECKING,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
+
+from telegram_repost_bot.classifier import Classifier, Rule
+from telegram_repost_bot.logging_config import setup_logger
+
+if TYPE_CHECKING:
+    from telethon import TelegramClient
+
+    from telegram_repost_bot.config_reader import Settings
+
+logger = setup_logger(__name__)
+
+
+@dataclass(frozen=True)
+class Target:
+    """A WordPress site a channel's posts go to, with per-channel overrides."""
+
+    site: str
+    author_id: Optional[str] = None  # None: the site's own author
+    categories: Optional[Tuple[int, ...]] = None  # None: the site's categories
+
+
+@dataclass
+class Route:
+    """Where the posts of one monitored channel go."""
+
+    channel: Union[int, str]  # Channel ID, or a username resolved at startup
+    hashtags: Tuple[str, ...]
+    alert_chat_id: int
+    targets: Tuple[Target, ...]
+    chat_id: Optional[int] = field(default=None, compare=False)
+    # Defaults to the route's hashtags as the only rule.
+    classifier: Optional[Classifier] = field(default=None, compare=False, repr=False)
+
+    def __post_init__(self) -> None:
+        if self.classifier is None:
+            self.classifier = Classifier([Rule(self.hashtags, post=True)])
+
+    @property
+    def name(self) -> str:
+        """Label of the channel in logs, metrics and health reports."""
+        return str(self.channel)
+
+
+class Router:
+    """
+    Look up the route of an incoming message by its chat ID.
+
+    Routes configured by username only get a chat ID once ``resolve`` has
+    asked Telegram for it; from then on dispatch is a single dict lookup.
+    """
+
+    def __init__(self, routes: Sequence[Route]) -> None:
+        self.routes = list(routes)
+        self._by_chat: Dict[int, Route] = {
+            route.channel: route
+            for route in self.routes
+            if isinstance(route.channel, int)
+        }
+        for route in self._by_chat.values():
+            route.chat_id = route.channel
+
+    @property
+    def channels(self) -> List[Union[int, str]]:
+        """The channels to subscribe to, as configured."""
+        return [route.channel for route in self.routes]
+
+    async def resolve(self, client: "TelegramClient") -> None:
+        """Resolve the chat IDs of routes configured by username."""
+        for route in self.routes:
+            if route.chat_id is None:
+                route.chat_id = await client.get_peer_id(route.channel)
+                self._by_chat[route.chat_id] = route
+                logger.info(f"Channel {route.channel} has chat ID {route.chat_id}")
+
+    def get(self, chat_id: int) -> Optional[Route]:
+        return self._by_chat.get(chat_id)
+
+    def check_sites(self, sites: Iterable[str]) -> None:
+        """Raise ValueError if a route targets a site that is not configured."""
+        known = set(sites)
+        unknown = {
+            (route.name, target.site)
+            for route in self.routes
+            for target in route.targets
+            if target.site not in known
+        }
+        if unknown:
+            raise ValueError(
+                "Routes target unknown WordPress sites: "
+                + ", ".join(f"{site!r} (from {name})" for name, site in sorted(unknown))
+                + f"; configured sites are {', '.join(sorted(known))}"
+            )
+
+
+def rules_from_config(config: "Settings", hashtags: Sequence[str]) -> List[Rule]:
+    """The classifier rules of a channel: its hashtags, then the shared rules."""
+    return [Rule(tuple(hashtags), post=True)] + [
+        Rule(
+            tuple(rule.match),
+            rule.post,
+            rule.skip,
+            {site: tuple(ids) for site, ids in rule.categories.items()},
+            {site: tuple(ids) for site, ids in rule.tags.items()},
+        )
+        for rule in config.classifier_rules
+    ]
+
+
+def routes_from_config(config: "Settings") -> List[Route]:
+    """
+    Build the routes from the settings.
+
+    Without an explicit ``routes`` setting, the two original channels are
+    routed to the "ru" and "kg" sites, each if its alert group is set; as
+    before, either hashtag marks a post in either channel. Each route's
+    classifier is compiled here, once.
+    """
+    if config.routes:
+        return [
+            Route(
+                channel=route.channel,
+                hashtags=tuple(route.hashtags),
+                alert_chat_id=route.alert_chat_id,
+                targets=tuple(
+                    Target(
+                        target.site,
+                        target.author_id,
+                        None if target.categories is None else tuple(target.categories),
+                    )
+                    for target in route.targets
+                ),
+                classifier=Classifier(rules_from_config(config, route.hashtags)),
+            )
+            for route in config.routes
+        ]
+    hashtags = (config.hashtag_ru, config.hashtag_kg)
+    classifier = Classifier(rules_from_config(config, hashtags))
+    legacy = (
+        (config.channel_ru_username, config.group_ru_id, "ru"),
+        (config.channel_kg_username, config.group_kg_id, "kg"),
+    )
+    return [
+        Route(channel, hashtags, group_id, (Target(site),), classifier=classifier)
+        for channel, group_id, site in legacy
+        if group_id is not None
+    ]
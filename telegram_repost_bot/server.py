@@ -0,0 +1,95 @@
+import asyncio
+import hmac
+import threading
+from typing import Optional
+
+from aiohttp import web
+
+from telegram_repost_bot.health import UNHEALTHY, HealthState
+from telegram_repost_bot.logging_config import setup_logger
+from telegram_repost_bot.metrics import CONTENT_TYPE, REGISTRY, Registry
+from telegram_repost_bot.profiler import render_collapsed, sample_stacks
+
+logger = setup_logger(__name__)
+
+MAX_PROFILE_SECONDS = 300.0
+
+
+class StatusServer:
+    """
+    HTTP server for ``/health`` and ``/metrics``, running on the bot's loop.
+
+    Handlers run on the same event loop as the Telegram client, so they read
+    the bot's state directly without locks or thread handoffs. Further admin
+    routes can be registered on ``app`` before ``start`` is called.
+
+    With an ``admin_token``, ``/admin/profile?seconds=N`` samples the event
+    loop's stack for N seconds and returns the collapsed stacks. It requires
+    an ``Authorization: Bearer <admin_token>`` header; without a token the
+    route does not exist.
+    """
+
+    def __init__(
+        self,
+        health: HealthState,
+        host: str = "0.0.0.0",
+        port: int = 5001,
+        registry: Registry = REGISTRY,
+        admin_token: Optional[str] = None,
+    ) -> None:
+        self._health = health
+        self._host = host
+        self._port = port
+        self._registry = registry
+        self.app = web.Application()
+        self.app.router.add_get("/health", self._health_check)
+        self.app.router.add_get("/metrics", self._metrics)
+        self._admin_token = admin_token
+        self._profiling = asyncio.Lock()
+        if admin_token:
+            self.app.router.add_get("/admin/profile", self._profile)
+        self._runner: Optional[web.AppRunner] = None
+
+    async def _health_check(self, request: web.Request) -> web.Response:
+        status, report = self._health.report()
+        return web.json_response(report, status=503 if status == UNHEALTHY else 200)
+
+    async def _metrics(self, request: web.Request) -> web.Response:
+        response = web.Response(text=self._registry.render())
+        response.headers["Content-Type"] = CONTENT_TYPE
+        return response
+
+    async def _profile(self, request: web.Request) -> web.Response:
+        authorization = request.headers.get("Authorization", "")
+        if not hmac.compare_digest(authorization, f"Bearer {self._admin_token}"):
+            raise web.HTTPUnauthorized()
+        try:
+            seconds = float(request.query.get("seconds", "10"))
+            interval = float(request.query.get("interval", "0.005"))
+        except ValueError:
+            raise web.HTTPBadRequest(text="seconds and interval must be numbers")
+        if not 0 < seconds <= MAX_PROFILE_SECONDS or not 0 < interval <= 1:
+            raise web.HTTPBadRequest(
+                text=f"seconds must be in (0, {MAX_PROFILE_SECONDS:g}], interval in (0, 1]"
+            )
+        if self._profiling.locked():
+            raise web.HTTPConflict(text="A profile is already being taken")
+
+        async with self._profiling:
+            logger.info(f"Profiling the event loop for {seconds:g}s")
+            loop = asyncio.get_running_loop()
+            stacks = await loop.run_in_executor(
+                None, sample_stacks, threading.get_ident(), seconds, interval
+            )
+        return web.Response(text=render_collapsed(stacks))
+
+    async def start(self) -> None:
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self._host, self._port).start()
+        logger.info(f"Status server listening on {self._host}:{self._port}")
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
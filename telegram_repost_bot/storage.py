@@ -0,0 +1,39 @@
+import sqlite3
+from pathlib import Path
+from typing import Dict
+
+
+def open_database(path: str | Path) -> sqlite3.Connection:
+    """
+    Open a connection to the bot's SQLite database in WAL mode.
+
+    WAL lets readers on one connection proceed while another connection is
+    writing, so lookups on the event loop never wait for the outbox workers.
+
+    :param path: Path to the database file, or ":memory:".
+    """
+    if str(path) != ":memory:":
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+    connection = sqlite3.connect(str(path), check_same_thread=False)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    return connection
+
+
+def add_missing_columns(
+    connection: sqlite3.Connection, table: str, columns: Dict[str, str]
+) -> None:
+    """
+    Add columns introduced after ``table`` was created in an existing database.
+
+    :param connection: Database connection.
+    :param table: Table name.
+    :param columns: Column names mapped to their declarations, e.g. "TEXT".
+    """
+    existing = {row[1] for row in connection.execute(f"PRAGMA table_info({table})")}
+    with connection:
+        for name, declaration in columns.items():
+            if name not in existing:
+                connection.execute(
+                    f"ALTER TABLE {table} ADD COLUMN {name} {declaration}"
+                )
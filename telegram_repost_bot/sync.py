@@ -0,0 +1,304 @@
+import asyncio
+from typing import (
+    TYPE_CHECKING,
+    Awaitable,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+from telegram_repost_bot.debounce import Debouncer
+from telegram_repost_bot.logging_config import setup_logger
+from telegram_repost_bot.media import UploadedMedia, photo_filename
+from telegram_repost_bot.media_cache import MediaCache
+from telegram_repost_bot.outbox import Outbox, OutboxPhoto
+from telegram_repost_bot.post_index import PostIndex, Revision, digest
+from telegram_repost_bot.rate_limit import RateLimited, backoff
+from telegram_repost_bot.routing import Route
+from telegram_repost_bot.utils.utils import parse_post
+
+if TYPE_CHECKING:
+    from telethon.tl.patched import Message
+
+    from telegram_repost_bot.wp_api import BaseApi
+
+logger = setup_logger(__name__)
+
+
+class EditSync:
+    """
+    Carry edits and deletions of Telegram posts over to WordPress.
+
+    Edits of a message are held for ``window`` seconds after the last one,
+    like the parts of an album, so a burst of corrections becomes a single
+    update with the final text. The edited message is parsed again and
+    compared with the digests the post index kept of the published version;
+    only the title, content or featured image that actually changed is sent,
+    and a photo is uploaded only if it is a different photo.
+
+    Copies still waiting in the outbox get the new text before they are
+    published. A site the edit could not be sent to is tried again later with
+    the latest text, with backoff, up to ``max_attempts`` times; a throttled
+    site only delays the edit and never makes it give up.
+
+    An album's photos arrive as separate messages, so for albums only the
+    caption is synced. Deleting a message unpublishes its posts and drops any
+    copies still waiting in the outbox; unpublishing is retried like an edit.
+    """
+
+    def __init__(
+        self,
+        outbox: Outbox,
+        post_index: PostIndex,
+        media_cache: MediaCache,
+        sites: Dict[str, "BaseApi"],
+        prepare_photo: Callable[["Message", List[str], str], Awaitable[OutboxPhoto]],
+        window: float = 10.0,
+        max_attempts: int = 8,
+        max_delay: float = 600.0,
+    ) -> None:
+        self._outbox = outbox
+        self._post_index = post_index
+        self._media_cache = media_cache
+        self._sites = sites
+        self._prepare_photo = prepare_photo
+        self._window = window
+        self._max_attempts = max_attempts
+        self._max_delay = max_delay
+        self._attempts: Dict[Tuple[int, int], int] = {}
+        # What is scheduled for each message: the edit to sync, or None to
+        # unpublish its posts.
+        self._edits: Dict[Tuple[int, int], Tuple[Route, Optional["Message"]]] = {}
+        self._debouncer: Debouncer[Tuple[int, int]] = Debouncer(self._flush)
+
+    def edited(self, route: Route, message: "Message") -> None:
+        """Schedule the sync of an edited message, replacing a pending one."""
+        key = (message.chat_id, message.id)
+        self._attempts.pop(key, None)
+        self._schedule(route, key, message, self._window)
+
+    def _schedule(
+        self,
+        route: Route,
+        key: Tuple[int, int],
+        message: Optional["Message"],
+        delay: float,
+    ) -> None:
+        self._edits[key] = (route, message)
+        self._debouncer.schedule(key, delay)
+
+    async def _flush(self, key: Tuple[int, int]) -> None:
+        if key not in self._edits:
+            return  # Synced already, with a later edit.
+        route, message = self._edits.pop(key)
+        if message is None:
+            await self._unpublish(route, key[1])
+        else:
+            await self.sync(route, message)
+
+    async def sync(self, route: Route, message: "Message") -> None:
+        """Bring every copy of ``message``, published or queued, in line."""
+        try:
+            result = parse_post(message)
+        except (TypeError, ValueError) as e:
+            logger.warning(f"Edited message {message.id} from {route.name}: {e}")
+            return
+        if result is None:
+            return
+
+        title, content = result
+        queued = await self._outbox.update_text(
+            message.chat_id, message.id, title, content
+        )
+        if queued:
+            logger.info(
+                f"Updated {queued} queued copies of edited message {message.id}"
+            )
+        sites = self._post_index.sites_of(message.chat_id, message.id)
+        if not sites:
+            if not queued:
+                logger.info(
+                    f"Edited message {message.id} from {route.name} is not published"
+                )
+            return
+
+        # Albums are synced by caption only; None keeps the published photos.
+        photo_ids = None
+        if not message.grouped_id:
+            photo_ids = [message.photo.id] if photo_filename(message) else []
+        errors = await asyncio.gather(
+            *(
+                self._sync_site(site, message, title, content, photo_ids)
+                for site in sites
+            )
+        )
+        key = (message.chat_id, message.id)
+        self._retry_failed(route, key, message, [e for e in errors if e is not None])
+
+    def _retry_failed(
+        self,
+        route: Route,
+        key: Tuple[int, int],
+        message: Optional["Message"],
+        errors: List[Exception],
+    ) -> None:
+        """
+        Schedule another try at an edit, or a deletion if ``message`` is None,
+        that some sites did not take.
+        """
+        change = "deletion" if message is None else "edit"
+        if not errors:
+            self._attempts.pop(key, None)
+            return
+        if key in self._debouncer:
+            return  # A newer edit is already scheduled.
+        # Throttling says nothing about the edit, so it is not counted.
+        throttled = [e for e in errors if isinstance(e, RateLimited)]
+        attempts = self._attempts.get(key, 0) + (len(throttled) < len(errors))
+        if attempts >= self._max_attempts:
+            self._attempts.pop(key, None)
+            logger.error(
+                f"Giving up on the {change} of message {key[1]} from {route.name}"
+                f" after {attempts} attempts: {errors[0]!r}"
+            )
+            return
+        self._attempts[key] = attempts
+        delay = backoff(attempts, self._window, self._max_delay)
+        for error in throttled:
+            if error.retry_after is not None:
+                delay = max(delay, error.retry_after)
+        logger.warning(
+            f"Retrying the {change} of message {key[1]} from {route.name}"
+            f" in {delay:.1f}s"
+        )
+        self._schedule(route, key, message, delay)
+
+    async def _sync_site(
+        self,
+        site: str,
+        message: "Message",
+        title: str,
+        content: str,
+        photo_ids: Optional[List[int]],
+    ) -> Optional[Exception]:
+        """Send the changes to one site; return the error if that failed."""
+        api = self._sites.get(site)
+        published = self._post_index.get(message.chat_id, message.id, site)
+        if api is None or published is None:
+            return
+        revision = self._post_index.get_revision(message.chat_id, message.id, site)
+        if revision is None:
+            # Published before revisions were recorded: resend the text, and
+            # keep the photos since there is nothing to compare them with.
+            revision = Revision("", "", (), ())
+            photo_ids = None
+
+        fields = {}
+        if digest(title) != revision.title_digest:
+            fields["title"] = title
+        content_changed = digest(content) != revision.content_digest
+        photo_changed = photo_ids is not None and photo_ids[:1] != list(
+            revision.photo_ids[:1]
+        )
+
+        media_id = published.media_id
+        try:
+            if photo_changed or content_changed:
+                gallery = [
+                    UploadedMedia(gallery_id, "") for gallery_id in revision.gallery_ids
+                ]
+                if photo_changed:
+                    featured = (
+                        await self._upload(api, site, message) if photo_ids else None
+                    )
+                    media_id = fields["featured_media"] = featured.id if featured else 0
+                else:
+                    featured = await self._featured(api, site, revision, media_id)
+                fields["content"] = api.render_content(content, featured, gallery)
+            if not fields:
+                logger.info(f"Edit of message {message.id} changes nothing on {site}")
+                return
+            await api.update_post(published.post_id, **fields)
+        except Exception as e:
+            logger.error(
+                f"Syncing the edit of message {message.id} to {site} failed: {e!r}"
+            )
+            return e
+        await self._post_index.record(
+            message.chat_id,
+            message.id,
+            site,
+            published.post_id,
+            media_id or None,
+            Revision.of(
+                title,
+                content,
+                revision.photo_ids if photo_ids is None else photo_ids,
+                revision.gallery_ids,
+            ),
+        )
+
+    async def _upload(
+        self, api: "BaseApi", site: str, message: "Message"
+    ) -> UploadedMedia:
+        photo_id = message.photo.id
+        uploaded = self._media_cache.get_upload(photo_id, site)
+        if uploaded is None:
+            photo = await self._prepare_photo(message, [site], "")
+            uploaded = await api.upload_image_to_wordpress(photo.image)
+            await self._media_cache.record_upload(photo_id, site, uploaded)
+        return uploaded
+
+    async def _featured(
+        self,
+        api: "BaseApi",
+        site: str,
+        revision: Revision,
+        media_id: Optional[int],
+    ) -> Optional[UploadedMedia]:
+        """Return the post's current featured image, to re-render the content."""
+        if not media_id:
+            return None
+        if revision.photo_ids:
+            uploaded = self._media_cache.get_upload(revision.photo_ids[0], site)
+            if uploaded is not None and uploaded.id == media_id:
+                return uploaded
+        return await api.get_media(media_id)
+
+    async def deleted(self, route: Route, message_ids: Sequence[int]) -> None:
+        """Unpublish the posts of deleted messages and cancel queued ones."""
+        chat_id = route.chat_id
+        for message_id in message_ids:
+            if self._debouncer.cancel((chat_id, message_id)):
+                self._edits.pop((chat_id, message_id), None)
+            self._attempts.pop((chat_id, message_id), None)
+            if await self._outbox.cancel(chat_id, message_id):
+                logger.info(f"Cancelled queued posts of deleted message {message_id}")
+            await self._unpublish(route, message_id)
+
+    async def _unpublish(self, route: Route, message_id: int) -> None:
+        """Take down every post of a deleted message, retrying failed sites."""
+        chat_id = route.chat_id
+        errors = []
+        for site in self._post_index.sites_of(chat_id, message_id):
+            published = self._post_index.get(chat_id, message_id, site)
+            if published is None:
+                continue  # Taken down meanwhile.
+            try:
+                await self._sites[site].unpublish_post(published.post_id)
+            except Exception as e:
+                logger.error(
+                    f"Unpublishing post {published.post_id} from {site} failed:"
+                    f" {e!r}"
+                )
+                errors.append(e)
+                continue
+            await self._post_index.forget(chat_id, message_id, site)
+            logger.info(
+                f"Unpublished post {published.post_id} from {site}: message"
+                f" {message_id} was deleted from {route.name}"
+            )
+        self._retry_failed(route, (chat_id, message_id), None, errors)
@@ -0,0 +1,164 @@
+"""
+Per-message traces of the bot's pipeline, written as JSON lines.
+
+Every message gets a trace ID made of its chat and message IDs, so the spans
+recorded when it arrives and the ones recorded when the outbox publishes it,
+possibly after a restart, end up in the same trace::
+
+    with trace(chat_id, message_id, "message", channel="kloopnews"):
+        with span("parse_post"):
+            ...
+
+Spans record their parent, start time, duration and error, if any. Outside of
+a trace, or before ``setup_tracing``, ``span`` does nothing.
+"""
+
+import atexit
+import json
+import logging
+import queue
+import secrets
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from logging.handlers import QueueListener, RotatingFileHandler
+from pathlib import Path
+from typing import Iterator, Optional, Tuple
+
+from telegram_repost_bot.logging_config import (
+    PACKAGE_LOGGER,
+    DeferredQueueHandler,
+    Lazy,
+)
+
+_tracer = logging.getLogger(f"{PACKAGE_LOGGER}.trace")
+_tracer.propagate = False
+_listener: Optional[QueueListener] = None
+
+# (trace ID, ID of the innermost open span) of the running task.
+_context: ContextVar[Optional[Tuple[str, Optional[str]]]] = ContextVar(
+    "trace", default=None
+)
+
+
+def _dumps(entry: dict) -> str:
+    return json.dumps(entry, ensure_ascii=False, separators=(",", ":"), default=str)
+
+
+def _emit(
+    trace_id: str,
+    span_id: str,
+    parent: Optional[str],
+    name: str,
+    started_at: float,
+    duration: float,
+    attrs: dict,
+) -> None:
+    entry = {
+        "trace": trace_id,
+        "span": span_id,
+        "parent": parent,
+        "name": name,
+        "start": round(started_at, 6),
+        "duration_ms": round(duration * 1000, 3),
+    }
+    entry.update((key, value) for key, value in attrs.items() if value)
+    # Serialized on the writer thread, not on the event loop.
+    _tracer.info("%s", Lazy(_dumps, entry))
+
+
+@contextmanager
+def span(name: str, **attrs) -> Iterator[None]:
+    """
+    Time a step of the current trace; spans opened inside become its children.
+
+    :param name: Step name, e.g. "parse_post".
+    :param attrs: Extra fields, e.g. ``site="ru"``; empty values are left out.
+    """
+    context = _context.get()
+    if context is None or _listener is None:
+        yield
+        return
+    trace_id, parent = context
+    span_id = secrets.token_hex(4)
+    token = _context.set((trace_id, span_id))
+    started_at, started = time.time(), time.perf_counter()
+    try:
+        yield
+    except BaseException as e:
+        attrs["error"] = type(e).__name__
+        raise
+    finally:
+        _context.reset(token)
+        duration = time.perf_counter() - started
+        _emit(trace_id, span_id, parent, name, started_at, duration, attrs)
+
+
+@contextmanager
+def trace(chat_id: int, message_id: int, name: str, **attrs) -> Iterator[None]:
+    """
+    Run a block in the trace of a message, as a span called ``name``.
+
+    :param chat_id: Chat ID of the message.
+    :param message_id: ID of the message.
+    :param name: Name of the span covering the block.
+    :param attrs: Extra fields of the span.
+    """
+    token = _context.set((f"{chat_id}:{message_id}", None))
+    try:
+        with span(name, **attrs):
+            yield
+    finally:
+        _context.reset(token)
+
+
+def record(name: str, started_at: float, **attrs) -> None:
+    """
+    Add a finished step that started at ``started_at`` and ends now.
+
+    For time spent outside the bot, e.g. from posting a message in Telegram to
+    its delivery to the bot.
+    """
+    context = _context.get()
+    if context is None or _listener is None:
+        return
+    trace_id, parent = context
+    duration = max(time.time() - started_at, 0.0)
+    _emit(trace_id, secrets.token_hex(4), parent, name, started_at, duration, attrs)
+
+
+def setup_tracing(
+    path: str | Path,
+    max_bytes: int = 10 * 1024 * 1024,
+    backup_count: int = 5,
+) -> None:
+    """
+    Start writing spans to ``path``, rotated at ``max_bytes``.
+
+    Like the logs, spans go through a queue to a background writer thread.
+    Calling this again replaces the previous setup.
+    """
+    global _listener
+    shutdown_tracing()
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    handler = RotatingFileHandler(
+        path, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8"
+    )
+    trace_queue: queue.SimpleQueue = queue.SimpleQueue()
+    _listener = QueueListener(trace_queue, handler)
+    _listener.start()
+    for old_handler in list(_tracer.handlers):
+        _tracer.removeHandler(old_handler)
+    _tracer.addHandler(DeferredQueueHandler(trace_queue))
+    _tracer.setLevel(logging.INFO)
+
+
+def shutdown_tracing() -> None:
+    """Flush queued spans and stop the writer thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(shutdown_tracing)
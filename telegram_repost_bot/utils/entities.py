@@ -0,0 +1,138 @@
+from html import escape
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Entities are matched by their TL class name, which keeps Telethon out of
+# this module's imports.
+_SIMPLE_TAGS = {
+    "MessageEntityBold": ("<b>", "</b>"),
+    "MessageEntityItalic": ("<i>", "</i>"),
+    "MessageEntityUnderline": ("<u>", "</u>"),
+    "MessageEntityStrike": ("<s>", "</s>"),
+    "MessageEntityCode": ("<code>", "</code>"),
+    "MessageEntityBlockquote": ("<blockquote>", "</blockquote>"),
+    "MessageEntitySpoiler": ('<span class="spoiler">', "</span>"),
+}
+
+
+def _link(href: str) -> Tuple[str, str]:
+    return f'<a href="{escape(href)}">', "</a>"
+
+
+def _entity_tags(entity, segment: str) -> Optional[Tuple[str, str]]:
+    """Return the opening and closing HTML for an entity, or None to skip it."""
+    kind = type(entity).__name__
+    tags = _SIMPLE_TAGS.get(kind)
+    if tags is not None:
+        return tags
+    if kind == "MessageEntityPre":
+        if entity.language:
+            return (
+                f'<pre><code class="language-{escape(entity.language)}">',
+                "</code></pre>",
+            )
+        return "<pre>", "</pre>"
+    if kind == "MessageEntityTextUrl":
+        return _link(entity.url)
+    if kind == "MessageEntityUrl":
+        return _link(segment if "://" in segment else f"http://{segment}")
+    if kind == "MessageEntityEmail":
+        return _link(f"mailto:{segment}")
+    if kind == "MessageEntityPhone":
+        return _link(f"tel:{segment}")
+    if kind == "MessageEntityMention":
+        return _link(f"https://t.me/{segment.lstrip('@')}")
+    return None
+
+
+def utf16_to_indices(text: str, offsets: Iterable[int]) -> Dict[int, int]:
+    """
+    Map Telegram's UTF-16 offsets to indices into the Python string.
+
+    Characters outside the BMP take two UTF-16 code units but one Python
+    index. An offset pointing into the middle of such a pair is rounded up to
+    the next character.
+
+    :param text: The message text.
+    :param offsets: UTF-16 offsets to convert.
+    """
+    wanted = sorted(set(offsets))
+    if len(text.encode("utf-16-le")) == 2 * len(text):
+        # Only BMP characters: both encodings line up.
+        return {offset: min(offset, len(text)) for offset in wanted}
+
+    indices = {}
+    position = 0
+    pending = iter(wanted)
+    offset = next(pending, None)
+    for index, char in enumerate(text):
+        while offset is not None and offset <= position:
+            indices[offset] = index
+            offset = next(pending, None)
+        if offset is None:
+            return indices
+        position += 2 if ord(char) > 0xFFFF else 1
+    while offset is not None:
+        indices[offset] = len(text)
+        offset = next(pending, None)
+    return indices
+
+
+def render_entities(text: str, entities: Optional[Sequence], start: int = 0) -> str:
+    """
+    Render ``text[start:]`` as HTML using the message's formatting entities.
+
+    Offsets are converted from UTF-16 once, then the output is built in a
+    single left-to-right pass and joined at the end, so the cost is linear in
+    the length of the text plus the number of entities. Entities that begin
+    before ``start`` are clipped to it; partially overlapping entities are
+    clipped to keep the markup well-formed.
+
+    :param text: The message text.
+    :param entities: The message's entities, or None.
+    :param start: Python index where rendering starts.
+    """
+    entities = entities or ()
+    indices = utf16_to_indices(
+        text,
+        (
+            offset
+            for entity in entities
+            for offset in (entity.offset, entity.offset + entity.length)
+        ),
+    )
+
+    spans: List[Tuple[int, int, str, str]] = []
+    for entity in entities:
+        span_start = indices[entity.offset]
+        span_end = indices[entity.offset + entity.length]
+        tags = _entity_tags(entity, text[span_start:span_end])
+        span_start = max(span_start, start)
+        if tags is None or span_end <= span_start:
+            continue
+        spans.append((span_start, span_end, *tags))
+    # Outer entities first when several start at the same place.
+    spans.sort(key=lambda span: (span[0], -span[1]))
+
+    parts: List[str] = []
+    position = start
+    open_spans: List[Tuple[int, str]] = []
+
+    def close_until(limit: int) -> None:
+        nonlocal position
+        while open_spans and open_spans[-1][0] <= limit:
+            end, closing = open_spans.pop()
+            parts.append(escape(text[position:end], quote=False))
+            parts.append(closing)
+            position = end
+
+    for span_start, span_end, opening, closing in spans:
+        close_until(span_start)
+        parts.append(escape(text[position:span_start], quote=False))
+        parts.append(opening)
+        position = span_start
+        if open_spans and span_end > open_spans[-1][0]:
+            span_end = open_spans[-1][0]
+        open_spans.append((span_end, closing))
+    close_until(len(text))
+    parts.append(escape(text[position:], quote=False))
+    return "".join(parts)
@@ -1,11 +1,16 @@
+import asyncio
+import time
+from collections import defaultdict, deque
 from enum import Enum
-from typing import List
+from functools import lru_cache
+from typing import Deque, Dict, List, Optional, Sequence, Tuple
 
-import requests
+import aiohttp
 from pydantic import BaseModel, EmailStr, ValidationError
 
+from telegram_repost_bot.debounce import Debouncer
 from telegram_repost_bot.logging_config import setup_logger
-from telegram_repost_bot.config_reader import config
+from telegram_repost_bot.config_reader import get_config
 
 logger = setup_logger(__name__)
 
@@ -31,115 +36,254 @@ class TelegramData(BaseModel):
 
 
 class NotificationService:
-    _instance = None
+    """
+    Client of the notification service, sharing one pooled HTTP session.
 
-    def __new__(cls, *args, **kwargs):
-        if cls._instance is None:
-            cls._instance = super(NotificationService, cls).__new__(cls)
-        return cls._instance
+    Failures are logged and reported as None; a broken notification service
+    must never take the bot down with it.
+    """
 
-    def __init__(self):
-        self.base_url = config.notification_service_base_url
+    def __init__(
+        self,
+        base_url: str,
+        timeout: float = 10.0,
+        project_name: str = "Telegram Repost Bot",
+    ):
+        self.base_url = base_url
+        self.project_name = project_name
+        self._timeout = aiohttp.ClientTimeout(total=timeout)
+        self._session: Optional[aiohttp.ClientSession] = None
         logger.info(f"NotificationClient initialized with base URL: {self.base_url}")
 
-    def _post_request(self, endpoint: str, data: dict):
+    def _get_session(self) -> aiohttp.ClientSession:
+        # Created lazily: aiohttp binds the session to the running event loop.
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(timeout=self._timeout)
+        return self._session
+
+    async def close(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    async def _post_request(self, endpoint: str, data: dict):
         """Helper method for sending POST requests"""
         url = f"{self.base_url}{endpoint}"
         logger.info(f"Sending POST request to {url} with data: {data}")
 
         try:
-            response = requests.post(url, json=data)
-            response.raise_for_status()
-            logger.info(f"Request to {url} succeeded with response: {response.json()}")
-            return response.json()
-        except requests.exceptions.HTTPError as err:
+            async with self._get_session().post(url, json=data) as response:
+                response.raise_for_status()
+                response_data = await response.json(content_type=None)
+            logger.info(f"Request to {url} succeeded with response: {response_data}")
+            return response_data
+        except aiohttp.ClientResponseError as err:
             logger.error(f"HTTP error occurred: {err}")
-            raise SystemExit(f"HTTP error occurred: {err}")
         except Exception as err:
-            logger.error(f"Other error occurred: {err}")
-            raise SystemExit(f"Other error occurred: {err}")
+            logger.error(f"Other error occurred: {err!r}")
+        return None
 
-    def send_email(self, email_data: EmailData):
+    async def send_email(self, email_data: EmailData):
         """Sending notification via email"""
         try:
             # Data validation via Pydantic
             logger.info(f"Validating email data: {email_data}")
             validated_data = email_data.dict()
-            return self._post_request("/send-email", validated_data)
+            return await self._post_request("/send-email", validated_data)
         except ValidationError as e:
             logger.error(f"Validation error for email data: {e}")
             return {"success": False, "detail": "Invalid email data"}
 
-    def send_telegram(self, tg_data: TelegramData):
+    async def send_telegram(self, tg_data: TelegramData):
         """Sending notification via Telegram"""
         try:
             # Data validation via Pydantic
             logger.info(f"Validating Telegram data: {tg_data}")
             validated_data = tg_data.dict()
-            return self._post_request("/send-tg-message", validated_data)
+            return await self._post_request("/send-tg-message", validated_data)
         except ValidationError as e:
             logger.error(f"Validation error for Telegram data: {e}")
             return {"success": False, "detail": "Invalid Telegram data"}
 
     # Simplified methods for sending error and info messages
-    def send_email_error(
+    async def send_email_error(
         self,
         body: str,
         subject: str,
         recipients: List[EmailStr],
-        project_name: str = config.project_name,
+        project_name: Optional[str] = None,
     ):
         """Sending email with error message"""
         logger.info(f"Sending error email: {body}")
         email_data = EmailData(
             type=MessageType.ERROR,
             body=body,
-            project_name=project_name,
+            project_name=project_name or self.project_name,
             subject=subject,
             recipients=recipients,
         )
-        return self.send_email(email_data)
+        return await self.send_email(email_data)
 
-    def send_email_info(
+    async def send_email_info(
         self,
         body: str,
         subject: str,
         recipients: List[EmailStr],
-        project_name: str = config.project_name,
+        project_name: Optional[str] = None,
     ):
         """Sending informational email"""
         logger.info(f"Sending info email: {body}")
         email_data = EmailData(
             type=MessageType.INFO,
             body=body,
-            project_name=project_name,
+            project_name=project_name or self.project_name,
             subject=subject,
             recipients=recipients,
         )
-        return self.send_email(email_data)
+        return await self.send_email(email_data)
 
-    def send_tg_error(
-        self, body: str, recipients: List[str], project_name: str = config.project_name
+    async def send_tg_error(
+        self, body: str, recipients: List[str], project_name: Optional[str] = None
     ):
         """Sending error message in Telegram"""
         logger.info(f"Sending error Telegram message: {body}")
         tg_data = TelegramData(
             type=MessageType.ERROR,
             body=body,
-            project_name=project_name,
+            project_name=project_name or self.project_name,
             recipients=recipients,
         )
-        return self.send_telegram(tg_data)
+        return await self.send_telegram(tg_data)
 
-    def send_tg_info(
-        self, body: str, recipients: List[str], project_name: str = config.project_name
+    async def send_tg_info(
+        self, body: str, recipients: List[str], project_name: Optional[str] = None
     ):
         """Sending an information message to Telegram"""
         logger.info(f"Sending info Telegram message: {body}")
         tg_data = TelegramData(
             type=MessageType.INFO,
             body=body,
-            project_name=project_name,
+            project_name=project_name or self.project_name,
             recipients=recipients,
         )
-        return self.send_telegram(tg_data)
+        return await self.send_telegram(tg_data)
+
+
+class Notifier:
+    """
+    Queue error notifications without ever blocking the caller.
+
+    The first occurrence of an error is sent right away. Identical errors to
+    the same recipients within the following ``window`` seconds are counted
+    and sent as one digest when the window ends. Each recipient gets at most
+    ``rate_limit`` notifications per ``rate_period`` seconds; anything over
+    that stays queued, still coalescing, until the recipient is allowed again.
+    """
+
+    def __init__(
+        self,
+        service: NotificationService,
+        window: float = 60.0,
+        rate_limit: int = 10,
+        rate_period: float = 3600.0,
+        max_pending: int = 100,
+        subject: str = "Telegram Repost Bot",
+    ) -> None:
+        self._service = service
+        self._subject = subject
+        self._window = window
+        self._rate_limit = rate_limit
+        self._rate_period = rate_period
+        self._max_pending = max_pending
+        # (channel, recipients, body) -> occurrences not sent yet. A key stays
+        # here, possibly at zero, for as long as its coalescing window is open.
+        self._pending: Dict[Tuple[str, Tuple, str], int] = {}
+        self._sent: Dict[str, Deque[float]] = defaultdict(deque)
+        self._debouncer: Debouncer[Tuple[str, Tuple, str]] = Debouncer(self._flush)
+
+    def submit(self, channel: str, recipients: Sequence, body: str) -> None:
+        """
+        Queue a notification.
+
+        :param channel: "email" or "telegram".
+        :param recipients: Email addresses or Telegram chat IDs.
+        :param body: The notification text.
+        """
+        key = (channel, tuple(recipients), body)
+        if key in self._pending:
+            self._pending[key] += 1
+            return
+        if len(self._pending) >= self._max_pending:
+            logger.warning(f"Notification queue is full, dropping: {body}")
+            return
+        self._pending[key] = 1
+        self._debouncer.fire(key)
+
+    def _allowed(self, recipients: Tuple) -> bool:
+        horizon = time.monotonic() - self._rate_period
+        for recipient in recipients:
+            sent = self._sent[str(recipient)]
+            while sent and sent[0] <= horizon:
+                sent.popleft()
+            if len(sent) >= self._rate_limit:
+                return False
+        return True
+
+    async def _flush(self, key: Tuple[str, Tuple, str]) -> None:
+        count = self._pending.get(key, 0)
+        if count == 0:
+            # Nothing repeated during the window: close it.
+            self._pending.pop(key, None)
+            return
+        if self._allowed(key[1]):
+            self._pending[key] = 0
+            now = time.monotonic()
+            for recipient in key[1]:
+                self._sent[str(recipient)].append(now)
+            await self._deliver(key, count)
+        else:
+            logger.warning(f"Rate limit reached for {key[1]}, holding notification")
+        self._debouncer.schedule(key, self._window)
+
+    async def _deliver(self, key: Tuple[str, Tuple, str], count: int) -> None:
+        channel, recipients, body = key
+        if count > 1:
+            body += f"\n\n(repeated {count} times)"
+        try:
+            if channel == "email":
+                await self._service.send_email_error(
+                    body=body, subject=self._subject, recipients=list(recipients)
+                )
+            else:
+                await self._service.send_tg_error(
+                    body=body, recipients=list(recipients)
+                )
+        except Exception as e:
+            logger.error(f"Sending {channel} notification failed: {e!r}")
+
+    async def close(self) -> None:
+        """Send everything still queued, ignoring windows and rate limits."""
+        await self._debouncer.close()
+        pending, self._pending = self._pending, {}
+        await asyncio.gather(
+            *(self._deliver(key, count) for key, count in pending.items() if count)
+        )
+        await self._service.close()
+
+
+@lru_cache(maxsize=None)
+def get_notifier() -> Notifier:
+    """Return the process-wide notifier, built from the settings on first use."""
+    config = get_config()
+    service = NotificationService(
+        config.notification_service_base_url,
+        config.notification_timeout,
+        config.project_name,
+    )
+    return Notifier(
+        service,
+        config.notification_coalesce_window,
+        config.notification_rate_limit,
+        config.notification_rate_period,
+        subject=config.project_name,
+    )
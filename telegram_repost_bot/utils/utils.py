@@ -1,70 +1,27 @@
 import json
 import re
 from pathlib import Path
-from typing import List, Union
+from typing import TYPE_CHECKING, Union
 
-import emoji
-from telethon.tl.patched import Message
-
-from telegram_repost_bot.config_reader import config
 from telegram_repost_bot.logging_config import setup_logger
+from telegram_repost_bot.utils.entities import render_entities
 
-from telethon.tl import types
-
-from telegram_repost_bot.utils.message_service import NotificationService
+if TYPE_CHECKING:
+    from telethon.tl.patched import Message
 
 logger = setup_logger(__name__)
 
-
-def count_emojis(text):
-    emoji_count = 0
-
-    # Проверяем каждый символ в строке на наличие смайликов
-    for char in text:
-        if char in emoji.EMOJI_DATA:
-            emoji_count += 1
-
-    return emoji_count
-
-
-def replace_links(text: str, entities: List, title: str) -> str:
-    """
-    Replace URLs and text links in the text with HTML links.
-
-    Args:
-        text (str): The text to replace links in.
-        entities (List[MessageEntity]): List of entities representing URLs and text links.
-
-    Returns:
-        str: The text with replaced links in HTML format.
-    """
-    offset_correction = 0  # Offset correction
-    for entity in entities:
-        start = entity.offset + offset_correction  # Starting position
-        end = start + entity.length  # Ending position
-        emojis_count = count_emojis(text[:start])  # Count of emojis
-        text_segment = text[start - emojis_count : end - emojis_count]  # Text segment
-        text_before = text[: start - emojis_count]  # Text before new link
-        text_after = text[end - emojis_count :]  # Text after new link
-        if isinstance(entity, types.MessageEntityUrl):
-            link_text = f'<a href="{text_segment}">{text_segment}</a>'
-        elif isinstance(entity, types.MessageEntityTextUrl):
-            link_text = f'<a href="{entity.url}">{text_segment}</a>'
-        else:
-            continue
-
-        text = f"{text_before}{link_text}{text_after}"
-        offset_correction += len(link_text) - len(text_segment)
-
-    return text
+# A tag is matched as a whole so that its attributes, e.g. an href with a
+# "#fragment" or an escaped "&#x27;", are never taken for hashtags.
+HASHTAG_PATTERN = re.compile(r"(<[^>]*>)|\B#\w*[a-zA-Zа-яА-Я]+\w*")
 
 
 def remove_hashtags(text: str) -> str:
-    pattern = r"\B#\w*[a-zA-Zа-яА-Я]+\w*"
-    return re.sub(pattern, "", text).strip()
+    """Remove the hashtags from text or rendered HTML, leaving tags intact."""
+    return HASHTAG_PATTERN.sub(lambda match: match.group(1) or "", text).strip()
 
 
-def parse_post(message: Message) -> Union[tuple[str, str], None]:
+def parse_post(message: "Message") -> Union[tuple[str, str], None]:
     """
     Parse the message content to extract the title and content, and replace links with HTML format.
 
@@ -78,14 +35,12 @@ def parse_post(message: Message) -> Union[tuple[str, str], None]:
     try:
         entities = message.entities
         title = text.split("\n", 1)[0].strip()
-        content = replace_links(text, entities, title)
+        body = text.split("\n", 1)[1]
+        content = render_entities(text, entities, start=len(text) - len(body))
         content = remove_hashtags(content)
-        content = content.split("\n", 1)[1].strip()
 
-        content_with_newline_replaced = content.replace("\n", "\\n")
-        logger.info(
-            f"Parsed post: Title='{title}', Content='{content_with_newline_replaced}', Entities='{entities}'"
-        )
+        logger.info("Parsed post: Title=%r, Content=%r", title, content)
+        logger.debug("Entities of post %r: %s", title, entities)
 
         return title, content
     except TypeError as e:
@@ -100,46 +55,31 @@ def parse_post(message: Message) -> Union[tuple[str, str], None]:
         raise ValueError(error_message)
 
 
-def is_post(text: str, hashtag_ru: str, hashtag_kg: str) -> bool:
+async def send_notifications(chats_id: list, message: str) -> None:
     """
-    Check if the text contains certain hashtags.
-
-    Args:
-        text (str): The text to be checked for hashtags.
-        hashtag_ru (str): The Russian hashtag to search for.
-        hashtag_kg (str): The Kyrgyz hashtag to search for.
+    Queue an error alert to the admin by email and Telegram and to ``chats_id``.
 
-    Returns:
-        bool: True if the text contains hashtags, False otherwise.
+    Returns immediately; repeats are coalesced and delivery failures are only
+    logged (see ``Notifier``).
     """
-    has_hashtags = hashtag_ru in text or hashtag_kg in text
-    logger.info(f"Post has hashtags: {has_hashtags}")
-    return has_hashtags
-
+    # Imported on use: the settings and HTTP client are not needed to parse.
+    from telegram_repost_bot.config_reader import get_config
+    from telegram_repost_bot.utils.message_service import get_notifier
 
-async def send_notifications(chats_id: list, message: str) -> None:
-    notification_service = NotificationService()
-    notification_service.send_email_error(
-        body=f"<i>{message}</i>",
-        subject="Telegram Repost Bot",
-        recipients=[
-            config.admin_email,
-        ],
-    )
-    notification_service.send_tg_error(
-        body=f"<i>{message}</i>",
-        recipients=[config.admin_tg_id, *chats_id],
-    )
+    config = get_config()
+    notifier = get_notifier()
+    notifier.submit("email", [config.admin_email], f"<i>{message}</i>")
+    notifier.submit("telegram", [config.admin_tg_id, *chats_id], f"<i>{message}</i>")
 
 
 def custom_json_serializer(obj):
-    try:
-        return json.dumps(obj)
-    except TypeError:
-        return str(obj)
+    to_dict = getattr(obj, "to_dict", None)
+    if callable(to_dict):
+        return to_dict()
+    return str(obj)
 
 
-def clean_message(message: Message) -> dict:
+def clean_message(message: "Message") -> dict:
     c_msg = {
         "id": message.id,
         "username": message.chat.username,
@@ -150,3 +90,10 @@ def clean_message(message: Message) -> dict:
         "url": f"https://t.me/{message.chat.username}/{message.id}",
     }
     return c_msg
+
+
+def message_to_json(message: "Message") -> str:
+    """Serialize a message for the logs; meant to be wrapped in ``Lazy``."""
+    return json.dumps(
+        clean_message(message), default=custom_json_serializer, ensure_ascii=False
+    )
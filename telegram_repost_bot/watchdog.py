@@ -0,0 +1,166 @@
+"""
+Long-running liveness watchdog for the bot's ``/health`` endpoint.
+
+Run it next to the bot::
+
+    python -m telegram_repost_bot.watchdog
+
+or once, e.g. from cron, with ``--once``. Only the standard library is
+imported up front, so starting it costs milliseconds; the notification client
+and settings are imported the first time an alert has to go out.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import sys
+import time
+import urllib.error
+import urllib.request
+from typing import List, Optional, Tuple
+
+from telegram_repost_bot.logging_config import TEXT_FORMAT
+
+logger = logging.getLogger("telegram_repost_bot.watchdog")
+
+DEFAULT_URL = "http://localhost:5001/health"
+
+
+def probe(url: str, timeout: float) -> Tuple[bool, str]:
+    """
+    GET the health endpoint and return whether the bot is up, with a reason.
+
+    :param url: URL of the ``/health`` endpoint.
+    :param timeout: Seconds to wait for the response.
+    """
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as response:
+            body = response.read()
+    except urllib.error.HTTPError as e:
+        return False, f"health check returned {e.code}"
+    except (OSError, ValueError) as e:
+        return False, f"health check failed: {e!r}"
+    try:
+        status = json.loads(body).get("status")
+    except (ValueError, AttributeError):
+        return False, "health check returned invalid JSON"
+    if status in ("error", "unhealthy"):
+        return False, "health check reported an error"
+    return True, f"status {status}"
+
+
+async def escalate(message: str) -> None:
+    """Send an alert to the admin and every route's alert group."""
+    from telegram_repost_bot.config_reader import get_config
+    from telegram_repost_bot.routing import routes_from_config
+    from telegram_repost_bot.utils.message_service import get_notifier
+
+    config = get_config()
+    notifier = get_notifier()
+    body = f"<i>{message}</i>"
+    notifier.submit("email", [config.admin_email], body)
+    chat_ids = [config.admin_tg_id]
+    for route in routes_from_config(config):
+        if route.alert_chat_id not in chat_ids:
+            chat_ids.append(route.alert_chat_id)
+    notifier.submit("telegram", chat_ids, body)
+
+
+class Watchdog:
+    """
+    Poll the health endpoint and alert when the bot stays down.
+
+    An alert goes out after ``failures`` consecutive failed checks, and is
+    repeated at most every ``realert_interval`` seconds while the bot stays
+    down. A single recovery message follows once a check passes again.
+    """
+
+    def __init__(
+        self,
+        url: str = DEFAULT_URL,
+        interval: float = 15.0,
+        timeout: float = 5.0,
+        failures: int = 3,
+        realert_interval: float = 1800.0,
+    ) -> None:
+        self._url = url
+        self._interval = interval
+        self._timeout = timeout
+        self._failures = failures
+        self._realert_interval = realert_interval
+        self._failed = 0
+        self._alerted_at: Optional[float] = None
+
+    async def check(self) -> bool:
+        """Run one check, alerting if needed; return whether the bot is up."""
+        loop = asyncio.get_running_loop()
+        up, reason = await loop.run_in_executor(None, probe, self._url, self._timeout)
+        if up:
+            if self._alerted_at is not None:
+                await escalate("Repost bot is back up")
+            self._failed = 0
+            self._alerted_at = None
+            return True
+
+        self._failed += 1
+        logger.warning(f"Repost bot is down ({self._failed}): {reason}")
+        now = time.monotonic()
+        if self._failed >= self._failures and (
+            self._alerted_at is None or now - self._alerted_at >= self._realert_interval
+        ):
+            self._alerted_at = now
+            await escalate(f"Repost bot is fallen: {reason}")
+        return False
+
+    async def run(self) -> None:
+        while True:
+            await self.check()
+            await asyncio.sleep(self._interval)
+
+
+async def _main(args: argparse.Namespace) -> None:
+    if args.once:
+        watchdog = Watchdog(args.url, timeout=args.timeout, failures=1)
+        await watchdog.check()
+    else:
+        watchdog = Watchdog(
+            args.url, args.interval, args.timeout, args.failures, args.realert_interval
+        )
+        try:
+            await watchdog.run()
+        except asyncio.CancelledError:
+            pass
+    # Only flush alerts if one was actually queued.
+    if "telegram_repost_bot.utils.message_service" in sys.modules:
+        from telegram_repost_bot.utils.message_service import get_notifier
+
+        await get_notifier().close()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", default=DEFAULT_URL)
+    parser.add_argument("--interval", type=float, default=15.0, help="seconds")
+    parser.add_argument("--timeout", type=float, default=5.0, help="seconds")
+    parser.add_argument(
+        "--failures", type=int, default=3, help="failed checks before alerting"
+    )
+    parser.add_argument(
+        "--realert-interval",
+        type=float,
+        default=1800.0,
+        help="seconds between repeated alerts while down",
+    )
+    parser.add_argument("--once", action="store_true", help="check once and exit")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format=TEXT_FORMAT)
+    try:
+        asyncio.run(_main(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,51 @@
+import asyncio
 import base64
-from typing import List, Tuple
+import os
+import time
+from functools import partial
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from http.cookies import Morsel
+from typing import (
+    TYPE_CHECKING,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
 
-import requests
-from requests import RequestException
+import aiohttp
+from aiohttp import ClientError, ClientOSError, ServerDisconnectedError
 
-from telegram_repost_bot.config_reader import config
+from telegram_repost_bot.circuit_breaker import CircuitBreaker, CircuitOpen
 from telegram_repost_bot.logging_config import setup_logger
+from telegram_repost_bot.media import Photo, UploadedMedia
+from telegram_repost_bot.metrics import track
+from telegram_repost_bot.rate_limit import (
+    RETRYABLE_STATUSES,
+    RateLimited,
+    TokenBucket,
+    backoff,
+    parse_retry_after,
+)
+
+if TYPE_CHECKING:
+    from telegram_repost_bot.config_reader import RateLimit, Settings
 
 logger = setup_logger(__name__)
 
+RETRY_BASE_DELAY = 1.0  # Seconds before the first retry without Retry-After
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD"})
+
+USER_AGENT = "Mozilla/5.0 (Macintosh; Intel Mac OS X 10.15; rv:122.0) Gecko/20100101 Firefox/122.0"
+
 
 class BaseApi:
+    site = ""  # Label of the site in metrics
+
     def __init__(
         self,
         url: str,
@@ -18,78 +53,376 @@ class BaseApi:
         password: str,
         author_id: str,
         categories: List[int],
+        timeout: float = 30.0,
+        pool_size: int = 10,
+        keepalive_timeout: float = 60.0,
+        site: Optional[str] = None,
+        post_limiter: Optional[TokenBucket] = None,
+        media_limiter: Optional[TokenBucket] = None,
+        max_retries: int = 3,
+        retry_max_delay: float = 60.0,
+        breaker: Optional[CircuitBreaker] = None,
     ) -> None:
+        if site is not None:
+            self.site = site
         self._url = url
         self._username = username
         self._password = password
         self._author_id = author_id
         self._categories = categories
+        self._timeout = aiohttp.ClientTimeout(total=timeout)
+        self._pool_size = pool_size
+        self._keepalive_timeout = keepalive_timeout
+        self._post_limiter = post_limiter or TokenBucket(0)
+        self._media_limiter = media_limiter or TokenBucket(0)
+        self._max_retries = max_retries
+        self._retry_max_delay = retry_max_delay
+        self._breaker = breaker
+        wordpress_token = self._prepare_token(self._username, self._password)
+        self._headers = {
+            "User-Agent": USER_AGENT,
+            "Authorization": "Basic " + wordpress_token.decode("utf-8"),
+        }
+        self._session: aiohttp.ClientSession | None = None
 
-    def _send_publish_request_to_wordpress(
-        self, data: dict, session: requests.Session, image_path: str | None = None
-    ) -> None:
-        if image_path:
-            image_id, image_url = self.upload_image_to_wordpress(image_path, session)
-            data["featured_media"] = image_id
-            data["content"] = (
-                f'<img src="{image_url}" alt="Image description" />' + data["content"]
+    def _get_session(self) -> aiohttp.ClientSession:
+        """
+        Return the site's long-lived session, creating it on first use.
+
+        The session is created lazily because aiohttp binds it to the running
+        event loop, which does not exist yet when the module is imported.
+        """
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self._pool_size,
+                keepalive_timeout=self._keepalive_timeout,
             )
-        response = session.post(f"{self._url}/wp/v2/posts", json=data)
-        logger.info(
-            f"Publishing post to {self.__class__.__name__} - Status code: {response.status_code}. Response: {response.json()}"
-        )
-        if response.status_code == 201:
-            logger.info(f"The news was successfully published!: {response.json()}")
-        else:
-            error_text = f"Error when publishing news:{response.json()}"
-            logger.error(error_text, exc_info=True)
-            raise RequestException(error_text, response)
+            self._session = aiohttp.ClientSession(
+                headers=self._headers, timeout=self._timeout, connector=connector
+            )
+        return self._session
 
-    def publish_post_to_wordpress(
-        self, title: str, content: str, image_path: str | None = None
-    ) -> None:
-        wordpress_token = self._prepare_token(self._username, self._password)
+    async def close(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
 
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10.15; rv:122.0) Gecko/20100101 Firefox/122.0",
-            "Authorization": "Basic " + wordpress_token.decode("utf-8"),
-        }
+    async def _request(
+        self, method: str, endpoint: str, **kwargs
+    ) -> Tuple[int, dict | str]:
+        """
+        Call the WordPress REST API through the site's circuit breaker.
+
+        While the circuit is open CircuitOpen is raised without any network
+        call, not even for the hidden URL's cookies. Connection errors,
+        timeouts and 5xx responses count as failures of the site. Throttling
+        counts as neither failure nor success: the site is answering, but a
+        site alternating errors and 503s must still trip the breaker.
+        """
+        breaker = self._breaker
+        if breaker is None:
+            return await self._send(method, endpoint, **kwargs)
+        if not breaker.allow():
+            raise CircuitOpen(
+                f"{self._url} is failing, not calling it for {breaker.remaining:.0f}s",
+                breaker.remaining,
+            )
+        success = None
+        try:
+            status, response_data = await self._send(method, endpoint, **kwargs)
+            success = status < 500
+            return status, response_data
+        except RateLimited:
+            raise
+        except (ClientError, asyncio.TimeoutError):
+            success = False
+            raise
+        finally:
+            breaker.record(success)
+
+    async def _send(
+        self,
+        method: str,
+        endpoint: str,
+        json: dict | None = None,
+        form_factory: Callable[[], aiohttp.FormData] | None = None,
+        params: dict | None = None,
+        limiter: TokenBucket | None = None,
+    ) -> Tuple[int, dict | str]:
+        """
+        Send a request to the WordPress REST API and return the status and body.
+
+        A pooled keep-alive connection may have been closed by the server while
+        idle, so a GET that hits a dropped connection is retried once on a fresh
+        one. Other methods are not: the connection may have dropped after
+        WordPress got the request, and sending it again could create the post
+        twice, so the error is left to the outbox, which looks the post up
+        before retrying. A 401/403 is retried once if the site had cached
+        credentials to invalidate.
 
-        session = self._prepare_session(headers)
+        With a ``limiter``, the request first waits for a token, and a 429 or
+        503 is retried up to ``max_retries`` times after its ``Retry-After``,
+        or a jittered backoff without one; the whole bucket is paused meanwhile.
+        RateLimited is raised once retrying here would take too long.
+        """
+        session = self._get_session()
+        url = f"{self._url}{endpoint}"
+        stale_retried = auth_retried = False
+        throttled = 0
+        while True:
+            if limiter is not None:
+                await limiter.acquire()
+            data = form_factory() if form_factory else None
+            try:
+                async with session.request(
+                    method,
+                    url,
+                    json=json,
+                    data=data,
+                    params=params,
+                    cookies=await self._prepare_cookies(),
+                ) as response:
+                    status, response_data = (
+                        response.status,
+                        await self._read_json(response),
+                    )
+                    retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            except (ServerDisconnectedError, ClientOSError) as e:
+                if stale_retried or method not in IDEMPOTENT_METHODS:
+                    raise
+                stale_retried = True
+                logger.warning(f"Stale connection to {url}, retrying: {e!r}")
+                continue
+            if status in (401, 403) and not auth_retried and self._invalidate_cookies():
+                auth_retried = True
+                logger.warning(f"{url} returned {status}, retrying with fresh cookies")
+                continue
+            if limiter is not None and status in RETRYABLE_STATUSES:
+                delay = retry_after
+                if delay is None:
+                    delay = backoff(throttled, RETRY_BASE_DELAY, self._retry_max_delay)
+                if throttled >= self._max_retries or delay > self._retry_max_delay:
+                    raise RateLimited(
+                        f"{url} returned {status}: {response_data}", retry_after
+                    )
+                throttled += 1
+                logger.warning(f"{url} returned {status}, retrying in {delay:.1f}s")
+                limiter.pause(delay)
+                continue
+            return status, response_data
 
+    @staticmethod
+    def render_content(
+        content: str,
+        image: Optional[UploadedMedia] = None,
+        gallery: Sequence[UploadedMedia] = (),
+    ) -> str:
+        """Return a post's body: the featured image, the text, then the gallery."""
+        if image is not None:
+            image_tag = f'<img src="{image.source_url}" alt="Image description" />'
+            content = image_tag + content
+        if gallery:
+            ids = ",".join(str(media.id) for media in gallery)
+            content += f'\n\n[gallery ids="{ids}"]'
+        return content
+
+    async def _send_publish_request_to_wordpress(
+        self,
+        data: dict,
+        image: Union[Photo, UploadedMedia, str, None] = None,
+        gallery: Sequence[UploadedMedia] = (),
+    ) -> Tuple[int, int | None]:
+        if image and not isinstance(image, UploadedMedia):
+            image = await self.upload_image_to_wordpress(image)
+        image_id = None
+        if image:
+            image_id = data["featured_media"] = image.id
+        data["content"] = self.render_content(data["content"], image or None, gallery)
+
+        with track("publish_post", site=self.site):
+            status, response_data = await self._request(
+                "POST", "/wp/v2/posts", json=data, limiter=self._post_limiter
+            )
+            logger.info(
+                f"Publishing post to {self.__class__.__name__} - Status code: {status}. Response: {response_data}"
+            )
+            if status == 201:
+                logger.info(f"The news was successfully published!: {response_data}")
+                return response_data["id"], image_id
+            else:
+                error_text = f"Error when publishing news:{response_data}"
+                logger.error(error_text)
+                raise ClientError(error_text)
+
+    async def publish_post_to_wordpress(
+        self,
+        title: str,
+        content: str,
+        image: Union[Photo, UploadedMedia, str, None] = None,
+        gallery: Sequence[UploadedMedia] = (),
+        author_id: Optional[str] = None,
+        categories: Optional[Sequence[int]] = None,
+        tags: Optional[Sequence[int]] = None,
+    ) -> Tuple[int, int | None]:
+        """
+        Publish a post and return the IDs of the created post and featured media.
+
+        ``image`` becomes the featured image; ``gallery`` holds the rest of an
+        album's photos, already uploaded, and is appended as a gallery.
+        ``author_id`` and ``categories`` default to the site's own; ``tags``
+        are tag IDs.
+        """
         data = {
             "title": title,
             "content": content,
             "status": "publish",
-            "author": self._author_id,
-            "categories": self._categories,
+            "author": author_id or self._author_id,
+            "categories": list(self._categories if categories is None else categories),
         }
-        self._send_publish_request_to_wordpress(data, session, image_path)
+        if tags:
+            data["tags"] = list(tags)
+        return await self._send_publish_request_to_wordpress(data, image, gallery)
+
+    async def find_published_post(
+        self, title: str, after: datetime, author_id: Optional[str] = None
+    ) -> int | None:
+        """
+        Look up a post by this bot's author, or ``author_id``, with exactly
+        ``title`` published after ``after``.
 
-    def _prepare_session(self, headers: dict) -> requests.Session:
-        session = requests.Session()
-        session.headers.update(headers)
-        return session
+        Used before retrying a publish whose earlier attempt may have succeeded
+        on the server even though the response never reached us.
+        """
+        status, posts = await self._request(
+            "GET",
+            "/wp/v2/posts",
+            params={
+                "search": title,
+                "author": author_id or self._author_id,
+                # WordPress compares this with the site-local post date; UTC is
+                # never later than local time for our sites, so nothing is missed.
+                "after": after.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S"),
+                "per_page": 10,
+                "_fields": "id,title",
+                "context": "edit",
+            },
+            limiter=self._post_limiter,
+        )
+        if status != 200:
+            error_text = f"Error when searching posts:{posts}"
+            logger.error(error_text)
+            raise ClientError(error_text)
+        for post in posts:
+            if post["title"]["raw"] == title:
+                return post["id"]
+        return None
+
+    async def update_post(self, post_id: int, **fields) -> None:
+        """
+        Change only the given fields of a post, e.g. ``title`` or ``content``.
+
+        :param post_id: ID of the post.
+        """
+        with track("update_post", site=self.site):
+            status, response_data = await self._request(
+                "POST",
+                f"/wp/v2/posts/{post_id}",
+                json=fields,
+                limiter=self._post_limiter,
+            )
+            if status != 200:
+                error_text = f"Error when updating post {post_id}:{response_data}"
+                logger.error(error_text)
+                raise ClientError(error_text)
+        logger.info(f"Updated {sorted(fields)} of post {post_id} on {self.site}")
+
+    async def unpublish_post(self, post_id: int) -> None:
+        """Move a post back to drafts, taking it off the site."""
+        await self.update_post(post_id, status="draft")
+
+    async def get_media(self, media_id: int) -> UploadedMedia:
+        """Return the ID and URL of an item in the media library."""
+        status, media_data = await self._request(
+            "GET",
+            f"/wp/v2/media/{media_id}",
+            params={"_fields": "id,source_url"},
+            limiter=self._media_limiter,
+        )
+        if status != 200:
+            error_text = f"Error when fetching media {media_id}:{media_data}"
+            logger.error(error_text)
+            raise ClientError(error_text)
+        return UploadedMedia(media_data["id"], media_data["source_url"])
+
+    async def ping(self) -> None:
+        """Raise ClientError unless the REST API index answers with 200."""
+        status, _ = await self._request("GET", "/", params={"_fields": "name"})
+        if status != 200:
+            raise ClientError(f"{self._url} returned {status}")
+
+    async def _prepare_cookies(self) -> dict | None:
+        """Cookies to send with each request to the WordPress API."""
+        return None
+
+    def _invalidate_cookies(self) -> bool:
+        """Drop cached cookies; return True if a retry could help."""
+        return False
 
     def _prepare_token(self, username: str, password: str) -> bytes:
         wordpress_credentials = username + ":" + password
         wordpress_token = base64.b64encode(wordpress_credentials.encode())
         return wordpress_token
 
-    def upload_image_to_wordpress(self, image_path, session) -> Tuple[int, str]:
-        files = {"file": open(image_path, "rb")}
-        response = session.post(f"{self._url}/wp/v2/media", files=files)
-        if response.status_code == 201:
-            media_data = response.json()
-            logger.info(f"Publishing image to {self.__class__.__name__}: {media_data}")
-            return media_data["id"], media_data["source_url"]
-        else:
-            error_text = f"Error when publishing news:{response.json()}"
-            logger.error(error_text, exc_info=True)
-            raise RequestException(error_text)
+    async def upload_image_to_wordpress(
+        self, image: Union[Photo, str]
+    ) -> UploadedMedia:
+        """
+        Upload a photo to the media library and return its ID and URL.
+
+        :param image: An in-memory photo, or the path of a downloaded one.
+        """
+        if not isinstance(image, Photo):
+            with open(image, "rb") as image_file:
+                image = Photo(image_file.read(), os.path.basename(image))
+
+        def form_factory() -> aiohttp.FormData:
+            form = aiohttp.FormData()
+            form.add_field(
+                "file",
+                image.data,
+                filename=image.filename,
+                content_type=image.content_type,
+            )
+            return form
+
+        with track("upload_image_to_wordpress", site=self.site):
+            status, media_data = await self._request(
+                "POST",
+                "/wp/v2/media",
+                form_factory=form_factory,
+                limiter=self._media_limiter,
+            )
+            if status == 201:
+                logger.info(
+                    f"Publishing image to {self.__class__.__name__}: {media_data}"
+                )
+                return UploadedMedia(media_data["id"], media_data["source_url"])
+            else:
+                error_text = f"Error when publishing news:{media_data}"
+                logger.error(error_text)
+                raise ClientError(error_text)
+
+    @staticmethod
+    async def _read_json(response: aiohttp.ClientResponse):
+        try:
+            return await response.json(content_type=None)
+        except ValueError:
+            return await response.text()
 
 
 class WpRuApi(BaseApi):
+    site = "ru"
+
     def __init__(
         self,
         url: str,
@@ -98,49 +431,192 @@ class WpRuApi(BaseApi):
         author_id: str,
         categories: List[int],
         hidden_url: str,
+        cookie_ttl: float = 600.0,
+        cookie_refresh_margin: float = 60.0,
+        **kwargs,
     ) -> None:
-        super().__init__(url, username, password, author_id, categories)
+        super().__init__(url, username, password, author_id, categories, **kwargs)
         self._hidden_url = hidden_url
+        self._cookie_ttl = cookie_ttl
+        self._cookie_refresh_margin = cookie_refresh_margin
+        self._cookies: dict | None = None
+        self._cookies_expire_at = 0.0
+        self._cookies_refresh: asyncio.Task | None = None
 
-    def _visit_hidden_url_and_get_cookies(self) -> dict:
-        with requests.Session() as session:
-            response = session.get(self._hidden_url, allow_redirects=True)
-            if response.ok:
-                logger.info(f"Visiting hidden URL: {self._hidden_url}")
-                return session.cookies.get_dict()
-            else:
-                error_message = f"Error visiting hidden URL: {response.json()}"
-                logger.error(error_message)
-                raise RequestException(error_message)
+    async def _visit_hidden_url_and_get_cookies(self) -> Tuple[dict, float | None]:
+        """
+        Visit the hidden URL and return its cookies with their lifetime.
+
+        The lifetime is the shortest ``Max-Age``/``Expires`` among the cookies,
+        or None if they are all session cookies.
+        """
+        # A throwaway cookie jar keeps the handshake isolated, while sharing the
+        # connector lets it reuse the site's pooled connections.
+        async with aiohttp.ClientSession(
+            connector=self._get_session().connector,
+            connector_owner=False,
+            timeout=self._timeout,
+            cookie_jar=aiohttp.CookieJar(unsafe=True),
+        ) as session:
+            async with session.get(self._hidden_url, allow_redirects=True) as response:
+                if response.ok:
+                    logger.info(f"Visiting hidden URL: {self._hidden_url}")
+                    cookies = {
+                        cookie.key: cookie.value for cookie in session.cookie_jar
+                    }
+                    lifetimes = [
+                        lifetime
+                        for cookie in session.cookie_jar
+                        if (lifetime := _cookie_lifetime(cookie)) is not None
+                    ]
+                    return cookies, min(lifetimes, default=None)
+                else:
+                    error_message = (
+                        f"Error visiting hidden URL: {await self._read_json(response)}"
+                    )
+                    logger.error(error_message)
+                    raise ClientError(error_message)
+
+    async def _refresh_cookies(self) -> dict:
+        with track("hidden_url_cookies", site=self.site):
+            cookies, lifetime = await self._visit_hidden_url_and_get_cookies()
+        ttl = self._cookie_ttl if lifetime is None else min(self._cookie_ttl, lifetime)
+        self._cookies = cookies
+        self._cookies_expire_at = asyncio.get_running_loop().time() + ttl
+        return cookies
 
-    def _prepare_session(self, headers: dict) -> requests.Session:
+    def _start_cookies_refresh(self) -> asyncio.Task:
+        # Every caller shares the in-flight refresh instead of visiting the
+        # hidden URL again.
+        if self._cookies_refresh is None or self._cookies_refresh.done():
+            self._cookies_refresh = asyncio.create_task(self._refresh_cookies())
+            self._cookies_refresh.add_done_callback(_log_refresh_failure)
+        return self._cookies_refresh
+
+    async def _prepare_cookies(self) -> dict | None:
+        remaining = self._cookies_expire_at - asyncio.get_running_loop().time()
+        if self._cookies is not None and remaining > 0:
+            if remaining < self._cookie_refresh_margin:
+                self._start_cookies_refresh()
+            return self._cookies
+        return await asyncio.shield(self._start_cookies_refresh())
+
+    def _invalidate_cookies(self) -> bool:
+        self._cookies = None
+        self._cookies_expire_at = 0.0
+        return True
+
+
+def _cookie_lifetime(cookie: Morsel) -> float | None:
+    if cookie["max-age"]:
+        try:
+            return max(float(cookie["max-age"]), 0.0)
+        except ValueError:
+            pass
+    if cookie["expires"]:
         try:
-            session_cookie = self._visit_hidden_url_and_get_cookies()
-        except RequestException as e:
-            raise RequestException(f"{e}")
+            expires = parsedate_to_datetime(cookie["expires"])
+        except (TypeError, ValueError):
+            return None
+        return max(expires.timestamp() - time.time(), 0.0)
+    return None
 
-        session = requests.Session()
-        session.headers.update(headers)
-        session.cookies.update(session_cookie)
-        return session
+
+def _log_refresh_failure(task: asyncio.Task) -> None:
+    if not task.cancelled() and task.exception() is not None:
+        logger.error(f"Refreshing hidden URL cookies failed: {task.exception()!r}")
 
 
 class WpKgApi(BaseApi):
-    pass
+    site = "kg"
 
 
-wordpress_ru_api = WpRuApi(
-    config.wordpress_ru_url,
-    config.wordpress_ru_username,
-    config.wordpress_ru_password,
-    config.wordpress_ru_author_id,
-    config.wordpress_ru_categories,
-    config.wordpress_ru_hidden_url,
-)
-wordpress_kg_api = WpKgApi(
-    config.wordpress_kg_url,
-    config.wordpress_kg_username,
-    config.wordpress_kg_password,
-    config.wordpress_kg_author_id,
-    config.wordpress_kg_categories,
-)
+def _site_options(
+    config: "Settings",
+    site: str,
+    rate_limit: Optional["RateLimit"],
+    on_circuit_change: Optional[Callable[[str, str], None]],
+) -> dict:
+    """Connection settings, a request budget and a circuit breaker for one site."""
+    rate_limit = rate_limit or config.wordpress_rate_limit
+    return dict(
+        timeout=config.wordpress_request_timeout,
+        pool_size=config.wordpress_pool_size,
+        keepalive_timeout=config.wordpress_keepalive_timeout,
+        post_limiter=TokenBucket(rate_limit.post_rate, rate_limit.post_burst),
+        media_limiter=TokenBucket(rate_limit.media_rate, rate_limit.media_burst),
+        max_retries=config.wordpress_max_retries,
+        retry_max_delay=config.wordpress_retry_max_delay,
+        breaker=CircuitBreaker(
+            config.wordpress_failure_threshold,
+            config.wordpress_circuit_reset_timeout,
+            on_change=(
+                None if on_circuit_change is None else partial(on_circuit_change, site)
+            ),
+        ),
+    )
+
+
+def create_sites(
+    config: "Settings",
+    on_circuit_change: Optional[Callable[[str, str], None]] = None,
+) -> Dict[str, BaseApi]:
+    """
+    Build the API client of each WordPress site, keyed by site.
+
+    The original "ru" and "kg" sites are only built if they are configured.
+
+    :param config: Settings.
+    :param on_circuit_change: Called with a site and the new state whenever
+        the site's circuit breaker opens, half-opens or closes.
+    """
+    sites: Dict[str, BaseApi] = {}
+    if config.wordpress_ru_username is not None:
+        sites["ru"] = WpRuApi(
+            config.wordpress_ru_url,
+            config.wordpress_ru_username,
+            config.wordpress_ru_password,
+            config.wordpress_ru_author_id,
+            config.wordpress_ru_categories,
+            config.wordpress_ru_hidden_url,
+            config.wordpress_ru_cookie_ttl,
+            config.wordpress_ru_cookie_refresh_margin,
+            **_site_options(
+                config, "ru", config.wordpress_ru_rate_limit, on_circuit_change
+            ),
+        )
+    if config.wordpress_kg_username is not None:
+        sites["kg"] = WpKgApi(
+            config.wordpress_kg_url,
+            config.wordpress_kg_username,
+            config.wordpress_kg_password,
+            config.wordpress_kg_author_id,
+            config.wordpress_kg_categories,
+            **_site_options(
+                config, "kg", config.wordpress_kg_rate_limit, on_circuit_change
+            ),
+        )
+    for key, site in config.wordpress_sites.items():
+        credentials = (
+            site.url,
+            site.username,
+            site.password,
+            site.author_id,
+            site.categories,
+        )
+        if site.hidden_url:
+            sites[key] = WpRuApi(
+                *credentials,
+                site.hidden_url,
+                site.cookie_ttl,
+                site.cookie_refresh_margin,
+                site=key,
+                **_site_options(config, key, site.rate_limit, on_circuit_change),
+            )
+        else:
+            sites[key] = BaseApi(
+                *credentials,
+                site=key,
+                **_site_options(config, key, site.rate_limit, on_circuit_change),
+            )
+    return sites
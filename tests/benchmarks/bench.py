@@ -0,0 +1,108 @@
+"""
+Benchmark parse_post over the synthetic corpus.
+
+    python -m tests.benchmarks.bench                    # print a report
+    python -m tests.benchmarks.bench --update-baseline  # rewrite baseline.json
+
+Timings are divided by a fixed pure-Python calibration workload measured in
+the same process, so the committed baseline carries over between machines.
+"""
+
+import argparse
+import json
+import logging
+import statistics
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+from telegram_repost_bot.utils.utils import parse_post
+from tests.benchmarks.corpus import build_corpus
+
+BASELINE_PATH = Path(__file__).with_name("baseline.json")
+ROUNDS = 5
+
+
+def calibrate() -> float:
+    """Seconds taken by a fixed workload; the unit all results are scaled by."""
+    best = float("inf")
+    for _ in range(ROUNDS):
+        started = time.perf_counter()
+        parts = []
+        for n in range(20000):
+            parts.append(str(n * 7 % 13))
+        "".join(parts).encode("utf-16-le")
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def _percentile(samples: List[float], percent: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, round(percent / 100 * (len(ordered) - 1)))
+    return ordered[index]
+
+
+def measure(func: Callable, messages: List) -> Dict[str, float]:
+    """Per-call latency percentiles (seconds) and throughput (posts/second)."""
+    samples = []
+    for _ in range(ROUNDS):
+        for message in messages:
+            started = time.perf_counter()
+            func(message)
+            samples.append(time.perf_counter() - started)
+    return {
+        "p50": statistics.median(samples),
+        "p90": _percentile(samples, 90),
+        "p99": _percentile(samples, 99),
+        "throughput": len(samples) / sum(samples),
+    }
+
+
+def run() -> Dict[str, Dict[str, float]]:
+    """Benchmark every scenario; latencies are in calibration units."""
+    logging.disable(logging.CRITICAL)
+    try:
+        unit = calibrate()
+        results = {}
+        for scenario, messages in build_corpus().items():
+            stats = measure(parse_post, messages)
+            results[scenario] = {
+                "p50": stats["p50"] / unit,
+                "p99": stats["p99"] / unit,
+                "p50_us": stats["p50"] * 1e6,
+                "p90_us": stats["p90"] * 1e6,
+                "p99_us": stats["p99"] * 1e6,
+                "posts_per_second": stats["throughput"],
+            }
+        return results
+    finally:
+        logging.disable(logging.NOTSET)
+
+
+def load_baseline() -> Dict[str, Dict[str, float]]:
+    return json.loads(BASELINE_PATH.read_text())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args()
+
+    results = run()
+    print(f"{'scenario':<15}{'p50 µs':>10}{'p90 µs':>10}{'p99 µs':>10}{'posts/s':>12}")
+    for scenario, stats in results.items():
+        print(
+            f"{scenario:<15}{stats['p50_us']:>10.1f}{stats['p90_us']:>10.1f}"
+            f"{stats['p99_us']:>10.1f}{stats['posts_per_second']:>12.0f}"
+        )
+    if args.update_baseline:
+        baseline = {
+            scenario: {"p50": round(stats["p50"], 4), "p99": round(stats["p99"], 4)}
+            for scenario, stats in results.items()
+        }
+        BASELINE_PATH.write_text(json.dumps(baseline, indent=4) + "\n")
+        print(f"Baseline written to {BASELINE_PATH}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Synthetic, deterministic posts for benchmarking the parse/render pipeline.
+
+Every generator builds the text piece by piece and tracks its length in UTF-16
+code units, so entity offsets are exactly what Telegram would send.
+"""
+
+import random
+from typing import Dict, List
+
+from telethon.tl import types
+from telethon.tl.patched import Message
+
+from tests.factories import make_message, utf16_len
+
+WORDS = (
+    "Бишкек Жогорку Кеңеш кабарлар министрлик президент шайлоо суроо жооп "
+    "новости сегодня депутаты заявили решение парламент правительство город"
+).split()
+NON_BMP = ["😀", "🇰🇬", "💉", "🔥", "𝕏", "𝔸", "🧵", "📌", "👇"]
+
+
+class _Builder:
+    def __init__(self) -> None:
+        self.parts: List[str] = []
+        self.entities: List[types.TypeMessageEntity] = []
+        self.offset = 0
+
+    def add(self, text: str, entity_factory=None) -> None:
+        length = utf16_len(text)
+        if entity_factory is not None:
+            self.entities.append(entity_factory(self.offset, length))
+        self.parts.append(text)
+        self.offset += length
+
+    def message(self, message_id: int) -> Message:
+        return make_message("".join(self.parts), self.entities, message_id)
+
+
+def _sentence(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+def _entity_factory(rng: random.Random, n: int):
+    kind = n % 4
+    if kind == 0:
+        return lambda offset, length: types.MessageEntityTextUrl(
+            offset, length, f"https://kloop.kg/{n}"
+        )
+    if kind == 1:
+        return lambda offset, length: types.MessageEntityBold(offset, length)
+    if kind == 2:
+        return lambda offset, length: types.MessageEntityItalic(offset, length)
+    return lambda offset, length: types.MessageEntityUrl(offset, length)
+
+
+def _post(
+    rng: random.Random,
+    message_id: int,
+    paragraphs: int,
+    entities: int,
+    emoji_rate: float,
+) -> Message:
+    builder = _Builder()
+    builder.add(rng.choice(NON_BMP) + _sentence(rng, 6), types.MessageEntityBold)
+    builder.add("\n\n")
+    per_paragraph = max(entities // paragraphs, 0)
+    extra = entities - per_paragraph * paragraphs
+    for paragraph in range(paragraphs):
+        count = per_paragraph + (1 if paragraph < extra else 0)
+        for n in range(count):
+            if rng.random() < emoji_rate:
+                builder.add(rng.choice(NON_BMP) + " ")
+            builder.add(_sentence(rng, rng.randint(3, 12)) + " ")
+            factory = _entity_factory(rng, n)
+            if n % 4 == 3:
+                builder.add(f"https://kloop.kg/{message_id}/{n}", factory)
+            else:
+                builder.add(_sentence(rng, 2), factory)
+            builder.add(" ")
+        builder.add(_sentence(rng, 20) + "\n\n")
+    builder.add("#новости #кабарлар")
+    return builder.message(message_id)
+
+
+def build_corpus(seed: int = 3487) -> Dict[str, List[Message]]:
+    """Return the benchmark posts grouped by scenario."""
+    rng = random.Random(seed)
+    return {
+        "short": [_post(rng, n, 2, 3, 0.05) for n in range(200)],
+        "long": [_post(rng, n, 60, 40, 0.05) for n in range(20)],
+        "emoji_heavy": [_post(rng, n, 10, 30, 0.9) for n in range(50)],
+        "many_entities": [_post(rng, n, 20, 400, 0.1) for n in range(10)],
+    }
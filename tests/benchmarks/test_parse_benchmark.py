@@ -0,0 +1,50 @@
+import os
+import time
+import unittest
+
+from telegram_repost_bot.utils.entities import render_entities
+from tests.benchmarks import bench
+from tests.benchmarks.corpus import _Builder
+from telethon.tl import types
+
+# How much slower than the committed baseline a scenario may get before the
+# run fails. Generous by default, since CI machines are noisy.
+TOLERANCE = float(os.environ.get("BENCH_TOLERANCE", "2.0"))
+
+
+class TestParseBenchmark(unittest.TestCase):
+    def test_no_regression_against_baseline(self):
+        results = bench.run()
+        baseline = bench.load_baseline()
+        for scenario, expected in baseline.items():
+            with self.subTest(scenario=scenario):
+                self.assertLessEqual(
+                    results[scenario]["p50"],
+                    expected["p50"] * TOLERANCE,
+                    f"{scenario} p50 regressed: {results[scenario]['p50_us']:.1f}µs",
+                )
+
+    def test_render_time_is_linear_in_entities(self):
+        def post(links: int) -> tuple:
+            builder = _Builder()
+            for n in range(links):
+                builder.add("😀 текст ")
+                builder.add(
+                    "ссылка", lambda o, l: types.MessageEntityTextUrl(o, l, "https://x")
+                )
+                builder.add(" ")
+            message = builder.message(1)
+            return message.message, message.entities
+
+        def best_time(text, entities) -> float:
+            best = float("inf")
+            for _ in range(5):
+                started = time.perf_counter()
+                render_entities(text, entities)
+                best = min(best, time.perf_counter() - started)
+            return best
+
+        small = best_time(*post(200))
+        large = best_time(*post(2000))
+        # 10x the input: linear work is ~10x, quadratic would be ~100x.
+        self.assertLess(large / small, 25)
@@ -0,0 +1,49 @@
+from datetime import datetime, timezone
+from typing import List, Optional
+
+from telethon.tl import types
+from telethon.tl.patched import Message
+
+
+def make_message(
+    text: str,
+    entities: Optional[List[types.TypeMessageEntity]] = None,
+    message_id: int = 1,
+    channel_id: int = 1001,
+) -> Message:
+    """Build a channel message the way Telethon delivers it in NewMessage."""
+    return Message(
+        id=message_id,
+        peer_id=types.PeerChannel(channel_id),
+        date=datetime(2024, 5, 1, 12, 0, tzinfo=timezone.utc),
+        message=text,
+        entities=entities,
+        post=True,
+    )
+
+
+def make_photo_message(
+    message_id: int,
+    photo_id: int,
+    text: str = "",
+    grouped_id: Optional[int] = None,
+    channel_id: int = 1001,
+) -> Message:
+    """Build a channel message with a photo, e.g. one part of an album."""
+    message = make_message(text, message_id=message_id, channel_id=channel_id)
+    message.grouped_id = grouped_id
+    message.media = types.MessageMediaPhoto(
+        photo=types.Photo(
+            id=photo_id,
+            access_hash=0,
+            file_reference=b"",
+            date=message.date,
+            sizes=[],
+            dc_id=2,
+        )
+    )
+    return message
+
+
+def utf16_len(text: str) -> int:
+    return len(text.encode("utf-16-le")) // 2
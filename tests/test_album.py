@@ -0,0 +1,104 @@
+import asyncio
+import tempfile
+import unittest
+from pathlib import Path
+from types import SimpleNamespace
+
+from telegram_repost_bot.album import AlbumCollector
+from telegram_repost_bot.main import RepostBot
+from telegram_repost_bot.media_cache import MediaCache
+from telegram_repost_bot.outbox import Outbox
+from telegram_repost_bot.post_index import PostIndex
+from telegram_repost_bot.routing import Route, Target
+from telegram_repost_bot.storage import open_database
+from tests.factories import make_photo_message
+
+CHAT_ID = -1000000001001
+
+
+class FakeClient:
+    def __init__(self):
+        self.downloads = []
+
+    async def download_media(self, message, file=None):
+        self.downloads.append(message.id)
+        return f"photo {message.photo.id}".encode()
+
+
+class TestAlbumCollector(unittest.TestCase):
+    def test_parts_are_handed_over_together_in_order(self):
+        albums = []
+
+        async def on_album(messages):
+            albums.append([message.id for message in messages])
+
+        async def run():
+            collector = AlbumCollector(0.05, on_album)
+            for message_id in (3, 1, 2):
+                collector.add(make_photo_message(message_id, message_id, grouped_id=9))
+                # Each part restarts the window, so the album is not cut short.
+                await asyncio.sleep(0.03)
+            self.assertEqual(albums, [])
+            await asyncio.sleep(0.1)
+
+        asyncio.run(run())
+        self.assertEqual(albums, [[1, 2, 3]])
+
+
+class TestAlbumPost(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = Path(self.tmp.name) / "bot.sqlite3"
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_album_is_queued_once_per_site_with_all_photos(self):
+        client = FakeClient()
+        album = [
+            make_photo_message(11, 101, "Title\n\nBody #news", grouped_id=9),
+            make_photo_message(12, 102, grouped_id=9),
+            make_photo_message(13, 103, grouped_id=9),
+        ]
+        for message in album:
+            message._client = client
+        route = Route(CHAT_ID, ("#news",), -200, (Target("ru"), Target("kg")), CHAT_ID)
+
+        async def run():
+            bot = RepostBot.__new__(RepostBot)
+            bot.config = SimpleNamespace(media_streaming=True)
+            bot.outbox = Outbox(open_database(self.db_path))
+            bot.post_index = PostIndex(open_database(self.db_path))
+            bot.media_cache = MediaCache(
+                open_database(self.db_path), Path(self.tmp.name), 1000, 10
+            )
+            bot.media_semaphore = asyncio.Semaphore(4)
+            bot.outbox_workers = SimpleNamespace(notify=lambda: None)
+            try:
+                await bot.process_post(route, album[0], album[0].message, album)
+                items = []
+                while True:
+                    item = await bot.outbox.next_due([item.id for item in items])
+                    if item is None:
+                        return items
+                    items.append(item)
+            finally:
+                bot.outbox.close()
+                bot.post_index.close()
+                bot.media_cache.close()
+
+        items = asyncio.run(run())
+        self.assertEqual(sorted(item.site for item in items), ["kg", "ru"])
+        for item in items:
+            self.assertEqual((item.message_id, item.title), (11, "Title"))
+            self.assertEqual(
+                [(photo.photo_id, photo.message_id) for photo in item.photos],
+                [(101, 11), (102, 12), (103, 13)],
+            )
+            self.assertEqual(item.photos[2].media, b"photo 103")
+        # Each photo is downloaded once, for both sites.
+        self.assertEqual(sorted(client.downloads), [11, 12, 13])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,141 @@
+import asyncio
+import tempfile
+import unittest
+from pathlib import Path
+from types import SimpleNamespace
+
+from telegram_repost_bot.backfill import Backfill, group_albums
+from telegram_repost_bot.channel_state import ChannelState
+from telegram_repost_bot.routing import Route, Router, Target
+from telegram_repost_bot.storage import open_database
+
+
+def make_message(message_id, grouped_id=None):
+    return SimpleNamespace(id=message_id, grouped_id=grouped_id, message="text")
+
+
+class FakeClient:
+    def __init__(self, messages):
+        self.messages = messages
+        self.requests = []
+
+    async def iter_messages(self, chat_id, limit=None, min_id=0, reverse=False):
+        self.requests.append((chat_id, min_id, limit))
+        messages = [m for m in self.messages if m.id > min_id]
+        if not reverse:
+            messages.reverse()
+        for message in messages[:limit]:
+            yield message
+
+    def is_connected(self):
+        return True
+
+
+class TestBackfill(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = Path(self.tmp.name) / "state.sqlite3"
+        self.route = Route(-100, ("#news",), -200, (Target("ru"),), chat_id=-100)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def catch_up(
+        self, client, last_message_id=None, seen=(), forget=(), fail=(), **kwargs
+    ):
+        handled = []
+
+        async def handle(route, messages):
+            if messages[0].id in fail:
+                raise ConnectionError("site down")
+            handled.append([message.id for message in messages])
+
+        async def run():
+            state = ChannelState(open_database(self.db_path))
+            if last_message_id is not None:
+                await state.advance(-100, last_message_id)
+            backfill = Backfill(client, Router([self.route]), state, handle, **kwargs)
+            for message_id in seen:
+                backfill.seen(-100, message_id)
+            backfill.forget(-100, list(forget))
+            await backfill.catch_up()
+            last = state.get(-100)
+            state.close()
+            return last
+
+        return handled, asyncio.run(run())
+
+    def test_messages_handled_live_are_skipped_after_a_restart(self):
+        async def handle_live():
+            state = ChannelState(open_database(self.db_path))
+            await state.advance(-100, 3)
+            backfill = Backfill(None, Router([self.route]), state, None)
+            await backfill.handled(-100, [2, 4, 5])
+            state.close()
+
+        asyncio.run(handle_live())
+        client = FakeClient([make_message(n) for n in (4, 5, 6)])
+        handled, last = self.catch_up(client)
+        self.assertEqual(handled, [[6]])
+        self.assertEqual(last, 6)
+        state = ChannelState(open_database(self.db_path))
+        self.assertEqual(state.handled(-100), set())
+        state.close()
+
+    def test_albums_are_kept_together(self):
+        messages = [make_message(1), make_message(2, 9), make_message(3, 9)]
+        self.assertEqual(
+            [[m.id for m in group] for group in group_albums(messages)],
+            [[1], [2, 3]],
+        )
+
+    def test_first_run_starts_from_newest_message(self):
+        client = FakeClient([make_message(n) for n in (1, 2, 3)])
+        handled, last = self.catch_up(client)
+        self.assertEqual(handled, [])
+        self.assertEqual(last, 3)
+
+    def test_missed_messages_are_handled_in_batches(self):
+        client = FakeClient(
+            [make_message(n) for n in (4, 5, 6)]
+            + [make_message(7, 70), make_message(8, 70), make_message(9)]
+        )
+        handled, last = self.catch_up(
+            client, last_message_id=5, seen=(9,), batch_size=2
+        )
+        self.assertEqual(sorted(handled), [[6], [7, 8]])
+        self.assertEqual(last, 9)
+        self.assertEqual(client.requests, [(-100, 5, 1000)])
+
+    def test_failed_posts_are_retried_by_the_next_sweep(self):
+        client = FakeClient(
+            [make_message(n) for n in (4, 5)]
+            + [make_message(6, 60), make_message(7, 60), make_message(8)]
+        )
+        handled, last = self.catch_up(
+            client, last_message_id=3, fail=(6,), batch_size=2
+        )
+        self.assertEqual(sorted(handled), [[4], [5], [8]])
+        self.assertEqual(last, 5)
+
+        handled, last = self.catch_up(client)
+        self.assertEqual(handled, [[6, 7]])
+        self.assertEqual(last, 8)
+
+    def test_messages_the_live_handler_failed_on_are_retried(self):
+        client = FakeClient([make_message(n) for n in (4, 5)])
+        handled, last = self.catch_up(
+            client, last_message_id=3, seen=(4, 5), forget=(5,)
+        )
+        self.assertEqual(handled, [[5]])
+        self.assertEqual(last, 5)
+
+    def test_position_never_moves_back(self):
+        client = FakeClient([make_message(n) for n in (1, 2)])
+        handled, last = self.catch_up(client, last_message_id=10)
+        self.assertEqual(handled, [])
+        self.assertEqual(last, 10)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,129 @@
+import asyncio
+import time
+import unittest
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from telegram_repost_bot.circuit_breaker import (
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    CircuitBreaker,
+)
+from telegram_repost_bot.wp_api import BaseApi
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    def test_opens_after_consecutive_failures(self):
+        changes = []
+        breaker = CircuitBreaker(3, reset_timeout=60, on_change=changes.append)
+        for success in (False, False, True, False, False):
+            self.assertTrue(breaker.allow())
+            breaker.record(success)
+        self.assertEqual(breaker.state, CLOSED)
+        self.assertTrue(breaker.allow())
+        breaker.record(False)
+        self.assertEqual(breaker.state, OPEN)
+        self.assertFalse(breaker.allow())
+        self.assertEqual(changes, [OPEN])
+
+    def test_single_half_open_probe(self):
+        changes = []
+        breaker = CircuitBreaker(1, reset_timeout=0.05, on_change=changes.append)
+        breaker.allow()
+        breaker.record(False)
+        time.sleep(0.06)
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())
+        breaker.record(False)
+        self.assertEqual(breaker.state, OPEN)
+
+        time.sleep(0.06)
+        self.assertTrue(breaker.allow())
+        breaker.record(True)
+        self.assertEqual(breaker.state, CLOSED)
+        self.assertEqual(changes, [OPEN, HALF_OPEN, OPEN, HALF_OPEN, CLOSED])
+
+
+class TestSiteCircuit(unittest.TestCase):
+    def test_failing_site_is_not_called_while_open(self):
+        calls = []
+
+        async def index(request):
+            calls.append(request.path)
+            return web.json_response({}, status=500 if len(calls) <= 2 else 200)
+
+        async def run():
+            app = web.Application()
+            app.router.add_get("/", index)
+            async with TestServer(app) as server:
+                api = BaseApi(
+                    str(server.make_url("")).rstrip("/"),
+                    "user",
+                    "pass",
+                    "1",
+                    [],
+                    breaker=CircuitBreaker(2, reset_timeout=0.1),
+                )
+                errors = []
+                try:
+                    for _ in range(4):
+                        try:
+                            await api.ping()
+                        except Exception as e:
+                            errors.append(type(e).__name__)
+                    await asyncio.sleep(0.11)
+                    await api.ping()
+                finally:
+                    await api.close()
+                return errors
+
+        errors = asyncio.run(run())
+        self.assertEqual(
+            errors, ["ClientError", "ClientError", "CircuitOpen", "CircuitOpen"]
+        )
+        self.assertEqual(len(calls), 3)
+
+    def test_throttling_does_not_reset_the_failure_count(self):
+        calls = []
+
+        async def create_post(request):
+            calls.append(request.path)
+            if len(calls) % 2:
+                return web.json_response({}, status=502)
+            return web.json_response({}, status=503, headers={"Retry-After": "600"})
+
+        async def run():
+            app = web.Application()
+            app.router.add_post("/wp/v2/posts", create_post)
+            async with TestServer(app) as server:
+                api = BaseApi(
+                    str(server.make_url("")).rstrip("/"),
+                    "user",
+                    "pass",
+                    "1",
+                    [],
+                    breaker=CircuitBreaker(3, reset_timeout=60),
+                )
+                errors = []
+                try:
+                    for _ in range(6):
+                        try:
+                            await api.publish_post_to_wordpress("Title", "Body")
+                        except Exception as e:
+                            errors.append(type(e).__name__)
+                finally:
+                    await api.close()
+                return errors
+
+        errors = asyncio.run(run())
+        self.assertEqual(
+            errors,
+            ["ClientError", "RateLimited"] * 2 + ["ClientError", "CircuitOpen"],
+        )
+        self.assertEqual(len(calls), 5)
+
+
+if __name__ == "__main__":
+    unittest.main()
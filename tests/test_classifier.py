@@ -0,0 +1,80 @@
+import time
+import unittest
+
+from telegram_repost_bot.classifier import Classifier, Rule, compile_terms
+from telegram_repost_bot.routing import Route, Target
+
+
+class TestClassifier(unittest.TestCase):
+    def setUp(self):
+        self.classifier = Classifier(
+            [
+                Rule(("#новости", "#кабарлар"), post=True),
+                Rule(("#реклама",), skip=True),
+                Rule(("#спорт", "футбол"), categories={"ru": (7,)}, tags={"ru": (70,)}),
+                Rule(("суд", "#суд"), categories={"ru": (8, 7), "kg": (3,)}),
+            ]
+        )
+
+    def test_hashtag_marks_a_post(self):
+        result = self.classifier.classify("Заголовок\n\nТекст\n\n#новости")
+        self.assertTrue(result.is_post)
+        self.assertIsNone(result.categories_for("ru"))
+
+    def test_terms_match_whole_words_in_any_case(self):
+        self.assertTrue(self.classifier.classify("#Новости. Текст").is_post)
+        self.assertFalse(self.classifier.classify("#новостиКР").is_post)
+        self.assertFalse(self.classifier.classify("новости").is_post)
+        self.assertEqual(self.classifier.classify("Суды").matched, ())
+
+    def test_skip_rule_wins(self):
+        result = self.classifier.classify("Текст #новости #реклама")
+        self.assertTrue(result.post)
+        self.assertFalse(result.is_post)
+
+    def test_categories_and_tags_are_merged_in_rule_order(self):
+        result = self.classifier.classify("Суд отменил ФУТБОЛ\n\n#новости #спорт")
+        self.assertTrue(result.is_post)
+        self.assertEqual(result.categories_for("ru"), [7, 8])
+        self.assertEqual(result.categories_for("kg"), [3])
+        self.assertEqual(result.tags_for("ru"), [70])
+        self.assertIsNone(result.tags_for("kg"))
+
+    def test_no_rules(self):
+        self.assertFalse(Classifier([]).classify("#новости").is_post)
+
+    def test_longer_term_sharing_a_prefix(self):
+        pattern = compile_terms(["суд", "суд присяжных", "#суд"])
+        self.assertEqual(
+            [m.group() for m in pattern.finditer("суд присяжных, #суд, суд.")],
+            ["суд присяжных", "#суд", "суд"],
+        )
+
+    def test_route_defaults_to_its_hashtags(self):
+        route = Route(-1003, ("#news",), -203, (Target("ru"),))
+        self.assertTrue(route.classifier.classify("Title\n\nText #news").is_post)
+
+    def test_cost_does_not_grow_with_the_rules(self):
+        text = ("Длинный текст новости про экономику и политику. " * 40) + "#новости"
+
+        def best_time(rule_count: int) -> float:
+            classifier = Classifier(
+                [Rule(("#новости",), post=True)]
+                + [
+                    Rule((f"#тег{n}", f"ключевое слово {n}"), categories={"ru": (n,)})
+                    for n in range(rule_count)
+                ]
+            )
+            best = float("inf")
+            for _ in range(5):
+                started = time.perf_counter()
+                classifier.classify(text)
+                best = min(best, time.perf_counter() - started)
+            return best
+
+        # 100x the rules; trying each term in turn would be ~100x slower.
+        self.assertLess(best_time(500) / best_time(5), 5)
+
+
+if __name__ == "__main__":
+    unittest.main()
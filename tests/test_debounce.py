@@ -0,0 +1,35 @@
+import asyncio
+import unittest
+
+from telegram_repost_bot.debounce import Debouncer
+
+
+class TestDebouncer(unittest.TestCase):
+    def test_rescheduling_restarts_the_timer(self):
+        calls = []
+
+        async def callback(key):
+            calls.append(key)
+
+        async def run():
+            debouncer = Debouncer(callback)
+            for _ in range(3):
+                debouncer.schedule("a", 0.05)
+                await asyncio.sleep(0.03)
+            self.assertIn("a", debouncer)
+            self.assertEqual(calls, [])
+            await asyncio.sleep(0.05)
+            self.assertNotIn("a", debouncer)
+
+            debouncer.schedule("b", 0.05)
+            debouncer.fire("b")
+            debouncer.schedule("c", 0.05)
+            self.assertTrue(debouncer.cancel("c"))
+            await debouncer.close()
+
+        asyncio.run(run())
+        self.assertEqual(calls, ["a", "b"])
+
+
+if __name__ == "__main__":
+    unittest.main()
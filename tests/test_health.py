@@ -0,0 +1,108 @@
+import asyncio
+import time
+import unittest
+
+from telegram_repost_bot.health import (
+    DEGRADED,
+    OK,
+    UNHEALTHY,
+    HealthMonitor,
+    HealthState,
+    HealthThresholds,
+)
+
+
+class FakeApi:
+    def __init__(self, error=None):
+        self.error = error
+        self.pings = 0
+
+    async def ping(self):
+        self.pings += 1
+        if self.error:
+            raise self.error
+
+
+class TestHealthState(unittest.TestCase):
+    def make_state(self, connected=True, **thresholds):
+        return HealthState(
+            ["kloopnews"],
+            ["ru"],
+            lambda: connected,
+            HealthThresholds(**thresholds),
+        )
+
+    def test_fresh_bot_is_ok(self):
+        status, report = self.make_state().report()
+        self.assertEqual(status, OK)
+        self.assertEqual(report["message"], "Bot is running")
+        self.assertEqual(report["telegram"]["last_update_age"], {"kloopnews": None})
+
+    def test_disconnected_client_is_unhealthy(self):
+        status, _ = self.make_state(connected=False).report()
+        self.assertEqual(status, UNHEALTHY)
+
+    def test_quiet_channel_and_unreachable_site_degrade(self):
+        state = self.make_state(update_max_age=0)
+        state.record_probe("ru", "ClientError('503')")
+        status, report = state.report()
+        self.assertEqual(status, DEGRADED)
+        self.assertFalse(report["wordpress"]["ru"]["reachable"])
+
+    def test_open_circuit_degrades(self):
+        state = self.make_state()
+        state.record_circuit("ru", "open")
+        status, report = state.report()
+        self.assertEqual(status, DEGRADED)
+        self.assertEqual(report["message"], "WordPress ru circuit is open")
+        self.assertEqual(report["wordpress"]["ru"]["circuit"], "open")
+        state.record_circuit("ru", "closed")
+        self.assertEqual(state.report()[0], OK)
+
+    def test_waiting_posts_without_progress_are_unhealthy(self):
+        state = self.make_state(publish_degraded_age=0, publish_unhealthy_age=0)
+        state.record_publish("ru")
+        self.assertEqual(state.report()[0], OK)
+        state.set_pending({"ru": 1})
+        time.sleep(0.01)
+        self.assertEqual(state.report()[0], UNHEALTHY)
+
+    def test_quiet_site_is_not_stalled_by_another_sites_posts(self):
+        state = HealthState(
+            [],
+            ["ru", "kg"],
+            lambda: True,
+            HealthThresholds(publish_degraded_age=0, publish_unhealthy_age=0),
+        )
+        state.record_publish("ru")
+        state.set_pending({"ru": 1})
+        time.sleep(0.01)
+        status, report = state.report()
+        self.assertEqual(status, UNHEALTHY)
+        self.assertEqual(report["message"].count("Nothing published"), 1)
+        self.assertIn("Nothing published to ru", report["message"])
+        self.assertEqual(report["wordpress"]["kg"]["pending"], 0)
+
+
+class TestHealthMonitor(unittest.TestCase):
+    def test_probes_and_queue_depth_are_cached(self):
+        state = HealthState([], ["ru", "kg"], lambda: True)
+        sites = {"ru": FakeApi(), "kg": FakeApi(ConnectionError("down"))}
+
+        async def pending():
+            return {"ru": 2, "kg": 1}
+
+        async def run():
+            monitor = HealthMonitor(state, sites, pending, 0.01, probe_interval=60)
+            task = asyncio.create_task(monitor.run())
+            await asyncio.sleep(0.05)
+            reports = [state.report() for _ in range(10)]
+            task.cancel()
+            return reports[-1]
+
+        status, report = asyncio.run(run())
+        self.assertEqual(status, DEGRADED)
+        self.assertEqual(report["outbox"]["pending"], 3)
+        self.assertTrue(report["wordpress"]["ru"]["reachable"])
+        self.assertFalse(report["wordpress"]["kg"]["reachable"])
+        self.assertEqual([api.pings for api in sites.values()], [1, 1])
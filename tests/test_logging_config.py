@@ -0,0 +1,56 @@
+import json
+import logging
+from logging.handlers import QueueHandler
+import tempfile
+import unittest
+from pathlib import Path
+
+from telegram_repost_bot.logging_config import (
+    Lazy,
+    setup_logger,
+    setup_logging,
+    shutdown_logging,
+)
+
+
+class TestLogging(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.calls = []
+
+    def tearDown(self):
+        shutdown_logging()
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            if isinstance(handler, QueueHandler):
+                root.removeHandler(handler)
+        self.tmp.cleanup()
+
+    def dump(self, value):
+        self.calls.append(value)
+        return f"dumped {value}"
+
+    def test_lazy_argument_is_skipped_when_level_is_off(self):
+        setup_logging(logging.INFO, self.tmp.name)
+        logger = setup_logger("telegram_repost_bot.test")
+        logger.debug("Message: %s", Lazy(self.dump, 1))
+        shutdown_logging()
+        self.assertEqual(self.calls, [])
+
+    def test_records_are_written_as_json_lines(self):
+        setup_logging(logging.DEBUG, self.tmp.name)
+        logger = setup_logger("telegram_repost_bot.test")
+        logger.debug("Message: %s", Lazy(self.dump, "привет"))
+        logger.info("Second")
+        shutdown_logging()
+
+        lines = (Path(self.tmp.name) / "telegram_repost_bot.log").read_text(
+            encoding="utf-8"
+        )
+        records = [json.loads(line) for line in lines.splitlines()]
+        self.assertEqual(
+            [(r["level"], r["msg"]) for r in records],
+            [("DEBUG", "Message: dumped привет"), ("INFO", "Second")],
+        )
+        self.assertEqual(records[0]["logger"], "telegram_repost_bot.test")
+        self.assertEqual(self.calls, ["привет"])
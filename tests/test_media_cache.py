@@ -0,0 +1,83 @@
+import asyncio
+import tempfile
+import unittest
+from pathlib import Path
+
+from telegram_repost_bot.media import UploadedMedia
+from telegram_repost_bot.media_cache import MediaCache
+from telegram_repost_bot.outbox import Outbox, OutboxItem, OutboxPhoto
+from telegram_repost_bot.storage import open_database
+
+
+class TestMediaCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = Path(self.tmp.name) / "bot.sqlite3"
+        self.directory = Path(self.tmp.name) / "downloads"
+        self.downloads = []
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    async def download(self, path: str) -> str:
+        self.downloads.append(path)
+        Path(path).write_bytes(b"x" * 10)
+        return path
+
+    def test_hit_skips_download_and_lru_is_evicted(self):
+        async def run():
+            outbox = Outbox(open_database(self.db_path))
+            cache = MediaCache(
+                open_database(self.db_path), self.directory, 1000, max_entries=2
+            )
+            first = await cache.get_or_download(1, self.download)
+            await cache.get_or_download(2, self.download)
+            await cache.get_or_download(1, self.download)
+            await cache.get_or_download(3, self.download)
+            cache.close()
+            outbox.close()
+            return first
+
+        first = asyncio.run(run())
+        self.assertEqual(len(self.downloads), 3)
+        self.assertTrue(Path(first).exists())
+        self.assertFalse((self.directory / "2.jpg").exists())
+        self.assertTrue((self.directory / "3.jpg").exists())
+
+    def test_queued_photo_is_not_evicted(self):
+        async def run():
+            outbox = Outbox(open_database(self.db_path))
+            cache = MediaCache(
+                open_database(self.db_path), self.directory, 1000, max_entries=1
+            )
+            path = await cache.get_or_download(1, self.download)
+            await outbox.enqueue(
+                OutboxItem(
+                    site="ru",
+                    chat_id=-100,
+                    message_id=1,
+                    alert_chat_id=-200,
+                    title="Заголовок",
+                    content="Текст",
+                    photos=[OutboxPhoto(1, media_path=path)],
+                )
+            )
+            await cache.get_or_download(2, self.download)
+            cache.close()
+            outbox.close()
+
+        asyncio.run(run())
+        self.assertTrue((self.directory / "1.jpg").exists())
+        self.assertFalse((self.directory / "2.jpg").exists())
+
+    def test_uploads_are_remembered_per_site(self):
+        async def run():
+            cache = MediaCache(open_database(self.db_path), self.directory, 1000, 10)
+            await cache.record_upload(1, "ru", UploadedMedia(5, "https://x/1.jpg"))
+            result = cache.get_upload(1, "ru"), cache.get_upload(1, "kg")
+            cache.close()
+            return result
+
+        ru, kg = asyncio.run(run())
+        self.assertEqual(ru, UploadedMedia(5, "https://x/1.jpg"))
+        self.assertIsNone(kg)
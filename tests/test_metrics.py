@@ -0,0 +1,49 @@
+import unittest
+
+from telegram_repost_bot.metrics import STAGE_ERRORS, STAGE_TOTAL, Registry, track
+
+
+class TestMetrics(unittest.TestCase):
+    def setUp(self):
+        self.registry = Registry()
+
+    def test_histogram_renders_cumulative_buckets(self):
+        histogram = self.registry.histogram(
+            "stage_seconds", "Stage time.", ("stage",), buckets=(0.1, 1.0)
+        )
+        for value in (0.05, 0.5, 0.5, 3.0):
+            histogram.observe(value, stage="parse_post")
+
+        lines = self.registry.render().splitlines()
+        self.assertEqual(
+            lines,
+            [
+                "# HELP stage_seconds Stage time.",
+                "# TYPE stage_seconds histogram",
+                'stage_seconds_bucket{stage="parse_post",le="0.1"} 1',
+                'stage_seconds_bucket{stage="parse_post",le="1.0"} 3',
+                'stage_seconds_bucket{stage="parse_post",le="+Inf"} 4',
+                'stage_seconds_sum{stage="parse_post"} 4.05',
+                'stage_seconds_count{stage="parse_post"} 4',
+            ],
+        )
+
+    def test_label_values_are_escaped(self):
+        counter = self.registry.counter("errors_total", "Errors.", ("error",))
+        counter.inc(error='say "hi"\n')
+        self.assertIn(
+            'errors_total{error="say \\"hi\\"\\n"} 1.0', self.registry.render()
+        )
+
+
+class TestTrack(unittest.TestCase):
+    def test_failures_are_counted_by_exception_type(self):
+        labels = dict(stage="test_stage", channel="kloopnews", site="ru")
+        with self.assertRaises(ValueError):
+            with track(**labels):
+                raise ValueError("bad post")
+        with track(**labels):
+            pass
+
+        self.assertEqual(STAGE_TOTAL.value(**labels), 2)
+        self.assertEqual(STAGE_ERRORS.value(error="ValueError", **labels), 1)
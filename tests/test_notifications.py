@@ -0,0 +1,84 @@
+import asyncio
+import unittest
+
+from telegram_repost_bot.utils.message_service import NotificationService, Notifier
+
+
+class FakeService:
+    def __init__(self, fail: bool = False) -> None:
+        self.fail = fail
+        self.sent = []
+
+    async def send_email_error(self, body, subject, recipients):
+        self.sent.append(("email", body, recipients))
+
+    async def send_tg_error(self, body, recipients):
+        if self.fail:
+            raise ConnectionError("notification service is down")
+        self.sent.append(("telegram", body, recipients))
+
+    async def close(self):
+        pass
+
+
+class TestNotifier(unittest.TestCase):
+    def test_identical_errors_are_coalesced_into_a_digest(self):
+        service = FakeService()
+
+        async def run():
+            notifier = Notifier(service, window=0.05)
+            notifier.submit("telegram", [1, 2], "WordPress is down")
+            await asyncio.sleep(0.01)
+            for _ in range(4):
+                notifier.submit("telegram", [1, 2], "WordPress is down")
+            notifier.submit("telegram", [1, 2], "Other error")
+            await asyncio.sleep(0.08)
+            await notifier.close()
+
+        asyncio.run(run())
+        self.assertEqual(
+            service.sent,
+            [
+                ("telegram", "WordPress is down", [1, 2]),
+                ("telegram", "Other error", [1, 2]),
+                ("telegram", "WordPress is down\n\n(repeated 4 times)", [1, 2]),
+            ],
+        )
+
+    def test_rate_limited_recipient_is_held_back(self):
+        service = FakeService()
+
+        async def run():
+            notifier = Notifier(service, window=0.05, rate_limit=1, rate_period=60)
+            notifier.submit("telegram", [1], "First")
+            notifier.submit("telegram", [1], "Second")
+            await asyncio.sleep(0.08)
+            held = list(service.sent)
+            await notifier.close()
+            return held
+
+        held = asyncio.run(run())
+        self.assertEqual(held, [("telegram", "First", [1])])
+        self.assertEqual(service.sent[-1], ("telegram", "Second", [1]))
+
+    def test_delivery_failure_is_swallowed(self):
+        service = FakeService(fail=True)
+
+        async def run():
+            notifier = Notifier(service, window=0.01)
+            notifier.submit("telegram", [1], "Error")
+            notifier.submit("email", ["admin@example.com"], "Error")
+            await notifier.close()
+
+        asyncio.run(run())
+        self.assertEqual(service.sent, [("email", "Error", ["admin@example.com"])])
+
+    def test_unreachable_service_returns_none(self):
+        async def run():
+            service = NotificationService("http://127.0.0.1:9", timeout=1)
+            try:
+                return await service.send_tg_error("Error", ["1"])
+            finally:
+                await service.close()
+
+        self.assertIsNone(asyncio.run(run()))
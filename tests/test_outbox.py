@@ -0,0 +1,479 @@
+import asyncio
+import tempfile
+import unittest
+from pathlib import Path
+
+from telegram_repost_bot.media import Photo, UploadedMedia
+from telegram_repost_bot.outbox import (
+    Outbox,
+    OutboxItem,
+    OutboxPhoto,
+    OutboxWorkerPool,
+)
+from telegram_repost_bot.circuit_breaker import CircuitOpen
+from telegram_repost_bot.post_index import PostIndex
+from telegram_repost_bot.rate_limit import RateLimited
+from telegram_repost_bot.storage import open_database
+
+
+class FakeSite:
+    def __init__(self, failures: int = 0, error=None) -> None:
+        self.failures = failures
+        self.error = error or ValueError("WordPress is down")
+        self.published = []
+
+    async def upload_image_to_wordpress(self, image):
+        await asyncio.sleep(0.05)
+        media_id = int(image.filename.split(".")[0])
+        return UploadedMedia(media_id, f"https://x/{image.filename}")
+
+    async def publish_post_to_wordpress(
+        self,
+        title,
+        content,
+        image=None,
+        gallery=(),
+        author_id=None,
+        categories=None,
+        tags=None,
+    ):
+        if self.failures:
+            self.failures -= 1
+            raise self.error
+        self.published.append((title, content, image, list(gallery)))
+        return 100 + len(self.published), image.id if image else None
+
+    async def find_published_post(self, title, after, author_id=None):
+        return None
+
+
+class StuckSite(FakeSite):
+    """A site whose publish calls hang until released."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.release = asyncio.Event()
+
+    async def publish_post_to_wordpress(self, *args, **kwargs):
+        await self.release.wait()
+        return await super().publish_post_to_wordpress(*args, **kwargs)
+
+
+class SequenceSite(FakeSite):
+    """A site that fails with each of ``errors`` in turn, then works."""
+
+    def __init__(self, errors) -> None:
+        super().__init__()
+        self.errors = list(errors)
+
+    async def publish_post_to_wordpress(self, *args, **kwargs):
+        if self.errors:
+            raise self.errors.pop(0)
+        return await super().publish_post_to_wordpress(*args, **kwargs)
+
+
+def make_item(**kwargs) -> OutboxItem:
+    data = dict(
+        site="ru",
+        chat_id=-100,
+        message_id=1,
+        alert_chat_id=-200,
+        title="Заголовок",
+        content="Текст",
+    )
+    data.update(kwargs)
+    return OutboxItem(**data)
+
+
+class TestOutbox(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = Path(self.tmp.name) / "outbox.sqlite3"
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_queued_posts_survive_restart(self):
+        async def enqueue():
+            outbox = Outbox(open_database(self.db_path))
+            await outbox.enqueue(make_item(author_id="7", categories=[5, 6], tags=[9]))
+            outbox.close()
+
+        async def pending():
+            outbox = Outbox(open_database(self.db_path))
+            try:
+                return await outbox.pending(), await outbox.next_due([])
+            finally:
+                outbox.close()
+
+        asyncio.run(enqueue())
+        count, item = asyncio.run(pending())
+        self.assertEqual(count, 1)
+        self.assertEqual(item.title, "Заголовок")
+        self.assertEqual(item.attempts, 0)
+        self.assertEqual(
+            (item.author_id, item.categories, item.tags), ("7", [5, 6], [9])
+        )
+
+    def test_same_message_is_queued_once(self):
+        async def run():
+            outbox = Outbox(open_database(self.db_path))
+            first = await outbox.enqueue(make_item())
+            second = await outbox.enqueue(make_item())
+            other_site = await outbox.enqueue(make_item(site="kg"))
+            outbox.close()
+            return first, second, other_site
+
+        first, second, other_site = asyncio.run(run())
+        self.assertIsNotNone(first)
+        self.assertIsNone(second)
+        self.assertIsNotNone(other_site)
+
+    def test_published_message_is_skipped(self):
+        site = FakeSite()
+
+        async def run():
+            outbox = Outbox(open_database(self.db_path))
+            post_index = PostIndex(open_database(self.db_path))
+            await post_index.record(-100, 1, "ru", 55)
+            pool = OutboxWorkerPool(outbox, post_index, {"ru": site}, None)
+            task = asyncio.create_task(pool.run())
+            await outbox.enqueue(make_item())
+            pool.notify()
+            for _ in range(100):
+                if not await outbox.pending():
+                    break
+                await asyncio.sleep(0.01)
+            task.cancel()
+            pending = await outbox.pending()
+            outbox.close()
+            post_index.close()
+            return pending
+
+        self.assertEqual(asyncio.run(run()), 0)
+        self.assertEqual(site.published, [])
+
+    def test_workers_retry_until_published(self):
+        site = FakeSite(failures=2)
+        failed = []
+
+        async def on_failure(item, error):
+            failed.append(item)
+
+        async def run():
+            outbox = Outbox(open_database(self.db_path))
+            post_index = PostIndex(open_database(self.db_path))
+            pool = OutboxWorkerPool(
+                outbox,
+                post_index,
+                {"ru": site},
+                on_failure,
+                workers=2,
+                base_delay=0.01,
+            )
+            task = asyncio.create_task(pool.run())
+            await outbox.enqueue(make_item())
+            pool.notify()
+            for _ in range(200):
+                if site.published:
+                    break
+                await asyncio.sleep(0.01)
+            await asyncio.sleep(0.05)
+            task.cancel()
+            pending = await outbox.pending()
+            published = post_index.get(-100, 1, "ru")
+            outbox.close()
+            post_index.close()
+            return pending, published
+
+        pending, published = asyncio.run(run())
+        self.assertEqual(pending, 0)
+        self.assertEqual(published, (101, None))
+        self.assertEqual(site.published, [("Заголовок", "Текст", None, [])])
+        self.assertEqual(failed, [])
+
+    def test_gives_up_after_max_attempts(self):
+        site = FakeSite(failures=10)
+        failed = []
+
+        async def on_failure(item, error):
+            failed.append((item.message_id, str(error)))
+
+        async def run():
+            outbox = Outbox(open_database(self.db_path))
+            pool = OutboxWorkerPool(
+                outbox,
+                PostIndex(open_database(self.db_path)),
+                {"ru": site},
+                on_failure,
+                workers=1,
+                base_delay=0.01,
+                max_attempts=3,
+            )
+            task = asyncio.create_task(pool.run())
+            await outbox.enqueue(make_item(message_id=7))
+            pool.notify()
+            for _ in range(200):
+                if failed:
+                    break
+                await asyncio.sleep(0.01)
+            task.cancel()
+            pending = await outbox.pending()
+            outbox.close()
+            return pending
+
+        self.assertEqual(asyncio.run(run()), 0)
+        self.assertEqual(failed, [(7, "WordPress is down")])
+        self.assertEqual(site.failures, 7)
+
+    def test_throttling_never_gives_up(self):
+        site = FakeSite(failures=4, error=RateLimited("429", retry_after=0.01))
+        failed = []
+
+        async def on_failure(item, error):
+            failed.append(item)
+
+        async def run():
+            outbox = Outbox(open_database(self.db_path))
+            post_index = PostIndex(open_database(self.db_path))
+            pool = OutboxWorkerPool(
+                outbox,
+                post_index,
+                {"ru": site},
+                on_failure,
+                workers=1,
+                base_delay=0.01,
+                max_delay=0.02,
+                max_attempts=2,
+            )
+            task = asyncio.create_task(pool.run())
+            await outbox.enqueue(make_item())
+            pool.notify()
+            for _ in range(200):
+                if site.published:
+                    break
+                await asyncio.sleep(0.01)
+            task.cancel()
+            outbox.close()
+            post_index.close()
+
+        asyncio.run(run())
+        self.assertEqual(failed, [])
+        self.assertEqual(len(site.published), 1)
+
+    def test_throttling_does_not_count_towards_giving_up(self):
+        site = SequenceSite(
+            [CircuitOpen("circuit open", retry_after=0.01)] * 4
+            + [ValueError("WordPress is down")]
+        )
+        failed = []
+
+        async def on_failure(item, error):
+            failed.append(item)
+
+        async def run():
+            outbox = Outbox(open_database(self.db_path))
+            post_index = PostIndex(open_database(self.db_path))
+            pool = OutboxWorkerPool(
+                outbox,
+                post_index,
+                {"ru": site},
+                on_failure,
+                workers=1,
+                base_delay=0.01,
+                max_delay=0.02,
+                max_attempts=2,
+            )
+            task = asyncio.create_task(pool.run())
+            await outbox.enqueue(make_item())
+            pool.notify()
+            for _ in range(200):
+                if site.published or failed:
+                    break
+                await asyncio.sleep(0.01)
+            task.cancel()
+            outbox.close()
+            post_index.close()
+
+        asyncio.run(run())
+        self.assertEqual(failed, [])
+        self.assertEqual(len(site.published), 1)
+
+    def test_post_sent_before_a_crash_is_looked_up_on_restart(self):
+        class CrashingSite(FakeSite):
+            async def publish_post_to_wordpress(self, *args, **kwargs):
+                await super().publish_post_to_wordpress(*args, **kwargs)
+                # The bot dies before the response is recorded.
+                raise asyncio.CancelledError
+
+        class PublishedSite(FakeSite):
+            async def find_published_post(self, title, after, author_id=None):
+                return 101
+
+        crashing, restarted = CrashingSite(), PublishedSite()
+
+        async def run(site):
+            outbox = Outbox(open_database(self.db_path))
+            post_index = PostIndex(open_database(self.db_path))
+            pool = OutboxWorkerPool(outbox, post_index, {"ru": site}, None, workers=1)
+            await outbox.enqueue(make_item())
+            try:
+                await asyncio.wait_for(pool.run(), 0.5)
+            except (asyncio.CancelledError, asyncio.TimeoutError):
+                pass
+            published = post_index.get(-100, 1, "ru")
+            outbox.close()
+            post_index.close()
+            return published
+
+        self.assertIsNone(asyncio.run(run(crashing)))
+        self.assertEqual(len(crashing.published), 1)
+        self.assertEqual(asyncio.run(run(restarted)), (101, None))
+        self.assertEqual(restarted.published, [])
+
+    def test_album_photos_are_uploaded_concurrently(self):
+        site = FakeSite()
+        photos = [
+            OutboxPhoto(n, media=b"jpeg", media_name=f"{n}.jpg") for n in (1, 2, 3)
+        ]
+
+        async def run():
+            outbox = Outbox(open_database(self.db_path))
+            post_index = PostIndex(open_database(self.db_path))
+            pool = OutboxWorkerPool(outbox, post_index, {"ru": site}, None)
+            await outbox.enqueue(make_item(photos=photos))
+            loop = asyncio.get_running_loop()
+            started = loop.time()
+            await pool._publish(await outbox.next_due([]))
+            elapsed = loop.time() - started
+            published = post_index.get(-100, 1, "ru")
+            outbox.close()
+            post_index.close()
+            return elapsed, published
+
+        elapsed, published = asyncio.run(run())
+        self.assertLess(elapsed, 0.14)
+        self.assertEqual(published, (101, 1))
+        _, _, featured, gallery = site.published[0]
+        self.assertEqual(featured, UploadedMedia(1, "https://x/1.jpg"))
+        self.assertEqual([media.id for media in gallery], [2, 3])
+
+    def test_streamed_photos_are_downloaded_again_after_restart(self):
+        site = FakeSite()
+        downloads = []
+
+        async def download(chat_id, message_id):
+            downloads.append((chat_id, message_id))
+            return Photo(b"jpeg", "7.jpg")
+
+        async def enqueue():
+            outbox = Outbox(open_database(self.db_path))
+            photo = OutboxPhoto(7, media=b"jpeg", media_name="7.jpg", message_id=2)
+            await outbox.enqueue(make_item(photos=[photo]))
+            # Kept in memory until the bot stops.
+            self.assertEqual((await outbox.next_due([])).photos[0].media, b"jpeg")
+            outbox.close()
+
+        async def restart():
+            outbox = Outbox(open_database(self.db_path))
+            post_index = PostIndex(open_database(self.db_path))
+            pool = OutboxWorkerPool(
+                outbox, post_index, {"ru": site}, None, download=download
+            )
+            await pool._publish(await outbox.next_due([]))
+            published = post_index.get(-100, 1, "ru")
+            outbox.close()
+            post_index.close()
+            return published
+
+        asyncio.run(enqueue())
+        connection = open_database(self.db_path)
+        stored = connection.execute(
+            "SELECT photo_id, message_id FROM outbox_photos"
+        ).fetchall()
+        columns = [
+            row[1] for row in connection.execute("PRAGMA table_info(outbox_photos)")
+        ]
+        connection.close()
+        self.assertEqual(stored, [(7, 2)])
+        self.assertNotIn("media", columns)
+
+        self.assertEqual(asyncio.run(restart()), (101, 7))
+        self.assertEqual(downloads, [(-100, 2)])
+
+    def test_slow_site_does_not_hold_up_other_sites(self):
+        slow, fast = StuckSite(), FakeSite()
+
+        async def run():
+            outbox = Outbox(open_database(self.db_path))
+            post_index = PostIndex(open_database(self.db_path))
+            pool = OutboxWorkerPool(
+                outbox,
+                post_index,
+                {"ru": slow, "kg": fast},
+                None,
+                workers=2,
+                site_concurrency=1,
+            )
+            task = asyncio.create_task(pool.run())
+            # The slow site's posts are older, so they are claimed first.
+            for message_id in (1, 2, 3):
+                await outbox.enqueue(make_item(message_id=message_id))
+            ids = await outbox.enqueue_many(
+                [make_item(message_id=4), make_item(site="kg", message_id=4)]
+            )
+            pool.notify()
+            for _ in range(200):
+                if fast.published:
+                    break
+                await asyncio.sleep(0.01)
+            published_while_stuck = list(fast.published)
+            slow.release.set()
+            for _ in range(200):
+                if not await outbox.pending():
+                    break
+                await asyncio.sleep(0.01)
+            task.cancel()
+            pending = await outbox.pending()
+            outbox.close()
+            post_index.close()
+            return ids, published_while_stuck, pending
+
+        ids, published_while_stuck, pending = asyncio.run(run())
+        self.assertNotIn(None, ids)
+        self.assertEqual(len(published_while_stuck), 1)
+        self.assertEqual(pending, 0)
+        self.assertEqual(len(slow.published), 4)
+
+    def test_post_deleted_while_publishing_is_handed_back(self):
+        site = StuckSite()
+        cancelled = []
+
+        async def on_cancelled(item):
+            cancelled.append(item.message_id)
+
+        async def run():
+            outbox = Outbox(open_database(self.db_path))
+            post_index = PostIndex(open_database(self.db_path))
+            pool = OutboxWorkerPool(
+                outbox, post_index, {"ru": site}, None, on_cancelled=on_cancelled
+            )
+            await outbox.enqueue(make_item())
+            task = asyncio.create_task(pool.run())
+            await asyncio.sleep(0.05)
+            self.assertEqual(await outbox.cancel(-100, 1), 1)
+            site.release.set()
+            for _ in range(100):
+                if cancelled:
+                    break
+                await asyncio.sleep(0.01)
+            task.cancel()
+            published = post_index.get(-100, 1, "ru")
+            outbox.close()
+            post_index.close()
+            return published
+
+        published = asyncio.run(run())
+        self.assertEqual(cancelled, [1])
+        # Recorded, so that the deletion can find the post to take down.
+        self.assertEqual(published.post_id, 101)
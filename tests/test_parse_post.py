@@ -1,25 +1,23 @@
 import unittest
 
-from pyrogram.enums import MessageEntityType as met
-from pyrogram.types import Message, MessageEntity
-from pyrogram.types.messages_and_media.message import Str
+from telethon.tl import types
 
-from telegram_repost_bot.utils import parse_post
+from telegram_repost_bot.utils.entities import render_entities, utf16_to_indices
+from telegram_repost_bot.utils.utils import parse_post, remove_hashtags
+from tests.factories import make_message
 
 
 class TestParsePost(unittest.TestCase):
 
     def test_parse_post(self):
-        message = Message(
-            id=1,
-            text=Str("💉Заголовок\n\nЭтот пост с текстовой ссылкой\n\n#новости"),
-            caption=None,
-            entities=[
-                MessageEntity(type=met.BOLD, offset=1, length=9),
-                MessageEntity(
-                    type=met.TEXT_LINK, offset=24, length=17, url="https://example.com"
+        message = make_message(
+            "💉Заголовок\n\nЭтот пост с текстовой ссылкой\n\n#новости",
+            [
+                types.MessageEntityBold(offset=2, length=9),
+                types.MessageEntityTextUrl(
+                    offset=25, length=17, url="https://example.com"
                 ),
-                MessageEntity(type=met.HASHTAG, offset=43, length=9),
+                types.MessageEntityHashtag(offset=44, length=8),
             ],
         )
         expected_title = "💉Заголовок"
@@ -30,16 +28,12 @@ class TestParsePost(unittest.TestCase):
         self.assertEqual(title, expected_title)
         self.assertEqual(content, expected_content)
 
-        message = Message(
-            id=1,
-            text=Str(
-                "Заголовок\n\nЭтот пост с ссылкой https://example.com\n\n#новости"
-            ),
-            caption=None,
-            entities=[
-                MessageEntity(type=met.BOLD, offset=0, length=9),
-                MessageEntity(type=met.URL, offset=31, length=19),
-                MessageEntity(type=met.HASHTAG, offset=52, length=9),
+        message = make_message(
+            "Заголовок\n\nЭтот пост с ссылкой https://example.com\n\n#новости",
+            [
+                types.MessageEntityBold(offset=0, length=9),
+                types.MessageEntityUrl(offset=31, length=19),
+                types.MessageEntityHashtag(offset=52, length=8),
             ],
         )
         expected_title = "Заголовок"
@@ -49,3 +43,98 @@ class TestParsePost(unittest.TestCase):
         title, content = parse_post(message)
         self.assertEqual(title, expected_title)
         self.assertEqual(content, expected_content)
+
+    def test_parse_post_without_entities(self):
+        title, content = parse_post(make_message("Заголовок\nТекст #новости"))
+        self.assertEqual((title, content), ("Заголовок", "Текст"))
+
+    def test_parse_post_without_body(self):
+        with self.assertRaises(ValueError):
+            parse_post(make_message("Только заголовок #новости"))
+
+    def test_remove_hashtags(self):
+        self.assertEqual(remove_hashtags("Текст\n\n#новости #kloop"), "Текст")
+
+    def test_links_keep_their_hashes(self):
+        message = make_message(
+            "Заголовок\nO'Brien и раздел #новости",
+            [
+                types.MessageEntityTextUrl(
+                    offset=10, length=7, url="https://ex.com/o'brien"
+                ),
+                types.MessageEntityTextUrl(
+                    offset=20, length=6, url="https://ex.com/#section"
+                ),
+            ],
+        )
+        _, content = parse_post(message)
+        self.assertEqual(
+            content,
+            '<a href="https://ex.com/o&#x27;brien">O\'Brien</a> и '
+            '<a href="https://ex.com/#section">раздел</a>',
+        )
+
+
+class TestRenderEntities(unittest.TestCase):
+
+    def test_non_bmp_characters_before_entities(self):
+        # "𝕏" is not an emoji but still takes two UTF-16 code units.
+        text = "𝕏 😀 ссылка"
+        entities = [types.MessageEntityTextUrl(offset=6, length=6, url="https://x")]
+        self.assertEqual(
+            render_entities(text, entities), '𝕏 😀 <a href="https://x">ссылка</a>'
+        )
+
+    def test_nested_entities(self):
+        text = "bold italic end"
+        entities = [
+            types.MessageEntityBold(offset=0, length=11),
+            types.MessageEntityItalic(offset=5, length=6),
+        ]
+        self.assertEqual(
+            render_entities(text, entities), "<b>bold <i>italic</i></b> end"
+        )
+
+    def test_all_formatting_entities(self):
+        text = "b i u s c p q h @kloop a@b.kg"
+        entities = [
+            types.MessageEntityBold(offset=0, length=1),
+            types.MessageEntityItalic(offset=2, length=1),
+            types.MessageEntityUnderline(offset=4, length=1),
+            types.MessageEntityStrike(offset=6, length=1),
+            types.MessageEntityCode(offset=8, length=1),
+            types.MessageEntityPre(offset=10, length=1, language="python"),
+            types.MessageEntityBlockquote(offset=12, length=1),
+            types.MessageEntitySpoiler(offset=14, length=1),
+            types.MessageEntityMention(offset=16, length=6),
+            types.MessageEntityEmail(offset=23, length=6),
+        ]
+        self.assertEqual(
+            render_entities(text, entities),
+            "<b>b</b> <i>i</i> <u>u</u> <s>s</s> <code>c</code> "
+            '<pre><code class="language-python">p</code></pre> '
+            '<blockquote>q</blockquote> <span class="spoiler">h</span> '
+            '<a href="https://t.me/kloop">@kloop</a> '
+            '<a href="mailto:a@b.kg">a@b.kg</a>',
+        )
+
+    def test_html_is_escaped(self):
+        text = "1 < 2 & <script> link"
+        entities = [
+            types.MessageEntityTextUrl(offset=17, length=4, url='https://x/?a="b"')
+        ]
+        self.assertEqual(
+            render_entities(text, entities),
+            "1 &lt; 2 &amp; &lt;script&gt; "
+            '<a href="https://x/?a=&quot;b&quot;">link</a>',
+        )
+
+    def test_start_clips_entities(self):
+        text = "Title\nBody"
+        entities = [types.MessageEntityBold(offset=0, length=10)]
+        self.assertEqual(render_entities(text, entities, start=6), "<b>Body</b>")
+
+    def test_utf16_offsets(self):
+        self.assertEqual(
+            utf16_to_indices("a😀b", [0, 1, 3, 4]), {0: 0, 1: 1, 3: 2, 4: 3}
+        )
@@ -0,0 +1,87 @@
+import asyncio
+import time
+import unittest
+from email.utils import formatdate
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from telegram_repost_bot.rate_limit import RateLimited, TokenBucket, parse_retry_after
+from telegram_repost_bot.wp_api import BaseApi
+
+
+class TestTokenBucket(unittest.TestCase):
+    def test_burst_then_steady_rate(self):
+        async def run():
+            bucket = TokenBucket(rate=20, burst=2)
+            loop = asyncio.get_running_loop()
+            started = loop.time()
+            for _ in range(6):
+                await bucket.acquire()
+            return loop.time() - started
+
+        # Two tokens up front, then one every 50ms.
+        self.assertAlmostEqual(asyncio.run(run()), 0.2, delta=0.06)
+
+    def test_pause_holds_back_every_caller(self):
+        async def run():
+            bucket = TokenBucket(rate=0)
+            bucket.pause(0.1)
+            loop = asyncio.get_running_loop()
+            started = loop.time()
+            await asyncio.gather(bucket.acquire(), bucket.acquire())
+            return loop.time() - started
+
+        self.assertAlmostEqual(asyncio.run(run()), 0.1, delta=0.05)
+
+    def test_retry_after_header(self):
+        self.assertEqual(parse_retry_after("120"), 120.0)
+        self.assertAlmostEqual(
+            parse_retry_after(formatdate(time.time() + 30, usegmt=True)), 30, delta=2
+        )
+        self.assertIsNone(parse_retry_after(None))
+        self.assertIsNone(parse_retry_after("soon"))
+
+
+class TestThrottledRequests(unittest.TestCase):
+    def publish(self, responses, **kwargs):
+        calls = []
+
+        async def create_post(request):
+            calls.append(asyncio.get_running_loop().time())
+            status, headers = responses.pop(0)
+            return web.json_response({"id": 7}, status=status, headers=headers)
+
+        async def run():
+            app = web.Application()
+            app.router.add_post("/wp/v2/posts", create_post)
+            async with TestServer(app) as server:
+                api = BaseApi(
+                    str(server.make_url("")),
+                    "user",
+                    "pass",
+                    "1",
+                    [],
+                    post_limiter=TokenBucket(0),
+                    **kwargs,
+                )
+                try:
+                    return await api.publish_post_to_wordpress("Title", "Body")
+                finally:
+                    await api.close()
+
+        return asyncio.run(run()), calls
+
+    def test_throttled_publish_waits_for_retry_after(self):
+        result, calls = self.publish([(429, {"Retry-After": "0.2"}), (201, {})])
+        self.assertEqual(result, (7, None))
+        self.assertGreaterEqual(calls[1] - calls[0], 0.19)
+
+    def test_long_retry_after_is_left_to_the_outbox(self):
+        with self.assertRaises(RateLimited) as raised:
+            self.publish([(503, {"Retry-After": "300"})], retry_max_delay=60)
+        self.assertEqual(raised.exception.retry_after, 300)
+
+
+if __name__ == "__main__":
+    unittest.main()
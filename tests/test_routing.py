@@ -0,0 +1,82 @@
+import asyncio
+import unittest
+from types import SimpleNamespace
+
+from telegram_repost_bot import config_reader
+from telegram_repost_bot.routing import Route, Router, Target, routes_from_config
+
+
+class FakeClient:
+    async def get_peer_id(self, username):
+        return {"kloopnews": -1001, "kloopkg": -1002}[username]
+
+
+def make_config(routes=(), **kwargs):
+    defaults = dict(
+        routes=list(routes),
+        classifier_rules=[],
+        channel_ru_username="kloopnews",
+        channel_kg_username="kloopkg",
+        hashtag_ru="#новости",
+        hashtag_kg="#жаңылыктар",
+        group_ru_id=-201,
+        group_kg_id=-202,
+    )
+    defaults.update(kwargs)
+    return SimpleNamespace(**defaults)
+
+
+class TestRouter(unittest.TestCase):
+    def test_legacy_channels_route_to_their_sites(self):
+        routes = routes_from_config(make_config())
+        self.assertEqual([route.channel for route in routes], ["kloopnews", "kloopkg"])
+        self.assertEqual(routes[0].targets, (Target("ru"),))
+        self.assertEqual(routes[1].targets, (Target("kg"),))
+        self.assertEqual(routes[1].alert_chat_id, -202)
+        self.assertEqual(routes[0].hashtags, ("#новости", "#жаңылыктар"))
+
+    def test_legacy_channel_without_a_group_is_not_routed(self):
+        (route,) = routes_from_config(make_config(group_ru_id=None))
+        self.assertEqual(route.targets, (Target("kg"),))
+
+    def test_configured_routes(self):
+        config = make_config(
+            [
+                config_reader.Route(
+                    channel=-1003,
+                    hashtags=["#news"],
+                    alert_chat_id=-203,
+                    targets=[
+                        {"site": "ru"},
+                        {"site": "en", "author_id": "7", "categories": [5]},
+                    ],
+                )
+            ]
+        )
+        (route,) = routes_from_config(config)
+        self.assertEqual(route.targets, (Target("ru"), Target("en", "7", (5,))))
+        self.assertIs(Router([route]).get(-1003), route)
+
+    def test_usernames_are_resolved_to_chat_ids(self):
+        router = Router(routes_from_config(make_config()))
+        self.assertIsNone(router.get(-1001))
+
+        asyncio.run(router.resolve(FakeClient()))
+        self.assertEqual(router.get(-1001).targets, (Target("ru"),))
+        self.assertEqual(router.get(-1002).targets, (Target("kg"),))
+        self.assertIsNone(router.get(-1009))
+
+    def test_unknown_target_site_is_rejected(self):
+        router = Router([Route(-1003, ("#news",), -203, (Target("ru"), Target("en")))])
+        router.check_sites(["ru", "en"])
+        with self.assertRaisesRegex(ValueError, "'en' \\(from -1003\\)"):
+            router.check_sites(["ru", "kg"])
+
+    def test_channels_are_subscribed_as_configured(self):
+        router = Router([Route(-1003, ("#news",), -203, (Target("ru"),))])
+        self.assertEqual(router.channels, [-1003])
+        self.assertEqual(router.routes[0].name, "-1003")
+
+
+if __name__ == "__main__":
+    unittest.main()
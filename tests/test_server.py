@@ -0,0 +1,57 @@
+import asyncio
+import unittest
+
+from aiohttp.test_utils import TestClient, TestServer
+
+from telegram_repost_bot.health import HealthState
+from telegram_repost_bot.metrics import Registry
+from telegram_repost_bot.server import StatusServer
+
+
+class TestStatusServer(unittest.TestCase):
+    def request(self, connected, path):
+        registry = Registry()
+        registry.counter("posts_total", "Posts.", ()).inc()
+        server = StatusServer(
+            HealthState(["kloopnews"], ["ru"], lambda: connected), registry=registry
+        )
+
+        async def run():
+            async with TestClient(TestServer(server.app)) as client:
+                response = await client.get(path)
+                return response.status, response.content_type, await response.text()
+
+        return asyncio.run(run())
+
+    def test_health_reports_status_code(self):
+        status, content_type, _ = self.request(True, "/health")
+        self.assertEqual((status, content_type), (200, "application/json"))
+        status, _, body = self.request(False, "/health")
+        self.assertEqual(status, 503)
+        self.assertIn('"status": "unhealthy"', body)
+
+    def test_metrics_are_served_as_prometheus_text(self):
+        status, content_type, body = self.request(True, "/metrics")
+        self.assertEqual((status, content_type), (200, "text/plain"))
+        self.assertIn("posts_total 1.0", body)
+
+    def test_profile_requires_the_admin_token(self):
+        server = StatusServer(HealthState([], [], lambda: True), admin_token="secret")
+
+        async def run():
+            async with TestClient(TestServer(server.app)) as client:
+                denied = await client.get("/admin/profile?seconds=0.05")
+                response = await client.get(
+                    "/admin/profile?seconds=0.1",
+                    headers={"Authorization": "Bearer secret"},
+                )
+                return denied.status, response.status, await response.text()
+
+        denied, status, body = asyncio.run(run())
+        self.assertEqual((denied, status), (401, 200))
+        # Collapsed stacks of the event loop thread, with their sample counts.
+        self.assertRegex(body, r"run_forever \(base_events\.py:\d+\);.* \d+\n")
+
+    def test_profile_route_is_off_without_a_token(self):
+        status, _, _ = self.request(True, "/admin/profile")
+        self.assertEqual(status, 404)
@@ -0,0 +1,84 @@
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from typing import List, Tuple
+
+ROOT = Path(__file__).resolve().parents[1]
+
+# Milliseconds the bot's own modules may spend importing, third-party
+# libraries excluded. Override on slow machines.
+STARTUP_BUDGET_MS = float(os.environ.get("STARTUP_BUDGET_MS", "50"))
+# Milliseconds importing the whole bot may take, libraries included. That is
+# about 300 ms: Telethon, pydantic and aiohttp, which wp_api alone spends about
+# 120 ms of, cost far more than the bot's own modules.
+IMPORT_BUDGET_MS = float(os.environ.get("IMPORT_BUDGET_MS", "600"))
+
+
+def run_python(code: str, *flags: str) -> subprocess.CompletedProcess:
+    """Run ``code`` in a fresh interpreter with no settings and no .env."""
+    with tempfile.TemporaryDirectory() as cwd:
+        result = subprocess.run(
+            [sys.executable, *flags, "-c", code],
+            cwd=cwd,
+            env={"PATH": os.environ.get("PATH", ""), "PYTHONPATH": str(ROOT)},
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        result.files = os.listdir(cwd)
+    return result
+
+
+def import_times(code: str) -> List[Tuple[int, int, str]]:
+    """Run ``code`` and return each module's own and cumulative import time."""
+    result = run_python(code, "-X", "importtime")
+    times = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        if self_us.strip().isdigit():
+            times.append((int(self_us), int(cumulative_us), name.strip()))
+    return times
+
+
+class TestStartup(unittest.TestCase):
+    def test_imports_have_no_side_effects(self):
+        result = run_python(
+            "import telegram_repost_bot.main, telegram_repost_bot.wp_api\n"
+            "from telegram_repost_bot.config_reader import get_config\n"
+            "print(get_config.cache_info().currsize)"
+        )
+        self.assertEqual(result.stdout.strip(), "0")
+        self.assertEqual(result.files, [])
+
+    def test_utils_import_skips_heavy_dependencies(self):
+        result = run_python(
+            "import sys, telegram_repost_bot.utils.utils\n"
+            "print(sorted(m for m in ('telethon', 'aiohttp', 'pydantic')"
+            " if m in sys.modules))"
+        )
+        self.assertEqual(result.stdout.strip(), "[]")
+
+    def test_own_modules_import_within_budget(self):
+        times = import_times(
+            "import telegram_repost_bot.utils.utils, telegram_repost_bot.wp_api"
+        )
+        own_us = sum(
+            self_us
+            for self_us, _, name in times
+            if name.startswith("telegram_repost_bot")
+        )
+        self.assertLess(own_us / 1000, STARTUP_BUDGET_MS)
+
+    def test_bot_imports_within_budget(self):
+        times = import_times("import telegram_repost_bot.main")
+        total_us = sum(
+            cumulative_us
+            for _, cumulative_us, name in times
+            if name in ("telegram_repost_bot", "telegram_repost_bot.main")
+        )
+        self.assertLess(total_us / 1000, IMPORT_BUDGET_MS)
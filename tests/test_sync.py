@@ -0,0 +1,132 @@
+import asyncio
+import tempfile
+import unittest
+from pathlib import Path
+
+from telegram_repost_bot.circuit_breaker import CircuitOpen
+from telegram_repost_bot.media_cache import MediaCache
+from telegram_repost_bot.outbox import Outbox, OutboxItem
+from telegram_repost_bot.post_index import PostIndex, Revision
+from telegram_repost_bot.routing import Route, Target
+from telegram_repost_bot.storage import open_database
+from telegram_repost_bot.sync import EditSync
+from telegram_repost_bot.wp_api import BaseApi
+from tests.factories import make_message
+
+CHAT_ID = -1000000001001
+
+
+class FakeApi:
+    render_content = staticmethod(BaseApi.render_content)
+
+    def __init__(self, errors=()):
+        self.errors = list(errors)
+        self.updates = []
+        self.unpublished = []
+
+    async def update_post(self, post_id, **fields):
+        if self.errors:
+            raise self.errors.pop(0)
+        self.updates.append((post_id, fields))
+
+    async def unpublish_post(self, post_id):
+        if self.errors:
+            raise self.errors.pop(0)
+        self.unpublished.append(post_id)
+
+
+class TestEditSync(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = Path(self.tmp.name) / "sync.sqlite3"
+        self.route = Route(CHAT_ID, ("#news",), -200, (Target("ru"),), CHAT_ID)
+        self.api = FakeApi()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def run_sync(self, scenario):
+        async def run():
+            database = lambda: open_database(self.db_path)  # noqa: E731
+            outbox = Outbox(database())
+            post_index = PostIndex(database())
+            media_cache = MediaCache(database(), Path(self.tmp.name), 1000, 10)
+            await post_index.record(
+                CHAT_ID, 1, "ru", 55, None, Revision.of("Title", "Body")
+            )
+            sync = EditSync(
+                outbox, post_index, media_cache, {"ru": self.api}, None, window=0.05
+            )
+            try:
+                await scenario(sync, post_index, outbox)
+            finally:
+                outbox.close()
+                post_index.close()
+                media_cache.close()
+
+        asyncio.run(run())
+
+    def test_only_changed_fields_are_sent(self):
+        async def scenario(sync, post_index, outbox):
+            await sync.sync(self.route, make_message("Title\nFixed body"))
+            await sync.sync(self.route, make_message("Title\nFixed body"))
+
+        self.run_sync(scenario)
+        self.assertEqual(self.api.updates, [(55, {"content": "Fixed body"})])
+
+    def test_burst_of_edits_is_one_update(self):
+        async def scenario(sync, post_index, outbox):
+            for text in ("Titel\nBody", "Title!\nBody", "New title\nBody"):
+                sync.edited(self.route, make_message(text))
+                await asyncio.sleep(0.01)
+            await asyncio.sleep(0.1)
+
+        self.run_sync(scenario)
+        self.assertEqual(self.api.updates, [(55, {"title": "New title"})])
+
+    def test_queued_copies_get_the_edited_text(self):
+        async def scenario(sync, post_index, outbox):
+            await outbox.enqueue(
+                OutboxItem("kg", CHAT_ID, 2, -200, "Title", "Old body")
+            )
+            await sync.sync(self.route, make_message("New title\nNew body", [], 2))
+            item = await outbox.next_due([])
+            self.assertEqual((item.title, item.content), ("New title", "New body"))
+
+        self.run_sync(scenario)
+        self.assertEqual(self.api.updates, [])
+
+    def test_failed_sync_is_retried(self):
+        self.api.errors = [CircuitOpen("circuit open", retry_after=0.05)]
+
+        async def scenario(sync, post_index, outbox):
+            await sync.sync(self.route, make_message("Title\nFixed body"))
+            self.assertEqual(self.api.updates, [])
+            await asyncio.sleep(0.2)
+
+        self.run_sync(scenario)
+        self.assertEqual(self.api.updates, [(55, {"content": "Fixed body"})])
+
+    def test_deleted_message_is_unpublished(self):
+        async def scenario(sync, post_index, outbox):
+            await sync.deleted(self.route, [1, 2])
+            self.assertIsNone(post_index.get(CHAT_ID, 1, "ru"))
+
+        self.run_sync(scenario)
+        self.assertEqual(self.api.unpublished, [55])
+
+    def test_failed_unpublish_is_retried(self):
+        self.api.errors = [CircuitOpen("circuit open", retry_after=0.05)]
+
+        async def scenario(sync, post_index, outbox):
+            await sync.deleted(self.route, [1])
+            self.assertEqual(self.api.unpublished, [])
+            await asyncio.sleep(0.2)
+            self.assertIsNone(post_index.get(CHAT_ID, 1, "ru"))
+
+        self.run_sync(scenario)
+        self.assertEqual(self.api.unpublished, [55])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+import asyncio
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+from telegram_repost_bot.metrics import track
+from telegram_repost_bot.tracing import (
+    record,
+    setup_tracing,
+    shutdown_tracing,
+    span,
+    trace,
+)
+
+
+class TestTracing(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp.name) / "traces.jsonl"
+        setup_tracing(self.path)
+
+    def tearDown(self):
+        shutdown_tracing()
+        self.tmp.cleanup()
+
+    def spans(self):
+        shutdown_tracing()
+        with open(self.path, encoding="utf-8") as trace_file:
+            return {entry["name"]: entry for entry in map(json.loads, trace_file)}
+
+    def test_spans_of_a_message_share_its_trace(self):
+        async def publish():
+            with track("publish_post", site="ru"):
+                await asyncio.sleep(0.01)
+
+        async def run():
+            with span("outside"):
+                pass
+            with trace(-100, 7, "message", channel="kloopnews"):
+                record("telegram_delivery", 0.0)
+                with span("parse_post"):
+                    pass
+                # Tasks inherit the trace, like the outbox's cookie refresh.
+                await asyncio.create_task(publish())
+
+        asyncio.run(run())
+        spans = self.spans()
+        self.assertEqual(
+            set(spans), {"message", "telegram_delivery", "parse_post", "publish_post"}
+        )
+        root = spans["message"]
+        self.assertEqual(root["trace"], "-100:7")
+        self.assertEqual(root["channel"], "kloopnews")
+        self.assertIsNone(root["parent"])
+        for name in ("telegram_delivery", "parse_post", "publish_post"):
+            self.assertEqual(spans[name]["trace"], "-100:7")
+            self.assertEqual(spans[name]["parent"], root["span"])
+        self.assertEqual(spans["publish_post"]["site"], "ru")
+        self.assertGreaterEqual(spans["publish_post"]["duration_ms"], 10)
+
+    def test_errors_are_recorded(self):
+        with self.assertRaises(ValueError):
+            with trace(-100, 8, "message"):
+                raise ValueError("bad post")
+        self.assertEqual(self.spans()["message"]["error"], "ValueError")
+
+
+if __name__ == "__main__":
+    unittest.main()
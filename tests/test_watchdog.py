@@ -0,0 +1,87 @@
+import asyncio
+import subprocess
+import sys
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from telegram_repost_bot import watchdog
+from telegram_repost_bot.watchdog import Watchdog
+
+
+class TestWatchdog(unittest.TestCase):
+    def run_checks(self, results, **kwargs):
+        alerts = []
+
+        async def escalate(message):
+            alerts.append(message)
+
+        async def run():
+            dog = Watchdog(interval=0, **kwargs)
+            for _ in results:
+                await dog.check()
+
+        with mock.patch.object(
+            watchdog, "probe", side_effect=results
+        ), mock.patch.object(watchdog, "escalate", escalate):
+            asyncio.run(run())
+        return alerts
+
+    def test_alerts_once_after_consecutive_failures_then_recovers(self):
+        down = (False, "health check returned 500")
+        alerts = self.run_checks(
+            [down, (True, "status ok"), down, down, down, down, (True, "status ok")],
+            failures=3,
+        )
+        self.assertEqual(
+            alerts,
+            [
+                "Repost bot is fallen: health check returned 500",
+                "Repost bot is back up",
+            ],
+        )
+
+    def test_realerts_after_interval(self):
+        down = (False, "health check failed")
+        alerts = self.run_checks([down, down], failures=1, realert_interval=0)
+        self.assertEqual(len(alerts), 2)
+
+    def test_alerts_go_to_the_admin_and_the_route_groups(self):
+        submitted = []
+        config = SimpleNamespace(
+            admin_email="admin@example.org",
+            admin_tg_id=1,
+            routes=[],
+            classifier_rules=[],
+            channel_ru_username="kloopnews",
+            channel_kg_username="kloopkg",
+            hashtag_ru="#новости",
+            hashtag_kg="#жаңылыктар",
+            group_ru_id=-201,
+            group_kg_id=None,
+        )
+        notifier = SimpleNamespace(
+            submit=lambda kind, recipients, body: submitted.append((kind, recipients))
+        )
+
+        with mock.patch(
+            "telegram_repost_bot.config_reader.get_config", return_value=config
+        ), mock.patch(
+            "telegram_repost_bot.utils.message_service.get_notifier",
+            return_value=notifier,
+        ):
+            asyncio.run(watchdog.escalate("Repost bot is fallen"))
+        self.assertEqual(
+            submitted, [("email", ["admin@example.org"]), ("telegram", [1, -201])]
+        )
+
+    def test_import_does_not_load_heavy_dependencies(self):
+        code = (
+            "import sys, telegram_repost_bot.watchdog;"
+            "print(sorted(m for m in ('telethon', 'pydantic', 'aiohttp')"
+            " if m in sys.modules))"
+        )
+        output = subprocess.run(
+            [sys.executable, "-c", code], capture_output=True, text=True, check=True
+        ).stdout
+        self.assertEqual(output.strip(), "[]")
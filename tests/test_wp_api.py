@@ -0,0 +1,297 @@
+import asyncio
+import tempfile
+import time
+import unittest
+from datetime import datetime
+from email.utils import formatdate
+from pathlib import Path
+from http.cookies import SimpleCookie
+
+from aiohttp import ClientError, ServerDisconnectedError, web
+from aiohttp.test_utils import TestServer
+
+from telegram_repost_bot.media import Photo, UploadedMedia
+from telegram_repost_bot.wp_api import BaseApi, WpRuApi, _cookie_lifetime
+
+
+def make_api(server: TestServer, api_class=BaseApi, **kwargs) -> BaseApi:
+    return api_class(str(server.make_url("")), "user", "pass", "1", [43], **kwargs)
+
+
+class TestPublish(unittest.TestCase):
+    def test_uploaded_image_becomes_the_featured_image(self):
+        posted = []
+
+        async def create_post(request):
+            posted.append(await request.json())
+            return web.json_response({"id": 7}, status=201)
+
+        async def run():
+            app = web.Application()
+            app.router.add_post("/wp/v2/posts", create_post)
+            async with TestServer(app) as server:
+                api = make_api(server)
+                try:
+                    return await api.publish_post_to_wordpress(
+                        "Title",
+                        "Body",
+                        UploadedMedia(11, "https://x/11.jpg"),
+                        gallery=[UploadedMedia(12, "https://x/12.jpg")],
+                    )
+                finally:
+                    await api.close()
+
+        self.assertEqual(asyncio.run(run()), (7, 11))
+        (data,) = posted
+        self.assertEqual(data["featured_media"], 11)
+        self.assertEqual(data["categories"], [43])
+        self.assertEqual(
+            data["content"],
+            '<img src="https://x/11.jpg" alt="Image description" />Body'
+            '\n\n[gallery ids="12"]',
+        )
+
+
+class TestClient(unittest.TestCase):
+    def serve(self, routes, call):
+        async def run():
+            app = web.Application()
+            app.router.add_routes(routes)
+            async with TestServer(app) as server:
+                api = make_api(server)
+                try:
+                    return await call(api)
+                finally:
+                    await api.close()
+
+        return asyncio.run(run())
+
+    def test_upload_sends_the_photo_as_multipart(self):
+        uploads = []
+
+        async def upload(request):
+            field = (await request.post())["file"]
+            uploads.append((field.filename, field.content_type, field.file.read()))
+            return web.json_response(
+                {"id": len(uploads), "source_url": "https://x/1.jpg"}, status=201
+            )
+
+        async def call(api):
+            with tempfile.TemporaryDirectory() as tmp:
+                path = Path(tmp) / "2.png"
+                path.write_bytes(b"png")
+                return [
+                    await api.upload_image_to_wordpress(Photo(b"jpeg", "1.jpg")),
+                    await api.upload_image_to_wordpress(str(path)),
+                ]
+
+        result = self.serve([web.post("/wp/v2/media", upload)], call)
+        self.assertEqual(
+            result,
+            [UploadedMedia(1, "https://x/1.jpg"), UploadedMedia(2, "https://x/1.jpg")],
+        )
+        self.assertEqual(
+            uploads, [("1.jpg", "image/jpeg", b"jpeg"), ("2.png", "image/png", b"png")]
+        )
+
+    def test_failed_publish_raises_with_the_response_body(self):
+        async def create_post(request):
+            return web.Response(text="<html>Bad gateway</html>", status=502)
+
+        with self.assertRaisesRegex(ClientError, "Bad gateway"):
+            self.serve(
+                [web.post("/wp/v2/posts", create_post)],
+                lambda api: api.publish_post_to_wordpress("Title", "Body"),
+            )
+
+    def test_find_published_post_matches_the_exact_title(self):
+        queries = []
+
+        async def search(request):
+            queries.append(dict(request.query))
+            return web.json_response(
+                [
+                    {"id": 1, "title": {"raw": "Title, updated"}},
+                    {"id": 2, "title": {"raw": "Title"}},
+                ]
+            )
+
+        post_id = self.serve(
+            [web.get("/wp/v2/posts", search)],
+            lambda api: api.find_published_post("Title", datetime(2024, 1, 1)),
+        )
+        self.assertEqual(post_id, 2)
+        self.assertEqual((queries[0]["search"], queries[0]["author"]), ("Title", "1"))
+
+
+class TestConnectionPool(unittest.TestCase):
+    def drop_first_request(self, call):
+        """Run ``call(api)`` against a server that hangs up on its first request."""
+        calls = []
+
+        async def handler(request):
+            calls.append(request.method)
+            if len(calls) == 1:
+                request.transport.close()
+            return web.json_response({"id": 7}, status=201)
+
+        async def run():
+            app = web.Application()
+            app.router.add_route("*", "/{tail:.*}", handler)
+            async with TestServer(app) as server:
+                api = make_api(server)
+                try:
+                    return await call(api)
+                finally:
+                    await api.close()
+
+        return asyncio.run(run()), calls
+
+    def test_dropped_get_is_retried(self):
+        result, calls = self.drop_first_request(
+            lambda api: api._request("GET", "/wp/v2/posts")
+        )
+        self.assertEqual(result, (201, {"id": 7}))
+        self.assertEqual(calls, ["GET", "GET"])
+
+    def test_dropped_post_is_not_sent_again(self):
+        with self.assertRaises(ServerDisconnectedError):
+            self.drop_first_request(
+                lambda api: api.publish_post_to_wordpress("Title", "Body")
+            )
+
+    def test_requests_share_one_keep_alive_connection(self):
+        peers = set()
+
+        async def handler(request):
+            peers.add(request.transport.get_extra_info("peername"))
+            return web.json_response({"name": "site"})
+
+        async def run():
+            app = web.Application()
+            app.router.add_get("/", handler)
+            async with TestServer(app) as server:
+                api = make_api(server)
+                try:
+                    for _ in range(3):
+                        await api.ping()
+                finally:
+                    await api.close()
+
+        asyncio.run(run())
+        self.assertEqual(len(peers), 1)
+
+
+class HiddenUrlSite:
+    """A site that hands out a cookie at its hidden URL and checks it."""
+
+    def __init__(self, max_age=None, visit_delay=0.0, rejections=0):
+        self.max_age = max_age
+        self.visit_delay = visit_delay
+        self.rejections = rejections
+        self.visits = 0
+        self.cookies_seen = []
+
+    async def hidden(self, request):
+        self.visits += 1
+        await asyncio.sleep(self.visit_delay)
+        response = web.Response(text="ok")
+        response.set_cookie("pass", f"v{self.visits}", max_age=self.max_age)
+        return response
+
+    async def index(self, request):
+        self.cookies_seen.append(request.cookies.get("pass"))
+        if self.rejections:
+            self.rejections -= 1
+            return web.json_response({"code": "forbidden"}, status=403)
+        return web.json_response({"name": "site"})
+
+    def run(self, call, **kwargs):
+        async def run():
+            app = web.Application()
+            app.router.add_get("/hidden", self.hidden)
+            app.router.add_get("/", self.index)
+            async with TestServer(app) as server:
+                api = make_api(
+                    server,
+                    WpRuApi,
+                    hidden_url=str(server.make_url("/hidden")),
+                    **kwargs,
+                )
+                try:
+                    return await call(api)
+                finally:
+                    await api.close()
+
+        return asyncio.run(run())
+
+
+class TestHiddenUrlCookies(unittest.TestCase):
+    def test_cookie_lifetime(self):
+        cookies = SimpleCookie()
+        cookies["a"] = "1"
+        cookies["a"]["max-age"] = "30"
+        cookies["b"] = "2"
+        cookies["b"]["expires"] = formatdate(time.time() + 120, usegmt=True)
+        cookies["c"] = "3"
+        self.assertEqual(_cookie_lifetime(cookies["a"]), 30)
+        self.assertAlmostEqual(_cookie_lifetime(cookies["b"]), 120, delta=2)
+        self.assertIsNone(_cookie_lifetime(cookies["c"]))
+
+    def test_cookies_are_reused_until_they_expire(self):
+        site = HiddenUrlSite(max_age=1)
+
+        async def call(api):
+            await api.ping()
+            await api.ping()
+            remaining = api._cookies_expire_at - asyncio.get_running_loop().time()
+            return remaining
+
+        remaining = site.run(call, cookie_ttl=600, cookie_refresh_margin=0.1)
+        # The cookie's Max-Age is shorter than the configured TTL, and wins.
+        self.assertAlmostEqual(remaining, 1, delta=0.2)
+        self.assertEqual(site.visits, 1)
+        self.assertEqual(site.cookies_seen, ["v1", "v1"])
+
+    def test_cookies_are_refreshed_in_the_background_near_expiry(self):
+        site = HiddenUrlSite()
+
+        async def call(api):
+            await api.ping()
+            await asyncio.sleep(0.15)
+            site.visit_delay = 0.3
+            started = time.perf_counter()
+            await api.ping()  # Inside the margin: served from the cache.
+            elapsed = time.perf_counter() - started
+            await api._cookies_refresh
+            await api.ping()
+            return elapsed
+
+        elapsed = site.run(call, cookie_ttl=0.25, cookie_refresh_margin=0.2)
+        self.assertLess(elapsed, 0.2)
+        self.assertEqual(site.visits, 2)
+        self.assertEqual(site.cookies_seen, ["v1", "v1", "v2"])
+
+    def test_concurrent_callers_share_one_refresh(self):
+        site = HiddenUrlSite(visit_delay=0.05)
+
+        async def call(api):
+            await asyncio.gather(*(api.ping() for _ in range(5)))
+
+        site.run(call)
+        self.assertEqual(site.visits, 1)
+
+    def test_rejected_cookies_are_refreshed_and_retried_once(self):
+        site = HiddenUrlSite(rejections=1)
+        site.run(lambda api: api.ping())
+        self.assertEqual(site.visits, 2)
+        self.assertEqual(site.cookies_seen, ["v1", "v2"])
+
+        site = HiddenUrlSite(rejections=5)
+        with self.assertRaises(ClientError):
+            site.run(lambda api: api.ping())
+        self.assertEqual(len(site.cookies_seen), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()